@@ -0,0 +1,227 @@
+"""Scene cuts and activity of a video, analyzed in background.
+
+The video is decoded by ffmpeg at a few frames per second and a tiny gray
+resolution, each frame is compared with the previous one (ImageChops, a
+single C pass per frame) and the mean difference gives:
+
+- the activity curve, one value per second (the strongest change of that
+  second, 0-255), drawn on the time slider of the front-ends,
+- the scene cuts, differences far above the recent ones,
+- the activity peaks, the local maxima of the curve,
+- the idle stretches, long runs of low activity that can be skipped.
+
+The result is stored with the other metadata of the file in probe_cache.
+Only one analysis runs at a time, the most recent request first, since
+decoding competes with playback.
+"""
+import bisect
+import statistics
+import threading
+
+import probe_cache
+
+ANALYSIS_FPS = 4
+ANALYSIS_SIZE = (64, 36)
+CUT_THRESHOLD = 24.0  # mean difference (0-255) of a cut
+CUT_RATIO = 3.0  # and that many times the recent differences
+CUT_HISTORY = 8  # frames of recent differences
+MIN_CUT_GAP_MS = 1000
+PEAK_WINDOW_S = 5  # a peak is the maximum of +-PEAK_WINDOW_S seconds
+PEAK_THRESHOLD = 4
+IDLE_THRESHOLD = 2  # activity of an idle second
+IDLE_MIN_S = 5  # shortest stretch worth skipping
+IDLE_LEAD_MS = 1000  # resume playing that long before the activity
+
+
+def _next(times, time_ms):
+    i = bisect.bisect_right(times, time_ms)
+    return times[i] if i < len(times) else None
+
+
+def _previous(times, time_ms, slack_ms=500):
+    """Previous time, ignoring the one just behind time_ms so that
+       repeating the key keeps going back.
+    """
+    i = bisect.bisect_left(times, time_ms - slack_ms)
+    return times[i - 1] if i else None
+
+
+class Analysis(object):
+    """Activity curve (per second), cut and peak times (ms) of a video."""
+
+    def __init__(self, activity, cuts, peaks, idle):
+        self.activity = activity
+        self.cuts = cuts
+        self.peaks = peaks
+        self.idle = idle  # [(start_ms, end_ms)]
+
+    def to_json(self):
+        return {'activity': self.activity, 'cuts': self.cuts, 'peaks': self.peaks,
+                'idle': [list(stretch) for stretch in self.idle]}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['activity'], data['cuts'], data['peaks'], [tuple(s) for s in data['idle']])
+
+    def next_cut(self, time_ms):
+        return _next(self.cuts, time_ms)
+
+    def previous_cut(self, time_ms):
+        return _previous(self.cuts, time_ms)
+
+    def next_peak(self, time_ms):
+        return _next(self.peaks, time_ms)
+
+    def previous_peak(self, time_ms):
+        return _previous(self.peaks, time_ms)
+
+    def idle_end(self, time_ms):
+        """Where to resume if time_ms is in an idle stretch, else None."""
+        for start, end in self.idle:
+            if start <= time_ms < end - IDLE_LEAD_MS:
+                return end - IDLE_LEAD_MS
+            if start > time_ms:
+                break
+        return None
+
+
+def frame_differences(video_path, fps=ANALYSIS_FPS, size=ANALYSIS_SIZE):
+    """Yield the mean difference (0-255) of each sampled frame with the
+       previous one, the first frame yields 0.  ValueError once the frames
+       are read if ffmpeg failed, its output then ends early or is empty.
+    """
+    import ffmpeg
+    from PIL import Image
+    from PIL import ImageChops
+    from PIL import ImageStat
+    width, height = size
+    frame_size = width * height
+    proc = (
+        ffmpeg
+        # the loop filter is invisible at this size, skipping it speeds up the decoding
+        .input(video_path, skip_loop_filter='all')
+        .output('pipe:', format='rawvideo', pix_fmt='gray', an=None, sn=None,
+                vf='fps=%g,scale=%d:%d:flags=area' % (fps, width, height))
+        .global_args('-loglevel', 'error', '-nostats')
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        previous = None
+        while True:
+            data = proc.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            frame = Image.frombytes('L', size, data)
+            yield 0.0 if previous is None else ImageStat.Stat(ImageChops.difference(frame, previous)).mean[0]
+            previous = frame
+        if proc.wait() != 0:
+            raise ValueError('ffmpeg failed to decode %s (exit status %d)' % (video_path, proc.returncode))
+    finally:
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+def analyze(differences, fps=ANALYSIS_FPS):
+    """Analysis of the frame differences sampled at fps."""
+    cuts, recent, activity = [], [], []
+    for n, d in enumerate(differences):
+        time_ms = int(n * 1000 / fps)
+        baseline = statistics.median(recent) if recent else 0.0
+        if d >= CUT_THRESHOLD and d >= CUT_RATIO * baseline and (
+                not cuts or time_ms - cuts[-1] >= MIN_CUT_GAP_MS):
+            cuts.append(time_ms)
+        else:
+            # a cut is not motion, keep it out of the curve and the history
+            recent = (recent + [d])[-CUT_HISTORY:]
+            second = int(n // fps)
+            if second >= len(activity):
+                activity.extend([0] * (second + 1 - len(activity)))
+            activity[second] = max(activity[second], int(round(d)))
+
+    peaks = []
+    for second, value in enumerate(activity):
+        window = activity[max(0, second - PEAK_WINDOW_S):second + PEAK_WINDOW_S + 1]
+        if value >= PEAK_THRESHOLD and value == max(window) and (
+                not peaks or second * 1000 - peaks[-1] > PEAK_WINDOW_S * 1000):
+            peaks.append(second * 1000)
+
+    idle, start = [], None
+    for second, value in enumerate(activity + [IDLE_THRESHOLD + 1]):
+        if value <= IDLE_THRESHOLD:
+            if start is None:
+                start = second
+        elif start is not None:
+            if second - start >= IDLE_MIN_S:
+                idle.append((start * 1000, second * 1000))
+            start = None
+    return Analysis(activity, cuts, peaks, idle)
+
+
+_analyses = {}  # path -> Analysis, loaded from probe_cache
+_lock = threading.Lock()
+_requests = []  # [(video_path, on_ready)], the last one is analyzed first
+_wakeup = threading.Condition(_lock)
+_worker = None
+
+
+def cached_analysis(video_path):
+    """Analysis of video_path if already done, else None."""
+    with _lock:
+        analysis = _analyses.get(video_path)
+    if analysis is None:
+        try:
+            data = probe_cache.default_cache().get_extra(video_path, 'activity')
+        except OSError:
+            return None
+        if data is not None:
+            analysis = Analysis.from_json(data)
+            with _lock:
+                _analyses[video_path] = analysis
+    return analysis
+
+
+def request_analysis(video_path, on_ready=None):
+    """Analyze video_path in background if it is not cached yet.
+       on_ready(video_path, analysis) is called from the analyzer thread, or
+       right away if the analysis is cached.  analysis is None if the file
+       could not be analyzed.
+    """
+    global _worker
+    analysis = cached_analysis(video_path)
+    if analysis is not None:
+        if on_ready:
+            on_ready(video_path, analysis)
+        return
+    with _lock:
+        _requests[:] = [r for r in _requests if r[0] != video_path]
+        _requests.append((video_path, on_ready))
+        if _worker is None:
+            _worker = threading.Thread(target=_work, name='activity', daemon=True)
+            _worker.start()
+        _wakeup.notify()
+
+
+def _work():
+    import ffmpeg
+    while True:
+        with _lock:
+            while not _requests:
+                _wakeup.wait()
+            video_path, on_ready = _requests.pop()
+            analysis = _analyses.get(video_path)  # analyzed since the request
+        if analysis is None:
+            try:
+                analysis = analyze(frame_differences(video_path))
+            except (OSError, ValueError, ffmpeg.Error):
+                pass  # not cached, analyzed again on the next request
+            else:
+                with _lock:
+                    _analyses[video_path] = analysis
+                try:
+                    probe_cache.default_cache().set_extra(video_path, 'activity', analysis.to_json())
+                except OSError:
+                    pass  # removed meanwhile, the analysis is still shown
+        if on_ready:
+            on_ready(video_path, analysis)
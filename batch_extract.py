@@ -0,0 +1,152 @@
+"""Headless extraction of frames at fixed timestamps from many videos.
+
+Each video is handled by one process of a pool (one worker per core by
+default).  Frames are decoded by frame_reader and saved with the same
+rotation, color profile, naming and modification time rules as a capture
+from the GUI (capture_pipeline).
+"""
+import argparse
+import multiprocessing.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import capture_pipeline
+import encoders
+import folder_scanner
+import frame_reader
+import output_names
+import probe_cache
+
+
+def jobs_from_folder(folder_path, at=(), recursive=False):
+    """{video: [timestamps]} for the videos of folder_path, oldest first.
+       The timestamps of --every need the duration of each video, they are
+       added by the workers (see extract_video).
+    """
+    videos = sorted((video for chunk in folder_scanner.scan(folder_path, recursive=recursive)
+                     for video in chunk), key=lambda v: v[1])
+    return {video: sorted(set(at)) for video, _ in videos}
+
+
+def jobs_from_list(list_path):
+    """{video: [timestamps]} from a file of 'video,timestamp' lines."""
+    jobs = {}
+    with open(list_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            video, _, timestamp = line.rpartition(',')
+            jobs.setdefault(os.path.expanduser(video.strip()), []).append(float(timestamp))
+    return jobs
+
+
+def _init_worker():
+    # The pool processes exit without running atexit, save their new probes
+    multiprocessing.util.Finalize(None, probe_cache.default_cache().save, exitpriority=10)
+
+
+def extract_video(video_path, timestamps, out_dir, spec=encoders.DEFAULT_SPEC,
+                  exif_orientation=encoders.DEFAULT_EXIF_ORIENTATION, template=None, every=None):
+    """Worker: save the frames of video_path at timestamps (seconds), and
+       every `every` seconds if given, in the image format spec, named after
+       template (see output_names).  Returns (video_path, number of frames
+       saved, seconds spent, [(timestamp, error) of the frames not saved]).
+    """
+    import ffmpeg
+    start = time.perf_counter()
+    encoder = encoders.Encoder(spec, exif_orientation)
+    meta = probe_cache.get_metadata(video_path)
+    if every:
+        # the last frame starts before the duration, a frame at it does not exist
+        timestamps = sorted(set(timestamps).union(
+            i * every for i in range(int(meta['duration'] // every) + 1) if i * every < meta['duration']))
+    video_modified_time = os.path.getmtime(video_path)
+    saved, errors = 0, []
+    for t in timestamps:
+        if meta['duration'] and t >= meta['duration']:
+            continue
+        try:
+            img = frame_reader.read_frame(video_path, t, meta['width'], meta['height'])
+        except (ValueError, ffmpeg.Error) as e:
+            errors.append((t, e))  # the other frames of the video are still extracted
+            continue
+        path_out = capture_pipeline.capture_path(out_dir, video_path, video_modified_time, encoder.extension,
+                                                 template, int(round(t * 1000)))
+        capture_pipeline.postprocess_capture(path_out, video_path, video_modified_time, img, encoder)
+        saved += 1
+    return video_path, saved, time.perf_counter() - start, errors
+
+
+def run(jobs, out_dir, workers=None, spec=encoders.DEFAULT_SPEC,
+        exif_orientation=encoders.DEFAULT_EXIF_ORIENTATION, template=None, every=None):
+    """Extract all jobs with a process pool, printing progress per file,
+       plus one frame every `every` seconds of each video if given.
+    """
+    total_frames, failed, failed_frames = 0, 0, 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        futures = {pool.submit(extract_video, video, timestamps, out_dir, spec, exif_orientation, template,
+                               every): video
+                   for video, timestamps in jobs.items() if timestamps or every}
+        for done, future in enumerate(as_completed(futures), 1):
+            video = futures[future]
+            try:
+                _, saved, elapsed, errors = future.result()
+            except Exception as e:
+                failed += 1
+                print('[%d/%d] %s: failed: %s' % (done, len(futures), os.path.basename(video), e),
+                      file=sys.stderr)
+                continue
+            total_frames += saved
+            failed_frames += len(errors)
+            for t, error in errors:
+                print('[%d/%d] %s: no frame at %.3fs: %s' % (done, len(futures), os.path.basename(video), t, error),
+                      file=sys.stderr)
+            print('[%d/%d] %s: %d frames in %.2fs (%.1f frames/s)'
+                  % (done, len(futures), os.path.basename(video), saved, elapsed,
+                     saved / elapsed if elapsed else 0))
+    elapsed = time.perf_counter() - start
+    print('%d frames from %d videos in %.1fs (%.1f frames/s), %d failed, %d frames failed'
+          % (total_frames, len(jobs), elapsed, total_frames / elapsed if elapsed else 0, failed, failed_frames))
+    return failed + failed_frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='video_player.py --batch',
+                                     description='Extract frames from videos without the GUI.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--folder', help='folder of videos')
+    source.add_argument('--list', help="file of 'video,timestamp' lines")
+    parser.add_argument('--recursive', action='store_true', help='with --folder, include subfolders')
+    parser.add_argument('--every', type=float, help='with --folder, one frame every N seconds')
+    parser.add_argument('--at', type=float, action='append', default=[],
+                        help='with --folder, timestamp in seconds (repeatable)')
+    parser.add_argument('--output', default=os.getcwd(), help='screenshot folder (default: current)')
+    parser.add_argument('--format', default=encoders.DEFAULT_SPEC,
+                        help="image format: png[:level], jpeg:quality, webp:quality or webp-lossless")
+    parser.add_argument('--exif-orientation', action='store_true', default=encoders.DEFAULT_EXIF_ORIENTATION,
+                        help='tag rotated videos with the EXIF orientation instead of rotating the pixels')
+    parser.add_argument('--name-template', default=None,
+                        help='file names, fields {video} {mtime} {frame} {ms} {seq} '
+                             '(default: screenshot_{mtime})')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    if args.folder:
+        if not args.every and not args.at:
+            parser.error('--folder needs --every and/or --at')
+        jobs = jobs_from_folder(args.folder, args.at, args.recursive)
+    else:
+        jobs = jobs_from_list(args.list)
+    try:
+        encoders.Encoder(args.format)
+        if args.name_template:
+            output_names.check_template(args.name_template)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(args.output, exist_ok=True)
+    return 1 if run(jobs, args.output, args.workers, args.format, args.exif_orientation,
+                    args.name_template, args.every if args.folder else None) else 0
@@ -0,0 +1,88 @@
+"""Capture every stride-th frame of a marked in/out range.
+
+The range is decoded once, sequentially, by frame_reader.iter_frames and
+each frame is handed to the capture engine as soon as it is decoded, so
+decoding and encoding overlap.  The files are named and dated like the
+captures of the front-end that started the burst, and capture_manifest.jsonl
+in the output folder records the video, frame number and time of each.
+"""
+import json
+import os
+import threading
+
+import frame_reader
+import frame_step
+import probe_cache
+
+MANIFEST_NAME = 'capture_manifest.jsonl'
+
+
+def record_capture(out_dir, path_out, video_path, frame, time_ms):
+    """Append the origin of path_out to the manifest of out_dir."""
+    line = json.dumps({'file': os.path.basename(path_out), 'video': video_path,
+                       'frame': frame, 'time_ms': time_ms})
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'a') as f:
+        f.write(line + '\n')
+
+
+class BurstCapture(threading.Thread):
+    """Capture video_path between in_ms and out_ms in background.
+
+       The frames are saved into out_dir by engine, a
+       capture_pipeline.CaptureEngine, video_mtime (seconds) is given to the
+       saved files.  done and total count the frames and can be read from
+       the GUI thread, on_progress(burst) is called from the burst thread
+       after each frame and at the end.  in_frame and out_frame are the
+       frame numbers of the marks made while stepping (see frame_step),
+       None to find them from the times.
+    """
+
+    def __init__(self, engine, video_path, in_ms, out_ms, stride, out_dir, video_mtime,
+                 on_progress=None, encoder=None, in_frame=None, out_frame=None):
+        super().__init__(name='burst-capture', daemon=True)
+        self.engine = engine
+        self.video_path = video_path
+        (self.in_ms, self.in_frame), (self.out_ms, self.out_frame) = sorted(
+            ((in_ms, in_frame), (out_ms, out_frame)), key=lambda mark: mark[0])
+        self.stride = max(1, int(stride))
+        self.out_dir = out_dir
+        self.video_mtime = video_mtime
+        self.on_progress = on_progress
+        self.encoder = encoder
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.finished = False
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            meta = probe_cache.get_metadata(self.video_path)
+            fps = meta['fps'] or frame_step.DEFAULT_FPS
+            first = self.in_frame if self.in_frame is not None else frame_step.frame_at(self.in_ms, fps)
+            last = self.out_frame if self.out_frame is not None else frame_step.frame_at(self.out_ms, fps)
+            self.total = (last - first) // self.stride + 1
+            frames = frame_reader.iter_frames(self.video_path, frame_step.frame_time_ms(first, fps) / 1000.0,
+                                              frame_step.frame_time_ms(last, fps) / 1000.0 + 0.5 / fps, self.stride,
+                                              meta['width'], meta['height'])
+            for n, img in frames:
+                if self._cancel.is_set() or first + n > last:
+                    break
+                frame = first + n
+                time_ms = frame_step.frame_time_ms(frame, fps)
+                # blocks while the capture workers are saturated (backpressure)
+                path_out = self.engine.save(img, self.video_path, self.out_dir, self.encoder,
+                                            time_ms, frame, self.video_mtime)
+                record_capture(self.out_dir, path_out, self.video_path, frame, time_ms)
+                self.done += 1
+                if self.on_progress:
+                    self.on_progress(self)
+        except Exception as e:  # shown by the front-end
+            self.error = e
+        finally:
+            self.finished = True
+            if self.on_progress:
+                self.on_progress(self)
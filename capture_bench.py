@@ -0,0 +1,239 @@
+"""Benchmark of the capture path on synthetic videos.
+
+The test videos are made once with the ffmpeg lavfi test source and kept in
+the cache folder: H.264 and HEVC, 1080p and 4K, a rotated one and an HDR
+(PQ) one.  For each of them every stage of a capture is timed on its own,
+then captures are pushed through a CaptureEngine to measure the sustained
+rate:
+
+  probe      ffprobe of the file, without the probe cache
+  probe-hit  metadata from the probe cache
+  decode     frame decoded to memory by ffmpeg (frame_reader)
+  grab       frame decoded to memory by libvlc (FrameGrabber, warm player)
+  name       output name reserved in the output folder
+  orient     rotation to upright
+  color      color conversion and profile
+  encode     image encoding and write
+  utime      modification time set
+
+Results can be saved as JSON and compared with a previous run to catch
+regressions:
+
+  python video_player.py --bench --save base.json
+  python video_player.py --bench --baseline base.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from os.path import expanduser
+
+import ffmpeg
+
+import capture_pipeline
+import color
+import encoders
+import frame_reader
+import probe_cache
+
+VIDEOS_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', expanduser('~/.cache')),
+                          'video-screenshoter', 'bench')
+
+DURATION_S = 4
+
+# name: (width, height, codec, counterclockwise display rotation, extra output options)
+VIDEOS = {
+    'h264-1080p': (1920, 1080, 'libx264', 0, {}),
+    'h264-1080p-rot90': (1920, 1080, 'libx264', 90, {}),
+    'hevc-1080p': (1920, 1080, 'libx265', 0, {}),
+    'hevc-1080p-pq': (1920, 1080, 'libx265', 0, {
+        'pix_fmt': 'yuv420p10le', 'color_primaries': 'bt2020', 'color_trc': 'smpte2084',
+        'colorspace': 'bt2020nc'}),
+    'h264-2160p': (3840, 2160, 'libx264', 0, {}),
+    'hevc-2160p': (3840, 2160, 'libx265', 0, {}),
+}
+
+STAGES = ('probe', 'probe-hit', 'decode', 'grab', 'name', 'orient', 'color', 'encode', 'utime')
+
+
+def make_video(name, directory=VIDEOS_DIR):
+    """Path of the test video name, encoded first if needed."""
+    width, height, codec, rotation, options = VIDEOS[name]
+    path = os.path.join(directory, name + '.mp4')
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp.mp4'
+    options = dict({'pix_fmt': 'yuv420p', 'g': 30, 'preset': 'ultrafast'}, **options)
+    source = ffmpeg.input('testsrc2=size=%dx%d:rate=30:duration=%d' % (width, height, DURATION_S), f='lavfi')
+    ffmpeg.output(source, tmp, vcodec=codec, **options).overwrite_output().run(quiet=True)
+    if rotation:
+        plain, tmp = tmp, path + '.rot.mp4'
+        try:
+            ffmpeg.input(plain, display_rotation=rotation).output(tmp, c='copy').overwrite_output().run(quiet=True)
+        except ffmpeg.Error:
+            # ffmpeg < 6 has no -display_rotation, the rotate tag is clockwise
+            (ffmpeg.input(plain).output(tmp, c='copy', **{'metadata:s:v:0': 'rotate=%d' % (-rotation % 360)})
+             .overwrite_output().run(quiet=True))
+        os.remove(plain)
+    os.replace(tmp, path)
+    return path
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _new_grabber():
+    """FrameGrabber on a quiet vlc.Instance, None if libvlc is not usable."""
+    try:
+        import vlc
+        import frame_grabber
+        instance = vlc.Instance('--quiet', '--no-audio')
+        return frame_grabber.FrameGrabber(instance) if instance is not None else None
+    except (ImportError, OSError, NotImplementedError):
+        return None
+
+
+def bench_stages(video_path, out_dir, encoder, repeat, grabber=None):
+    """{stage: [seconds]} of repeat captures of video_path at spread times."""
+    times = {stage: [] for stage in STAGES}
+    meta = None
+    for _ in range(repeat):
+        meta, seconds = _timed(lambda: probe_cache.metadata_from_probe(ffmpeg.probe(video_path)))
+        times['probe'].append(seconds)
+    probe_cache.get_metadata(video_path)  # warm, the later stages use the cache
+    mtime = os.path.getmtime(video_path)
+    for i in range(repeat):
+        time_ms = int((i + 0.5) * DURATION_S * 1000 / repeat)
+        times['probe-hit'].append(_timed(probe_cache.get_metadata, video_path)[1])
+        img, seconds = _timed(frame_reader.read_frame, video_path, time_ms / 1000.0,
+                              meta['width'], meta['height'])
+        times['decode'].append(seconds)
+        if grabber is not None:
+            grabbed, seconds = _timed(grabber.grab, video_path, time_ms, meta['width'], meta['height'])
+            if grabbed is not None and i:  # the first grab opens the file
+                times['grab'].append(seconds)
+        path_out, seconds = _timed(capture_pipeline.capture_path, out_dir, video_path, mtime,
+                                   encoder.extension, None, time_ms)
+        times['name'].append(seconds)
+        (img, extra), seconds = _timed(capture_pipeline.orient_frame, img, meta['orientation'], encoder)
+        times['orient'].append(seconds)
+        (img, icc_profile), seconds = _timed(color.prepare, img, meta)
+        times['color'].append(seconds)
+        times['encode'].append(_timed(encoder.save, img, path_out, icc_profile=icc_profile, **extra)[1])
+        times['utime'].append(_timed(os.utime, path_out, (mtime, mtime))[1])
+    return {stage: samples for stage, samples in times.items() if samples}
+
+
+def bench_throughput(video_path, out_dir, encoder, captures, workers):
+    """Captures per second of decoded frames saved through a CaptureEngine."""
+    meta = probe_cache.get_metadata(video_path)
+    frames = [frame_reader.read_frame(video_path, (i + 0.5) * DURATION_S / captures,
+                                      meta['width'], meta['height'])
+              for i in range(min(captures, 8))]
+    engine = capture_pipeline.CaptureEngine(template='{video}_{seq:04d}', workers=workers)
+    try:
+        start = time.perf_counter()
+        for i in range(captures):
+            engine.save(frames[i % len(frames)], video_path, out_dir, encoder, time_ms=i)
+        engine.join()
+        elapsed = time.perf_counter() - start
+        if not engine.errors.empty():
+            raise engine.errors.get()
+    finally:
+        engine.close()
+    return captures / elapsed
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def summarize(times):
+    """{stage: {'p50': ms, 'p95': ms}}"""
+    return {stage: {'p50': statistics.median(samples) * 1000, 'p95': percentile(samples, 95) * 1000}
+            for stage, samples in times.items()}
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing the stages slower than baseline by more than tolerance."""
+    regressions = []
+    for video, result in results.items():
+        base = baseline.get(video)
+        if not base:
+            continue
+        for stage, stats in result['stages'].items():
+            old = base['stages'].get(stage)
+            if old and stats['p50'] > old['p50'] * (1 + tolerance) and stats['p50'] - old['p50'] > 0.5:
+                regressions.append('%s %s: p50 %.1f ms, was %.1f ms' % (video, stage, stats['p50'], old['p50']))
+        if result['captures_per_s'] < base['captures_per_s'] * (1 - tolerance):
+            regressions.append('%s: %.1f captures/s, was %.1f' % (video, result['captures_per_s'],
+                                                                   base['captures_per_s']))
+    return regressions
+
+
+def main(argv=None):
+    """--bench: time each stage of the capture path on the test videos."""
+    parser = argparse.ArgumentParser(prog='video_player.py --bench',
+                                     description='Benchmark the capture path on synthetic videos.')
+    parser.add_argument('videos', nargs='*', metavar='video',
+                        help='test videos to run (default: all): ' + ', '.join(VIDEOS))
+    parser.add_argument('--format', default=encoders.DEFAULT_SPEC, help='image format spec')
+    parser.add_argument('--repeat', type=int, default=10, help='captures timed per stage')
+    parser.add_argument('--captures', type=int, default=40, help='captures of the throughput run')
+    parser.add_argument('--workers', type=int, default=capture_pipeline.DEFAULT_WORKERS)
+    parser.add_argument('--no-vlc', action='store_true', help='skip the libvlc grab stage')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative slowdown reported as a regression (default: 0.2)')
+    args = parser.parse_args(argv)
+    for name in args.videos:
+        if name not in VIDEOS:
+            parser.error('unknown test video %r' % (name,))
+
+    encoder = encoders.Encoder(args.format)
+    grabber = None if args.no_vlc else _new_grabber()
+    results = {}
+    out_dir = tempfile.mkdtemp(prefix='screenshoter-bench-')
+    try:
+        for name in args.videos or VIDEOS:
+            try:
+                video_path = make_video(name)
+            except ffmpeg.Error as e:
+                reason = (e.stderr or b'').decode(errors='replace').strip().splitlines()
+                print('%s: skipped, could not encode it (%s)' % (name, reason[-1] if reason else e))
+                continue
+            video_out = os.path.join(out_dir, name)
+            os.makedirs(video_out)
+            stages = summarize(bench_stages(video_path, video_out, encoder, args.repeat, grabber))
+            rate = bench_throughput(video_path, video_out, encoder, args.captures, args.workers)
+            results[name] = {'stages': stages, 'captures_per_s': rate}
+            print('%s  %.1f captures/s  (%s, %d workers)' % (name, rate, encoder.spec, args.workers))
+            for stage in STAGES:
+                if stage in stages:
+                    print('  %-10s p50 %8.2f ms   p95 %8.2f ms' % (stage, stages[stage]['p50'],
+                                                                   stages[stage]['p95']))
+    finally:
+        if grabber is not None:
+            grabber.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'format': encoder.spec, 'videos': results}, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)['videos'], args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
@@ -0,0 +1,318 @@
+"""Capture engine shared by the front-ends, the headless tools and the benchmarks.
+
+The GUI thread only grabs the frame (see frame_grabber), the rest of the
+work (probe, output name, rotate, color management, save and modification
+time) is done by a bounded pool of worker threads so that holding the
+capture key does not freeze the UI.
+
+CaptureEngine is the entry point.  The stages it runs are public too, for
+the tools that run them synchronously and for capture_bench, which times
+them: capture_path, grab_frame, then postprocess_capture = orient_frame,
+dedup.check_capture, color.prepare, Encoder.save and os.utime.  Each stage
+is a profiling span (capture.*) when --profile is given.
+"""
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+import color
+import dedup
+import encoders
+import orientation
+import output_names
+import probe_cache
+import profiling
+
+DEFAULT_WORKERS = int(os.environ.get('SCREENSHOTER_CAPTURE_WORKERS', 2))
+DEFAULT_MAX_PENDING = int(os.environ.get('SCREENSHOTER_CAPTURE_MAX_PENDING', 8))
+
+# 'snapshot' uses video_take_snapshot() and re-reads the PNG, 'memory' grabs
+# the decoded frame through the libvlc callbacks of a hidden player seeked to
+# the time of the capture, which blocks the capture key for up to its timeout
+# and may not be the very frame on screen while playing.
+CAPTURE_BACKEND = os.environ.get('SCREENSHOTER_CAPTURE_BACKEND', 'snapshot')
+
+
+def capture_path(out_dir, video_path, video_mtime, extension='.png', template=None,
+                 time_ms=None, frame=None):
+    """Reserve and return the output path of a capture of video_path (whose
+       modification time is video_mtime) at time_ms or frame, named after
+       template (default: SCREENSHOTER_NAME_TEMPLATE, else
+       screenshot_<YYYYmmdd_HHMMSS>), see output_names.
+    """
+    template = template or output_names.DEFAULT_TEMPLATE or output_names.QT_TEMPLATE
+    fields = output_names.capture_fields(video_path, video_mtime, time_ms, frame)
+    return output_names.allocate(out_dir, template, fields, extension)
+
+
+def new_frame_grabber(instance):
+    """FrameGrabber for the configured backend, None for the snapshot backend."""
+    if CAPTURE_BACKEND != 'memory':
+        return None
+    import frame_grabber
+    return frame_grabber.FrameGrabber(instance)
+
+
+def snapshot_path():
+    """New temporary file for a snapshot, removed by whoever reads it."""
+    fd, path = tempfile.mkstemp(prefix='snapshot-', suffix='.png')
+    os.close(fd)
+    return path
+
+
+def grab_frame(grabber, player, video_path, path_out, time_ms=None):
+    """Get the current frame of player, or the one at time_ms, in memory if
+       possible, that is if the size of the video is already cached (see
+       probe_cache.request_metadata): it never probes.
+
+       Returns the decoded image, or None when the frame was written to
+       path_out by the snapshot fallback.
+    """
+    meta = probe_cache.cached_metadata(video_path) if grabber is not None else None
+    if meta is not None:
+        if time_ms is None:
+            time_ms = player.get_time()
+        with profiling.span('capture.grab'):
+            img = grabber.grab(video_path, time_ms, meta['width'], meta['height'])
+        if img is not None:
+            return img
+    with profiling.span('capture.snapshot'):
+        player.video_take_snapshot(0, path_out, 0, 0)
+    return None
+
+
+def orient_frame(img, video_orientation, encoder):
+    """Turn img upright, or keep it and return the EXIF tag to save instead
+       if encoder.exif_orientation.  Returns (image, extra save options).
+    """
+    if not encoder.exif_orientation:
+        return orientation.apply(img, video_orientation), {}
+    if video_orientation != orientation.NORMAL:
+        return img, {'exif': orientation.exif_bytes(video_orientation)}
+    return img, {}
+
+
+def postprocess_capture(path_out, video_path, mtime, img=None, encoder=None, duplicates='off'):
+    """Orient the frame img (or the snapshot already saved at path_out),
+       convert its colors and attach their profile (see color), save it to
+       path_out with encoder (default: encoders.DEFAULT_SPEC) and set its
+       modification time to mtime (seconds).
+
+       duplicates is the dedup mode: a near duplicate of a capture of the
+       same folder raises dedup.DuplicateCapture, after saving it in 'flag'
+       mode, instead of saving it in 'skip' mode.
+    """
+    encoder = encoder or encoders.Encoder()
+    # Orientation and colors of the video (metadata is cached on disk per file)
+    with profiling.span('capture.probe'):
+        meta = probe_cache.get_metadata(video_path)
+
+    if img is None:
+        with profiling.span('capture.read'):
+            img = Image.open(path_out)
+            img.load()
+    with profiling.span('capture.orient'):
+        img, extra = orient_frame(img, meta['orientation'], encoder)
+    try:
+        with profiling.span('capture.dedup'):
+            duplicate_of = dedup.check_capture(img, path_out, duplicates)
+    except dedup.DuplicateCapture:
+        os.remove(path_out)  # the reserved name or the snapshot
+        raise
+    with profiling.span('capture.color'):
+        img, icc_profile = color.prepare(img, meta)
+    with profiling.span('capture.encode', format=encoder.spec):
+        encoder.save(img, path_out, icc_profile=icc_profile, **extra)
+
+    # Update modification date (same as original video)
+    with profiling.span('capture.utime'):
+        os.utime(path_out, (mtime, mtime))
+    if duplicate_of is not None:
+        raise dedup.DuplicateCapture(path_out, duplicate_of, skipped=False)
+
+
+class CaptureQueue(object):
+    """Bounded queue of capture jobs served by a pool of worker threads.
+
+       submit() blocks once max_pending jobs are waiting or running, which
+       keeps a held capture key from piling up unprocessed snapshots.
+       on_change(pending) is called from the worker threads whenever the
+       number of pending jobs changes, front-ends must marshal it onto
+       their own event loop.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, on_change=None):
+        self.on_change = on_change
+        self.errors = queue.Queue()
+        self._jobs = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._work, name='capture-%d' % i, daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _changed(self, delta):
+        with self._lock:
+            self._pending += delta
+            pending = self._pending
+        if self.on_change:
+            self.on_change(pending)
+
+    def submit(self, func, *args, block=True):
+        """Queue func(*args).  Returns False if the queue is full and block is False."""
+        if not self._slots.acquire(blocking=block):
+            return False
+        self._changed(1)
+        self._jobs.put((func, args, time.perf_counter()))
+        return True
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                break
+            func, args, queued = job
+            profiling.record('capture.queued', time.perf_counter() - queued)
+            try:
+                with profiling.span('capture.postprocess'):
+                    func(*args)
+            except Exception as e:  # reported to the GUI, keep the worker alive
+                self.errors.put(e)
+            finally:
+                self._slots.release()
+                self._changed(-1)
+                self._jobs.task_done()
+
+    def join(self):
+        """Wait until every job submitted so far is done."""
+        self._jobs.join()
+
+    def close(self, wait=True):
+        """Stop the workers, by default after the pending jobs are done."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+class CaptureEngine(object):
+    """Capture frames of videos into files.
+
+       capture() grabs the frame shown by a libvlc player and leaves its
+       naming, which may need the probe of the video, and its post-processing
+       to the CaptureQueue workers.  save() takes a frame decoded elsewhere
+       (burst, tools), reserves its output path at once and returns it.
+       Errors of the workers are put on the errors queue.  Files are named
+       after template (see output_names, ValueError here if it is invalid
+       rather than on each capture), instance is the vlc.Instance the
+       frames are grabbed with, None to use snapshots only.  Near duplicates
+       of the interactive captures are handled according to the duplicates
+       mode (see dedup), the frames given to save() are not checked.  The
+       saved captures are counted in catalog, a video_catalog.Catalog, if
+       given.
+    """
+
+    def __init__(self, instance=None, template=None, workers=DEFAULT_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, on_change=None, duplicates=dedup.DEFAULT_MODE,
+                 catalog=None):
+        output_names.check_template(template or output_names.DEFAULT_TEMPLATE or output_names.QT_TEMPLATE)
+        self.template = template
+        self.duplicates = duplicates
+        self.catalog = catalog
+        self.grabber = new_frame_grabber(instance) if instance is not None else None
+        self.queue = CaptureQueue(workers, max_pending, on_change)
+
+    @property
+    def pending(self):
+        return self.queue.pending
+
+    @property
+    def errors(self):
+        return self.queue.errors
+
+    def _postprocess(self, path_out, video_path, *args):
+        """postprocess_capture, then count the saved capture in the catalog."""
+        try:
+            postprocess_capture(path_out, video_path, *args)
+        except dedup.DuplicateCapture as e:
+            if not e.skipped:
+                self.catalog.add_capture(video_path)
+            raise
+        self.catalog.add_capture(video_path)
+
+    @property
+    def _job(self):
+        return postprocess_capture if self.catalog is None else self._postprocess
+
+    def reserve(self, out_dir, video_path, video_mtime, encoder, time_ms=None, frame=None):
+        return capture_path(out_dir, video_path, video_mtime, encoder.extension, self.template,
+                            time_ms, frame)
+
+    def _capture(self, out_dir, video_path, video_mtime, encoder, time_ms, frame, img, snapshot,
+                 duplicates):
+        """Worker side of capture(): name the frame img, or the one saved to
+           the temporary file snapshot, and post-process it.
+        """
+        try:
+            with profiling.span('capture.name'):
+                path_out = self.reserve(out_dir, video_path, video_mtime, encoder, time_ms, frame)
+            if img is None:
+                with profiling.span('capture.read'):
+                    img = Image.open(snapshot)
+                    img.load()
+        finally:
+            os.remove(snapshot)
+        self._job(path_out, video_path, video_mtime, img, encoder, duplicates)
+
+    def capture(self, player, video_path, out_dir, encoder=None, time_ms=None, frame=None,
+                video_mtime=None):
+        """Capture the frame of video_path shown by player, or the one at
+           time_ms (exact frame when stepping), into out_dir.  Its name is
+           chosen by the workers, nothing here waits for ffprobe.
+        """
+        encoder = encoder or encoders.Encoder()
+        if video_mtime is None:
+            video_mtime = os.path.getmtime(video_path)
+        if time_ms is None:
+            time_ms = max(0, player.get_time())
+        with profiling.span('capture.gui'):
+            snapshot = snapshot_path()
+            img = grab_frame(self.grabber, player, video_path, snapshot, time_ms)
+            with profiling.span('capture.submit'):
+                self.queue.submit(self._capture, out_dir, video_path, video_mtime, encoder, time_ms,
+                                  frame, img, snapshot, self.duplicates)
+
+    def save(self, img, video_path, out_dir, encoder=None, time_ms=None, frame=None,
+             video_mtime=None):
+        """Queue the decoded frame img of video_path, blocks while the
+           workers are saturated.
+        """
+        encoder = encoder or encoders.Encoder()
+        if video_mtime is None:
+            video_mtime = os.path.getmtime(video_path)
+        path_out = self.reserve(out_dir, video_path, video_mtime, encoder, time_ms, frame)
+        self.queue.submit(self._job, path_out, video_path, video_mtime, img, encoder)
+        return path_out
+
+    def join(self):
+        """Wait for the captures queued so far."""
+        self.queue.join()
+
+    def close(self, wait=True):
+        """Stop the workers, by default after the pending captures are done."""
+        self.queue.close(wait)
+        if self.grabber is not None:
+            self.grabber.close()
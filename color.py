@@ -0,0 +1,232 @@
+"""Color management of the captured frames.
+
+Decoded frames are RGB in the primaries and transfer function of the video.
+The color metadata probed from the stream (see probe_cache) selects what is
+done to them:
+
+- BT.709 (and SD) video is saved untagged, which viewers read as sRGB.
+- Display P3 video is tagged with the bundled Display P3 profile.
+- BT.2020 video is converted to Display P3 (tagged), PQ and HLG video is
+  tone-mapped to SDR on the way.
+
+With the 'srgb' target (SCREENSHOTER_COLOR_TARGET=srgb) every capture is
+converted to sRGB and saved untagged, for tools that ignore ICC profiles.
+
+Profiles, ImageCms transforms and tone-map LUTs are built once per process
+and cached, a capture only runs the (C) transform over its pixels.
+"""
+import functools
+import math
+import os
+
+from PIL import ImageCms
+from PIL import ImageFilter
+
+ICC_DISPLAY_P3 = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                              "DisplayP3Compat-v4.icc")
+
+TARGETS = ('native', 'srgb')
+DEFAULT_TARGET = os.environ.get('SCREENSHOTER_COLOR_TARGET', 'native')
+
+# Source color spaces
+BT709 = 'bt709'
+DISPLAY_P3 = 'display-p3'
+BT2020 = 'bt2020'
+BT2020_PQ = 'bt2020-pq'
+BT2020_HLG = 'bt2020-hlg'
+
+# CIE xy of the red, green and blue primaries and of the white point
+CHROMATICITIES = {
+    BT709: ((0.640, 0.330), (0.300, 0.600), (0.150, 0.060), (0.3127, 0.3290)),
+    DISPLAY_P3: ((0.680, 0.320), (0.265, 0.690), (0.150, 0.060), (0.3127, 0.3290)),
+    BT2020: ((0.708, 0.292), (0.170, 0.797), (0.131, 0.046), (0.3127, 0.3290)),
+}
+
+SDR_WHITE_NITS = 203.0  # BT.2408 reference white of HDR video
+HDR_PEAK_NITS = 1000.0  # assumed mastering peak, the usual value for PQ and HLG
+TONE_MAP_KNEE = 0.5
+LUT_SIZE = 33
+
+
+def source_space(meta):
+    """Color space of the frames of a video from its probed metadata."""
+    transfer = meta.get('color_transfer')
+    primaries = meta.get('color_primaries')
+    if transfer == 'smpte2084':
+        return BT2020_PQ
+    if transfer == 'arib-std-b67':
+        return BT2020_HLG
+    if primaries == 'bt2020':
+        return BT2020
+    if primaries in ('smpte432', 'smpte431'):
+        return DISPLAY_P3
+    if primaries in (None, '', 'unknown') and meta.get('codec') == 'hevc':
+        # untagged HEVC, historically captured from P3 phone footage
+        return DISPLAY_P3
+    return BT709
+
+
+@functools.lru_cache(maxsize=None)
+def profile(space):
+    """ImageCms profile of an output space, loaded once."""
+    if space == DISPLAY_P3:
+        return ImageCms.getOpenProfile(ICC_DISPLAY_P3)
+    return ImageCms.createProfile('sRGB')
+
+
+@functools.lru_cache(maxsize=None)
+def icc_bytes(space):
+    return profile(space).tobytes()
+
+
+@functools.lru_cache(maxsize=None)
+def transform(source, target):
+    """ImageCms RGB to RGB transform between two profiles, built once."""
+    return ImageCms.buildTransform(profile(source), profile(target), 'RGB', 'RGB')
+
+
+def _rgb_to_xyz(space):
+    """3x3 matrix from linear RGB of space to CIE XYZ."""
+    columns = [(x / y, 1.0, (1.0 - x - y) / y) for x, y in CHROMATICITIES[space][:3]]
+    wx, wy = CHROMATICITIES[space][3]
+    white = (wx / wy, 1.0, (1.0 - wx - wy) / wy)
+    scale = _solve(_transpose(columns), white)
+    return [[columns[j][i] * scale[j] for j in range(3)] for i in range(3)]
+
+
+def _transpose(m):
+    return [list(row) for row in zip(*m)]
+
+
+def _det(m):
+    return (m[0][0] * (m[1][1] * m[2][2] - m[1][2] * m[2][1])
+            - m[0][1] * (m[1][0] * m[2][2] - m[1][2] * m[2][0])
+            + m[0][2] * (m[1][0] * m[2][1] - m[1][1] * m[2][0]))
+
+
+def _solve(m, v):
+    """x such that m x = v (Cramer's rule)."""
+    d = _det(m)
+    result = []
+    for i in range(3):
+        mi = [row[:] for row in m]
+        for r in range(3):
+            mi[r][i] = v[r]
+        result.append(_det(mi) / d)
+    return result
+
+
+def _inverse(m):
+    columns = [_solve(m, e) for e in ((1, 0, 0), (0, 1, 0), (0, 0, 1))]
+    return _transpose(columns)
+
+
+def _multiply(a, b):
+    return [[sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)] for i in range(3)]
+
+
+def conversion_matrix(source, target):
+    """3x3 matrix from linear RGB of source to linear RGB of target."""
+    return _multiply(_inverse(_rgb_to_xyz(target)), _rgb_to_xyz(source))
+
+
+def pq_eotf(e):
+    """Nits of a PQ (SMPTE ST 2084) code value in [0, 1]."""
+    m1, m2 = 2610.0 / 16384, 2523.0 / 4096 * 128
+    c1, c2, c3 = 3424.0 / 4096, 2413.0 / 4096 * 32, 2392.0 / 4096 * 32
+    p = e ** (1.0 / m2)
+    return 10000.0 * (max(p - c1, 0.0) / (c2 - c3 * p)) ** (1.0 / m1)
+
+
+def hlg_inverse_oetf(e):
+    """Relative scene light of an HLG (ARIB STD-B67) code value in [0, 1]."""
+    a, b, c = 0.17883277, 0.28466892, 0.55991073
+    if e <= 0.5:
+        return e * e / 3.0
+    return (math.exp((e - c) / a) + b) / 12.0
+
+
+def srgb_oetf(v):
+    """sRGB code value in [0, 1] of a linear value in [0, 1]."""
+    if v <= 0.0031308:
+        return 12.92 * v
+    return 1.055 * v ** (1 / 2.4) - 0.055
+
+
+def bt1886_eotf(e):
+    return e ** 2.4
+
+
+def tone_map(luminance, peak=HDR_PEAK_NITS / SDR_WHITE_NITS, knee=TONE_MAP_KNEE):
+    """Luminance relative to SDR white, compressed to [0, 1] above knee.
+
+       Below knee the curve is the identity, above it an extended Reinhard
+       curve with the same slope at the knee maps peak to 1.
+    """
+    if luminance <= knee:
+        return luminance
+    span = 1.0 - knee
+    y = (luminance - knee) / span
+    white = (peak - knee) / span
+    return knee + span * y * (1.0 + y / (white * white)) / (1.0 + y)
+
+
+def _bt2020_luminance(r, g, b):
+    return 0.2627 * r + 0.6780 * g + 0.0593 * b
+
+
+def _bt2020_converter(space, matrix):
+    """Callback of Color3DLUT.generate: BT.2020 code values of space to
+       sRGB-encoded code values of the primaries of matrix.
+    """
+
+    def linearize(r, g, b):
+        """Linear light, SDR white relative."""
+        if space == BT2020_PQ:
+            return [pq_eotf(v) / SDR_WHITE_NITS for v in (r, g, b)]
+        if space == BT2020_HLG:
+            scene = [hlg_inverse_oetf(v) for v in (r, g, b)]
+            # HLG OOTF of a 1000 nits display, system gamma 1.2
+            gain = HDR_PEAK_NITS * _bt2020_luminance(*scene) ** 0.2 / SDR_WHITE_NITS
+            return [gain * v for v in scene]
+        return [bt1886_eotf(v) for v in (r, g, b)]
+
+    def convert(r, g, b):
+        rgb = linearize(r, g, b)
+        y = _bt2020_luminance(*rgb)
+        if space != BT2020 and y > 0:
+            ratio = tone_map(y) / y
+            rgb = [v * ratio for v in rgb]
+        out = [sum(matrix[i][j] * rgb[j] for j in range(3)) for i in range(3)]
+        return tuple(srgb_oetf(min(max(v, 0.0), 1.0)) for v in out)
+
+    return convert
+
+
+@functools.lru_cache(maxsize=None)
+def lut(source, target):
+    """Color3DLUT converting the frames of a BT.2020 source (SDR, PQ or HLG)
+       to target, built once.
+    """
+    matrix = conversion_matrix(BT2020, target)
+    return ImageFilter.Color3DLUT.generate(LUT_SIZE, _bt2020_converter(source, matrix))
+
+
+def prepare(img, meta, target=DEFAULT_TARGET):
+    """Convert the frame img of a video with metadata meta for saving.
+
+       Returns (image, ICC profile bytes or None).
+    """
+    source = source_space(meta)
+    if source == BT709:
+        return img, None
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    if source == DISPLAY_P3:
+        if target == 'srgb':
+            return ImageCms.applyTransform(img, transform(DISPLAY_P3, BT709)), None
+        return img, icc_bytes(DISPLAY_P3)
+    # BT.2020, SDR or HDR
+    output = BT709 if target == 'srgb' else DISPLAY_P3
+    img = img.filter(lut(source, output))
+    return img, None if output == BT709 else icc_bytes(DISPLAY_P3)
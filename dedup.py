@@ -0,0 +1,149 @@
+"""Detection of near-duplicate captures with a perceptual hash.
+
+Each capture gets a 64 bits difference hash (dHash): the frame is reduced
+to 9x8 gray pixels and every bit tells whether a pixel is brighter than its
+right neighbour.  Two frames that look alike have hashes a few bits apart
+(Hamming distance), whatever their encoding, size or small noise.
+
+The hashes of the captures of an output folder are appended to
+capture_hashes.txt in that folder, so the index survives sessions, and are
+kept in memory in a multi-index hash table: the hash is split in
+max_distance + 1 chunks, and a hash within max_distance bits of another one
+has at least one identical chunk (pigeonhole).  A lookup only compares the
+hashes sharing a chunk, which stays fast with 100k captures.
+"""
+import os
+import threading
+
+INDEX_NAME = 'capture_hashes.txt'
+HASH_BITS = 64
+
+# 'off', 'flag' (saved and reported) or 'skip' (not saved)
+DEFAULT_MODE = os.environ.get('SCREENSHOTER_DUPLICATES', 'flag')
+DEFAULT_MAX_DISTANCE = int(os.environ.get('SCREENSHOTER_DUPLICATE_DISTANCE', 4))
+
+
+class DuplicateCapture(Exception):
+    """A capture looks like duplicate_of, an existing capture of its folder."""
+
+    def __init__(self, path, duplicate_of, skipped):
+        super().__init__('%s is a near duplicate of %s%s' % (
+            os.path.basename(path), duplicate_of, ', not saved' if skipped else ''))
+        self.path = path
+        self.duplicate_of = duplicate_of
+        self.skipped = skipped
+
+
+def dhash(img):
+    """64 bits difference hash of img, as an int."""
+    from PIL import Image
+    pixels = list(img.resize((9, 8), Image.Resampling.BOX).convert('L').getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            i = row * 9 + col
+            value = value << 1 | (pixels[i] > pixels[i + 1])
+    return value
+
+
+def distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class HashIndex(object):
+    """Hashes of the captures of directory, persisted in INDEX_NAME."""
+
+    def __init__(self, directory, max_distance=DEFAULT_MAX_DISTANCE):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_NAME)
+        self.max_distance = max_distance
+        chunks = min(max_distance + 1, HASH_BITS)
+        # (shift, mask) of each chunk, chunk sizes differ by at most one bit
+        bounds = [HASH_BITS * i // chunks for i in range(chunks + 1)]
+        self._chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self._tables = [{} for _ in self._chunks]  # chunk value -> [entry number]
+        self._hashes = []
+        self._names = []
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    value, _, name = line.rstrip('\n').partition(' ')
+                    try:
+                        self._insert(int(value, 16), name)
+                    except ValueError:
+                        pass  # truncated line
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _insert(self, value, name):
+        n = len(self._hashes)
+        self._hashes.append(value)
+        self._names.append(name)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault(value >> shift & mask, []).append(n)
+
+    def _find(self, value):
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for n in table.get(value >> shift & mask, ()):
+                if n in seen:
+                    continue
+                seen.add(n)
+                d = distance(value, self._hashes[n])
+                if d < best_distance and os.path.exists(os.path.join(self.directory, self._names[n])):
+                    best, best_distance = self._names[n], d
+        return best
+
+    def find(self, value):
+        """Name of the closest capture within max_distance of value, or None."""
+        with self._lock:
+            return self._find(value)
+
+    def add(self, value, name, keep_duplicate=True):
+        """Look value up and record it for name, atomically.
+
+           Returns the name of a near duplicate or None.  With keep_duplicate
+           False a duplicate is not recorded.
+        """
+        with self._lock:
+            duplicate_of = self._find(value)
+            if duplicate_of is None or keep_duplicate:
+                self._insert(value, name)
+                with open(self.path, 'a') as f:
+                    f.write('%016x %s\n' % (value, name))
+            return duplicate_of
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(directory):
+    """HashIndex of directory, loaded on first use in this process."""
+    key = os.path.realpath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = HashIndex(directory)
+    return index
+
+
+def check_capture(img, path_out, mode=DEFAULT_MODE):
+    """Hash the frame img about to be saved to path_out and record it in
+       the index of its folder.
+
+       Raises DuplicateCapture in 'skip' mode if it is a near duplicate,
+       returns the name of the duplicate (or None) otherwise.
+    """
+    if mode == 'off':
+        return None
+    directory, name = os.path.split(path_out)
+    duplicate_of = index_for(directory).add(dhash(img), name, keep_duplicate=mode != 'skip')
+    if duplicate_of is not None and mode == 'skip':
+        raise DuplicateCapture(path_out, duplicate_of, skipped=True)
+    return duplicate_of
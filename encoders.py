@@ -0,0 +1,130 @@
+"""Output image formats of the captures.
+
+An encoder is described by a short spec: 'png' or 'png:<compress level 0-9>',
+'jpeg:<quality 0-100>', 'webp:<quality 0-100>' and 'webp-lossless'.  PNG at Pillow's
+default level is the historical format, the others trade size or
+losslessness for speed.  Every format keeps the ICC profile given to save().
+
+With exif_orientation the frames of rotated videos are saved as decoded
+and tagged with their EXIF Orientation, instead of being transposed
+(SCREENSHOTER_ORIENTATION=exif makes it the default).
+"""
+import argparse
+import io
+import os
+import time
+
+DEFAULT_SPEC = os.environ.get('SCREENSHOTER_FORMAT', 'png')
+DEFAULT_EXIF_ORIENTATION = os.environ.get('SCREENSHOTER_ORIENTATION', 'pixels') == 'exif'
+
+# Choices offered by the front-ends, (label, spec)
+PRESETS = [
+    ('PNG', 'png'),
+    ('PNG, fast', 'png:1'),
+    ('JPEG 95', 'jpeg:95'),
+    ('JPEG 85', 'jpeg:85'),
+    ('WebP 90', 'webp:90'),
+    ('WebP lossless', 'webp-lossless'),
+]
+
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp', 'webp-lossless': '.webp'}
+# Valid values of the level of each format: compress level or quality
+LEVELS = {'png': range(0, 10), 'jpeg': range(0, 101), 'webp': range(0, 101)}
+DEFAULT_QUALITY = 90
+
+
+class Encoder(object):
+
+    def __init__(self, spec=DEFAULT_SPEC, exif_orientation=DEFAULT_EXIF_ORIENTATION):
+        self.spec = spec
+        self.exif_orientation = exif_orientation
+        name, _, level = spec.lower().partition(':')
+        if name == 'jpg':
+            name = 'jpeg'
+        if name not in EXTENSIONS:
+            raise ValueError('unknown image format: %r' % (spec,))
+        self.format = name
+        self.level = None
+        if level:
+            try:
+                self.level = int(level)
+            except ValueError:
+                raise ValueError('invalid level in image format %r' % (spec,))
+            levels = LEVELS.get(name)
+            if levels is None:
+                raise ValueError('image format %r takes no level' % (spec,))
+            if self.level not in levels:
+                raise ValueError('level of image format %r must be within %d-%d'
+                                 % (spec, levels[0], levels[-1]))
+        self.extension = EXTENSIONS[name]
+
+    def __repr__(self):
+        return 'Encoder(%r)' % (self.spec,)
+
+    def options(self):
+        """Keyword arguments of Image.save() for this format."""
+        if self.format == 'png':
+            if self.level is None:
+                return {'format': 'PNG'}
+            return {'format': 'PNG', 'compress_level': self.level}
+        if self.format == 'jpeg':
+            quality = DEFAULT_QUALITY if self.level is None else self.level
+            # keep the full chroma resolution at high qualities
+            return {'format': 'JPEG', 'quality': quality, 'subsampling': 0 if quality >= 90 else 2}
+        if self.format == 'webp':
+            return {'format': 'WEBP', 'quality': DEFAULT_QUALITY if self.level is None else self.level,
+                    'method': 0}
+        return {'format': 'WEBP', 'lossless': True, 'quality': 0, 'method': 0}
+
+    def save(self, img, fp, icc_profile=None, **extra):
+        """Encode img to the path or file object fp."""
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        options = self.options()
+        options.update(extra)
+        if icc_profile is not None:
+            options['icc_profile'] = icc_profile
+        img.save(fp, **options)
+
+
+def sample_frame(width=3840, height=2160):
+    """Synthetic frame with gradients and noise, a worst case for PNG."""
+    from PIL import Image
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 32)
+    return Image.merge('RGB', (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+
+
+def benchmark(img, specs=None, repeat=3, icc_profile=None):
+    """Encode img with each spec, return [(spec, best seconds, bytes)]."""
+    results = []
+    for spec in specs or [spec for _, spec in PRESETS]:
+        encoder = Encoder(spec)
+        best, size = None, 0
+        for _ in range(repeat):
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            encoder.save(img, buffer, icc_profile)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+            size = buffer.tell()
+        results.append((spec, best, size))
+    return results
+
+
+def main(argv=None):
+    """--bench-encoders [image]: encode time and size of each preset."""
+    parser = argparse.ArgumentParser(prog='video_player.py --bench-encoders',
+                                     description='Compare the capture output formats.')
+    parser.add_argument('image', nargs='?', help='sample frame (default: synthetic 3840x2160)')
+    parser.add_argument('--format', action='append', dest='specs', help='spec to test (repeatable)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    from PIL import Image
+    img = Image.open(args.image).convert('RGB') if args.image else sample_frame()
+    print('%dx%d frame, best of %d' % (img.width, img.height, args.repeat))
+    print('%-16s %10s %12s' % ('format', 'encode ms', 'bytes'))
+    for spec, seconds, size in benchmark(img, args.specs, args.repeat):
+        print('%-16s %10.1f %12d' % (spec, seconds * 1000, size))
+    return 0
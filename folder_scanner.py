@@ -0,0 +1,112 @@
+"""Streaming, cancellable scan of a folder for video files.
+
+os.scandir() gives the file type without an extra stat and caches the stat
+result on the DirEntry, so each file costs at most one stat call.  The
+FolderScanner thread delivers the results in chunks so the front-ends can
+fill their list while the scan is still running.
+"""
+import bisect
+import os
+import threading
+import time
+
+import profiling
+
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv']
+
+
+def scan(folder_path, extensions=VIDEO_EXTENSIONS, recursive=False, cancel=None, chunk_size=256,
+         details=False):
+    """Yield lists of (path, mtime) of the videos in folder_path, in
+       directory order, or of (path, mtime, size, mtime_ns) with details.
+       Stops early once the cancel event is set.
+    """
+    extensions = tuple(e.lower() for e in extensions)
+    folders = [folder_path]
+    chunk = []
+    while folders:
+        try:
+            it = os.scandir(folders.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if cancel is not None and cancel.is_set():
+                    return
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith('.'):
+                            folders.append(entry.path)
+                    elif entry.name.lower().endswith(extensions):
+                        st = entry.stat()
+                        chunk.append((entry.path, st.st_mtime, st.st_size, st.st_mtime_ns) if details
+                                     else (entry.path, st.st_mtime))
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                except OSError:  # vanished or unreadable entry
+                    continue
+    if chunk:
+        yield chunk
+
+
+def insert_sorted(items, mtimes, item, mtime):
+    """Insert item into items, kept oldest first, mtimes being the parallel
+       list of the modification times.  Returns the index of the new item.
+    """
+    index = bisect.bisect_right(mtimes, mtime)
+    mtimes.insert(index, mtime)
+    items.insert(index, item)
+    return index
+
+
+def find_sorted(items, mtimes, mtime, path, path_of):
+    """Index of the item of path in a list kept by insert_sorted, or -1."""
+    index = bisect.bisect_left(mtimes, mtime)
+    while index < len(items) and mtimes[index] == mtime:
+        if path_of(items[index]) == path:
+            return index
+        index += 1
+    return -1
+
+
+class FolderScanner(threading.Thread):
+    """Run scan() in the background.
+
+       on_chunk(scanner, chunk) and on_done(scanner) are called from the
+       scanner thread, front-ends must marshal them onto their event loop
+       and ignore calls from a scanner that is not the current one.
+    """
+
+    def __init__(self, folder_path, on_chunk, on_done=None, extensions=VIDEO_EXTENSIONS,
+                 recursive=False, chunk_size=256):
+        super().__init__(name='folder-scanner', daemon=True)
+        self.folder_path = folder_path
+        self.on_chunk = on_chunk
+        self.on_done = on_done
+        self.extensions = extensions
+        self.recursive = recursive
+        self.chunk_size = chunk_size
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        start = last = time.perf_counter()
+        count = 0
+        for chunk in scan(self.folder_path, self.extensions, self.recursive,
+                          self._cancel, self.chunk_size):
+            now = time.perf_counter()
+            profiling.record('scan.chunk', now - last, files=len(chunk))
+            count += len(chunk)
+            self.on_chunk(self, chunk)
+            last = time.perf_counter()
+        profiling.record('scan.folder', time.perf_counter() - start, files=count,
+                         cancelled=self.cancelled)
+        if self.on_done and not self.cancelled:
+            self.on_done(self)
@@ -0,0 +1,226 @@
+"""Watch a video folder for new, changed and deleted files.
+
+On Linux the kernel notifies us through inotify (used through ctypes, no
+extra dependency).  Elsewhere, or for network file systems where inotify
+does not see changes made by other machines, the folder is re-scanned
+periodically and compared with the previous scan.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+
+import folder_scanner
+
+IN_MODIFY      = 0x00000002
+IN_ATTRIB      = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+IN_NONBLOCK    = 0o4000
+IN_CLOEXEC     = 0o2000000
+
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+# inotify only sees the changes made through this machine's kernel
+NETWORK_FILESYSTEMS = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs', 'afpfs', '9p')
+
+
+def _filesystem_type(path):
+    """File system type of the mount holding path, from /proc/mounts."""
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                        and len(mount_point) >= len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        pass
+    return fstype
+
+
+def _load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def apply_changes(items, mtimes, by_path, updated, removed, make_item, path_of, sort_key=None):
+    """Apply the changes of FolderWatcher to a list sorted with
+       folder_scanner.insert_sorted, by_path mapping each path to its mtime,
+       or to its sort_key(mtime) for a list kept in another order.
+
+       Returns the list operations in order, ('remove', index) and
+       ('insert', index, item), so the widget can mirror them.
+    """
+    operations = []
+
+    def remove(path):
+        index = folder_scanner.find_sorted(items, mtimes, by_path.pop(path), path, path_of)
+        if index >= 0:
+            del items[index], mtimes[index]
+            operations.append(('remove', index))
+
+    if removed is None:
+        keep = set(path for path, _ in updated)
+        removed = [path for path in by_path if path not in keep]
+    for path in removed:
+        if path in by_path:
+            remove(path)
+    for path, mtime in updated:
+        key = sort_key(mtime) if sort_key else mtime
+        if by_path.get(path) == key:
+            continue
+        if path in by_path:
+            remove(path)
+        item = make_item(path, mtime)
+        by_path[path] = key
+        operations.append(('insert', folder_scanner.insert_sorted(items, mtimes, item, key), item))
+    return operations
+
+
+class FolderWatcher(threading.Thread):
+    """Report changes of the videos in folder_path.
+
+       on_changes(watcher, updated, removed) is called from the watcher
+       thread with updated, a list of (path, mtime) of files that are new or
+       changed, and removed, a list of paths.  removed is None when events
+       were lost and updated holds the whole folder, every other file has
+       to be dropped.  Front-ends must marshal it onto their event loop,
+       see apply_changes().
+    """
+
+    def __init__(self, folder_path, on_changes, extensions=folder_scanner.VIDEO_EXTENSIONS,
+                 recursive=False, interval=2.0, polling=None):
+        super().__init__(name='folder-watcher', daemon=True)
+        self.folder_path = folder_path
+        self.on_changes = on_changes
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.recursive = recursive
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._libc = None
+        if not polling and _filesystem_type(folder_path) not in NETWORK_FILESYSTEMS:
+            self._libc = _load_libc()
+
+    @property
+    def polling(self):
+        return self._libc is None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                try:
+                    self._run_inotify(fd)
+                finally:
+                    os.close(fd)
+                return
+        self._run_polling()
+
+    def _is_video(self, name):
+        return name.lower().endswith(self.extensions)
+
+    def _snapshot(self):
+        return {path: mtime
+                for chunk in folder_scanner.scan(self.folder_path, self.extensions, self.recursive, self._stop_event)
+                for path, mtime in chunk}
+
+    def _run_polling(self):
+        previous = self._snapshot()
+        while not self._stop_event.wait(self.interval):
+            current = self._snapshot()
+            if self._stop_event.is_set():
+                break
+            updated = [(path, mtime) for path, mtime in current.items() if previous.get(path) != mtime]
+            removed = [path for path in previous if path not in current]
+            previous = current
+            if updated or removed:
+                self.on_changes(self, updated, removed)
+
+    def _add_watch(self, fd, watches, folder):
+        wd = self._libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK)
+        if wd >= 0:
+            watches[wd] = folder
+        if self.recursive:
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.'):
+                            self._add_watch(fd, watches, entry.path)
+            except OSError:
+                pass
+
+    def _run_inotify(self, fd):
+        watches = {}
+        self._add_watch(fd, watches, self.folder_path)
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            updated, removed = {}, set()
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode(errors='surrogateescape')
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost, fall back to a full comparison
+                    self.on_changes(self, list(self._snapshot().items()), None)
+                    continue
+                folder = watches.get(wd)
+                if folder is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF):
+                    watches.pop(wd, None)
+                    continue
+                path = os.path.join(folder, name)
+                if mask & IN_ISDIR:
+                    if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_watch(fd, watches, path)
+                    continue
+                if not self._is_video(name):
+                    continue
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    updated.pop(path, None)
+                    removed.add(path)
+                elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB):
+                    # IN_CREATE is ignored, the file is complete on close
+                    try:
+                        updated[path] = os.stat(path).st_mtime
+                        removed.discard(path)
+                    except OSError:
+                        pass
+            if updated or removed:
+                self.on_changes(self, list(updated.items()), list(removed))
@@ -0,0 +1,120 @@
+"""Grab decoded frames into memory through the libvlc video callbacks.
+
+video_take_snapshot() makes VLC encode a PNG that we then have to decode,
+rotate and encode again.  The FrameGrabber owns a hidden media player on the
+same vlc.Instance whose video output is redirected to a memory buffer with
+video_set_format()/video_set_callbacks(), so the frame at a given time is
+returned as a PIL image and is encoded exactly once by the caller.
+"""
+import ctypes
+import threading
+
+import vlc
+from PIL import Image
+
+# 32 bits per pixel, the byte order in memory is B, G, R, X
+CHROMA = 'RV32'
+BYTES_PER_PIXEL = 4
+# A warm seek is done once the player reports a time this close to the target
+SEEK_TOLERANCE_MS = 100
+
+
+class FrameGrabber(object):
+    """Decode single frames of a file with a hidden, reusable media player."""
+
+    def __init__(self, instance, timeout=2.0):
+        self.instance = instance
+        self.timeout = timeout
+        self.player = None
+        self._path = None
+        self._size = None
+        self._buffer = None
+        self._frame = None
+        self._target = None
+        self._seeked = threading.Event()
+        self._wanted = threading.Event()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+        # Keep references to the ctypes callbacks, they must outlive the player
+        self._lock_cb = vlc.CallbackDecorators.VideoLockCb(self._on_lock)
+        self._unlock_cb = vlc.CallbackDecorators.VideoUnlockCb(self._on_unlock)
+        self._display_cb = vlc.CallbackDecorators.VideoDisplayCb(self._on_display)
+
+    def _on_lock(self, opaque, planes):
+        planes[0] = ctypes.cast(self._buffer, ctypes.c_void_p)
+        return None
+
+    def _on_unlock(self, opaque, picture, planes):
+        pass
+
+    def _on_time(self, event):
+        # Called on a VLC thread, the pictures displayed before the player
+        # reaches the target of a seek are the ones decoded before it
+        if self._target is not None and abs(event.u.new_time - self._target) <= SEEK_TOLERANCE_MS:
+            self._seeked.set()
+
+    def _on_display(self, opaque, picture):
+        # Called on a VLC thread for every decoded picture
+        if self._wanted.is_set() and self._seeked.is_set():
+            self._wanted.clear()
+            width, height = self._size
+            self._frame = Image.frombuffer('RGB', (width, height), bytes(self._buffer), 'raw',
+                                           'BGRX', width * BYTES_PER_PIXEL, 1)
+            self._ready.set()
+
+    def _open(self, video_path, time_ms, width, height):
+        if self.player is not None:
+            self.player.stop()
+            self.player.release()
+        self._size = (width, height)
+        self._buffer = ctypes.create_string_buffer(width * height * BYTES_PER_PIXEL)
+        self.player = self.instance.media_player_new()
+        self.player.video_set_callbacks(self._lock_cb, self._unlock_cb, self._display_cb, None)
+        self.player.video_set_format(CHROMA, width, height, width * BYTES_PER_PIXEL)
+        self.player.event_manager().event_attach(vlc.EventType.MediaPlayerTimeChanged, self._on_time)
+        media = self.instance.media_new(str(video_path))
+        media.add_option(':no-audio')
+        media.add_option(':start-time=%.3f' % (time_ms / 1000.0))
+        self.player.set_media(media)
+        self._path = video_path
+        self._seeked.set()  # the first picture is already at start-time
+        self._wanted.set()
+        self.player.play()
+
+    def grab(self, video_path, time_ms, width, height):
+        """Return the frame of video_path shown at time_ms as an RGB image,
+           width and height are the coded (not rotated) size of the video.
+           Returns None if no frame was decoded within the timeout.
+        """
+        if width <= 0 or height <= 0:
+            return None
+        with self._lock:
+            self._ready.clear()
+            self._frame = None
+            if self._path == video_path and self._size == (width, height) and self.player is not None:
+                # Warm player, paused on a previous frame: seek and play until
+                # the first picture after the seek
+                self._seeked.clear()
+                self._target = int(time_ms)
+                self._wanted.set()
+                self.player.set_time(int(time_ms))
+                self.player.set_pause(0)
+            else:
+                self._open(video_path, time_ms, width, height)
+            ready = self._ready.wait(self.timeout)
+            self._target = None
+            if not ready:
+                self._wanted.clear()
+                self._path = None  # reopen next time
+                return None
+            self.player.set_pause(1)
+            return self._frame
+
+    def close(self):
+        with self._lock:
+            if self.player is not None:
+                self.player.stop()
+                self.player.release()
+                self.player = None
+            self._path = None
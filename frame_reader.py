@@ -0,0 +1,79 @@
+"""Decode frames with ffmpeg into memory, without libvlc.
+
+Used by the headless tools.  Frames are decoded with -noautorotate so they
+come out in the coded orientation, exactly like VLC snapshots, and the same
+rotation logic of capture_pipeline applies to both.  Thumbnails are meant
+for display and are rotated by ffmpeg.
+
+ffmpeg-python and Pillow are imported on first use, the front-ends import
+this module at startup for the thumbnails.
+"""
+
+
+def read_frame(video_path, time_s, width, height):
+    """Return the frame of video_path at time_s seconds as an RGB image,
+       width and height are the coded size of the video.
+    """
+    import ffmpeg
+    from PIL import Image
+    out, _ = (
+        ffmpeg
+        .input(video_path, ss='%.3f' % time_s, noautorotate=None)
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', vframes=1)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    if len(out) < width * height * 3:
+        raise ValueError('no frame at %.3fs in %s' % (time_s, video_path))
+    return Image.frombytes('RGB', (width, height), out[:width * height * 3])
+
+
+def read_thumbnail(video_path, width, time_s=1.0):
+    """Return a JPEG poster frame of video_path, width pixels wide, taken
+       at time_s seconds or at the first frame for shorter videos.
+    """
+    import ffmpeg
+    for t in (time_s, 0):
+        out, _ = (
+            ffmpeg
+            .input(video_path, ss='%.3f' % t)
+            .output('pipe:', format='image2pipe', vcodec='mjpeg', vframes=1,
+                    vf='scale=%d:-2' % width, **{'q:v': 5})
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        if out:
+            return out
+    raise ValueError('no frame in %s' % (video_path,))
+
+
+def iter_frames(video_path, start_s, end_s, stride, width, height):
+    """Decode video_path sequentially from start_s to end_s seconds and
+       yield (n, image) for every stride-th frame, n counting the decoded
+       frames from start_s.  A single decoder runs for the whole range, no
+       frame is sought individually.  ValueError if the size is not
+       positive (not probed), no frame could be read.
+    """
+    import ffmpeg
+    from PIL import Image
+    if width <= 0 or height <= 0:
+        raise ValueError('unknown frame size %dx%d of %s' % (width, height, video_path))
+    frame_size = width * height * 3
+    proc = (
+        ffmpeg
+        .input(video_path, ss='%.3f' % start_s, t='%.3f' % max(0, end_s - start_s), noautorotate=None)
+        .output('pipe:', format='rawvideo', pix_fmt='rgb24', vsync=0,
+                vf="select='not(mod(n\\,%d))'" % stride)
+        .global_args('-loglevel', 'error', '-nostats')
+        .run_async(pipe_stdout=True)
+    )
+    try:
+        n = 0
+        while True:
+            data = proc.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            yield n, Image.frombytes('RGB', (width, height), data)
+            n += stride
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
@@ -0,0 +1,80 @@
+"""Frame accurate stepping through a paused libvlc media player.
+
+Forward steps use libvlc next_frame(), which decodes exactly one more
+frame.  libvlc has no previous_frame(), backward steps seek to the exact
+timestamp of the previous frame computed from the real frame rate of the
+video (see probe_cache).  The frame number is kept here so that a
+captured frame can be found again.
+
+A new video starts at DEFAULT_FPS, the front-ends probe it in background
+and give its real frame rate to set_fps() once known.
+"""
+import math
+
+DEFAULT_FPS = 25.0
+
+
+def frame_time_ms(frame, fps):
+    """Time in milliseconds at which frame is shown, rounded down so that a
+       seek to it never lands on the next frame.
+    """
+    return int(math.floor(frame * 1000.0 / fps + 1e-6))
+
+
+def frame_at(time_ms, fps):
+    """Number of the frame shown at time_ms.  The 1 ms of tolerance covers
+       the rounding down of frame_time_ms, so that
+       frame_at(frame_time_ms(n, fps), fps) == n.
+    """
+    return int(math.floor((time_ms + 1) * fps / 1000.0))
+
+
+class FrameStepper(object):
+
+    def __init__(self):
+        self.fps = DEFAULT_FPS
+        self.frame = None  # None while playing or after a seek
+
+    def reset(self):
+        """Forget the current frame, after playing or seeking."""
+        self.frame = None
+
+    def new_video(self, fps=None):
+        """Forget the current frame and the frame rate of the previous video,
+           fps is the one of the new video if known, else DEFAULT_FPS until
+           set_fps() is given it.
+        """
+        self.fps = fps or DEFAULT_FPS
+        self.frame = None
+
+    def set_fps(self, fps):
+        """Use the real frame rate of the video, found once it was probed,
+           keeping the current frame at the same time.
+        """
+        if fps and fps != self.fps:
+            if self.frame is not None:
+                self.frame = frame_at(frame_time_ms(self.frame, self.fps), fps)
+            self.fps = fps
+
+    def current_frame(self, player):
+        if self.frame is None:
+            return frame_at(max(0, player.get_time()), self.fps)
+        return self.frame
+
+    def time_ms(self):
+        """Exact time of the current frame, None if not stepping."""
+        return None if self.frame is None else frame_time_ms(self.frame, self.fps)
+
+    def step(self, player, frames):
+        """Pause and move by frames (positive or negative), returns the new
+           frame number.
+        """
+        known = self.frame is not None
+        player.set_pause(1)
+        self.frame = max(0, self.current_frame(player) + frames)
+        if known and frames == 1:
+            player.next_frame()
+        else:
+            # First step from an approximate position: land on an exact frame
+            player.set_time(frame_time_ms(self.frame, self.fps))
+        return self.frame
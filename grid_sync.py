@@ -0,0 +1,50 @@
+"""Time alignment of the videos played side by side by the grid review mode.
+
+Each video gets the wall clock time of its first frame, from the sync mode:
+  wall-clock  the modification time minus the duration: cameras write the
+              file until the end of the recording, so this is when it began
+  mtime       the modification time itself, for files stamped at the start
+  none        every video starts at the same time
+The focused tile is the master, the others are positioned at the same wall
+clock time and corrected only when they drift by more than DRIFT_TOLERANCE_MS,
+a seek costs more than a small offset.
+"""
+import os
+
+import probe_cache
+
+SYNC_MODES = ('wall-clock', 'mtime', 'none')
+DEFAULT_SYNC = os.environ.get('SCREENSHOTER_GRID_SYNC', 'wall-clock')
+DRIFT_TOLERANCE_MS = 250
+
+
+def durations_ms(videos):
+    """Duration (ms) of each (path, mtime) of videos, 0 if it cannot be probed."""
+    import ffmpeg
+    durations = []
+    for path, _ in videos:
+        try:
+            durations.append(int(probe_cache.get_metadata(path)['duration'] * 1000))
+        except (OSError, ValueError, ffmpeg.Error):
+            durations.append(0)
+    return durations
+
+
+def start_times(videos, durations, mode=DEFAULT_SYNC):
+    """Wall clock time (seconds) of the first frame of each (path, mtime)."""
+    if mode == 'none':
+        return [0.0] * len(videos)
+    if mode == 'mtime':
+        return [mtime for _, mtime in videos]
+    return [mtime - duration / 1000.0 for (_, mtime), duration in zip(videos, durations)]
+
+
+def tile_time(starts, master, master_ms, tile):
+    """Time (ms) of tile showing the same instant as master at master_ms,
+       negative before its first frame.
+    """
+    return int(master_ms + (starts[master] - starts[tile]) * 1000)
+
+
+def needs_seek(time_ms, target_ms, tolerance_ms=DRIFT_TOLERANCE_MS):
+    return abs(time_ms - target_ms) > tolerance_ms
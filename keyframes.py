@@ -0,0 +1,113 @@
+"""Per-file index of the keyframes of the video stream.
+
+The index is built in background from the packet flags reported by ffprobe
+(demux only, nothing is decoded) and stored with the other metadata of the
+file in probe_cache.  Seeking to a keyframe is cheap because the decoder
+does not have to decode forward from the previous one, the front-ends snap
+to the nearest keyframe while the time slider is dragged.
+"""
+import bisect
+import subprocess
+import threading
+
+import probe_cache
+
+
+class KeyframeIndex(object):
+    """Sorted keyframe times of a video, in milliseconds."""
+
+    def __init__(self, times_ms):
+        self.times_ms = times_ms
+
+    def __len__(self):
+        return len(self.times_ms)
+
+    def before(self, time_ms):
+        """Last keyframe at or before time_ms, where a decode of time_ms starts."""
+        i = bisect.bisect_right(self.times_ms, time_ms)
+        return self.times_ms[i - 1] if i else 0
+
+    def after(self, time_ms):
+        """First keyframe after time_ms, or None."""
+        i = bisect.bisect_right(self.times_ms, time_ms)
+        return self.times_ms[i] if i < len(self.times_ms) else None
+
+    def nearest(self, time_ms):
+        before, after = self.before(time_ms), self.after(time_ms)
+        if after is None or time_ms - before <= after - time_ms:
+            return before
+        return after
+
+    def decode_cost(self, time_ms):
+        """Milliseconds of video to decode to show time_ms after a seek."""
+        return time_ms - self.before(time_ms)
+
+
+def build_index(video_path):
+    """Read the keyframe times of the first video stream with ffprobe."""
+    proc = subprocess.Popen(['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                             '-show_entries', 'packet=pts_time,flags',
+                             '-of', 'csv=print_section=0', video_path],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            universal_newlines=True)
+    times_ms = []
+    for line in proc.stdout:
+        pts_time, _, flags = line.strip().partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            times_ms.append(int(round(float(pts_time) * 1000)))
+    if proc.wait():
+        raise RuntimeError('ffprobe failed on %s' % (video_path,))
+    times_ms.sort()
+    return KeyframeIndex(times_ms)
+
+
+_indexes = {}  # path -> KeyframeIndex, loaded from probe_cache
+_lock = threading.Lock()
+_building = set()
+
+
+def cached_index(video_path):
+    """KeyframeIndex of video_path if already built, else None."""
+    with _lock:
+        index = _indexes.get(video_path)
+    if index is None:
+        try:
+            times_ms = probe_cache.default_cache().get_extra(video_path, 'keyframes')
+        except OSError:
+            return None
+        if times_ms is not None:
+            index = KeyframeIndex(times_ms)
+            with _lock:
+                _indexes[video_path] = index
+    return index
+
+
+def request_index(video_path, on_ready=None):
+    """Build the index of video_path in background if it is not cached yet.
+       on_ready(video_path, index) is called from the builder thread.
+    """
+    index = cached_index(video_path)
+    if index is not None:
+        if on_ready:
+            on_ready(video_path, index)
+        return
+    with _lock:
+        if video_path in _building:
+            return
+        _building.add(video_path)
+
+    def build():
+        try:
+            index = build_index(video_path)
+            probe_cache.default_cache().set_extra(video_path, 'keyframes', index.times_ms)
+            with _lock:
+                _indexes[video_path] = index
+            if on_ready:
+                on_ready(video_path, index)
+        except (OSError, RuntimeError, ValueError):
+            pass
+        finally:
+            with _lock:
+                _building.discard(video_path)
+
+    threading.Thread(target=build, name='keyframes', daemon=True).start()
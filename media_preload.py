@@ -0,0 +1,80 @@
+"""Preload the videos next to the current one so switching is instant.
+
+For each preloaded path the media is created and parsed asynchronously by
+libvlc (container, tracks and duration), and the start of the file is read
+ahead into the OS page cache, so opening it does not wait for the disk or
+the network share.  Only the last `capacity` preloaded entries are kept.
+"""
+import collections
+import os
+import threading
+
+import vlc
+
+READAHEAD_BYTES = 8 * 1024 * 1024
+PARSE_TIMEOUT_MS = 5000
+
+
+def _readahead(path, length=READAHEAD_BYTES):
+    """Ask the OS to bring the start of path into its cache."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+        else:
+            # No advice available (Windows, macOS): read it once
+            remaining = length
+            while remaining > 0 and os.read(fd, min(remaining, 1024 * 1024)):
+                remaining -= 1024 * 1024
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class MediaPreloader(object):
+    """LRU of parsed vlc.Media objects created from instance."""
+
+    def __init__(self, instance, capacity=4):
+        self.instance = instance
+        self.capacity = capacity
+        self._media = collections.OrderedDict()  # path -> vlc.Media
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """Return the media of path, preloaded if possible.  The caller
+           hands it to set_media(), the preloader keeps no claim on it.
+        """
+        with self._lock:
+            media = self._media.pop(path, None)
+        if media is None:
+            media = self.instance.media_new(str(path))
+        return media
+
+    def preload(self, paths):
+        """Start preloading paths, most wanted first."""
+        for path in reversed(paths):
+            with self._lock:
+                if path in self._media:
+                    self._media.move_to_end(path)
+                    continue
+            if not os.path.isfile(path):
+                continue
+            media = self.instance.media_new(str(path))
+            media.parse_with_options(vlc.MediaParseFlag.local | vlc.MediaParseFlag.fetch_local,
+                                     PARSE_TIMEOUT_MS)
+            threading.Thread(target=_readahead, args=(path,), daemon=True).start()
+            with self._lock:
+                self._media[path] = media
+                while len(self._media) > self.capacity:
+                    _, old = self._media.popitem(last=False)
+                    old.release()
+
+    def clear(self):
+        with self._lock:
+            for media in self._media.values():
+                media.release()
+            self._media.clear()
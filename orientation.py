@@ -0,0 +1,114 @@
+"""Display orientation of a video stream and how to apply it to a frame.
+
+Containers store the orientation as a display matrix (side data of the
+stream, which can encode a rotation and a mirror), as a rotation angle next
+to it, or as a legacy 'rotate' tag.  All of them are reduced here to one of
+the eight EXIF orientations, so a captured frame is either turned upright
+with an exact transpose (no resampling, unlike Image.rotate) or saved as is
+with an EXIF Orientation tag that viewers apply.
+
+The interpretation of the display matrix follows the autorotate logic of
+ffmpeg, so captures look like what ffmpeg and VLC play.
+
+Pillow is only imported by the functions that touch images, the probe of
+the orientation does not need it.
+"""
+NORMAL = 1
+
+# EXIF orientation -> Image.Transpose member that shows the frame upright
+TRANSPOSES = {
+    2: 'FLIP_LEFT_RIGHT',
+    3: 'ROTATE_180',
+    4: 'FLIP_TOP_BOTTOM',
+    5: 'TRANSPOSE',
+    6: 'ROTATE_270',
+    7: 'TRANSVERSE',
+    8: 'ROTATE_90',
+}
+
+# clockwise angle -> EXIF orientation, without and with a horizontal mirror
+_ROTATIONS = {0: 1, 90: 6, 180: 3, 270: 8}
+_MIRRORED = {0: 2, 90: 7, 180: 4, 270: 5}
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def parse_display_matrix(text):
+    """The 9 integers of an ffprobe displaymatrix dump, or None."""
+    values = []
+    for line in str(text).splitlines():
+        _, _, numbers = line.rpartition(':')
+        try:
+            values += [int(n) for n in numbers.split()]
+        except ValueError:
+            return None
+    return values if len(values) == 9 else None
+
+
+def _clockwise(angle):
+    """Snap an angle in degrees to 0, 90, 180 or 270."""
+    return int(round(float(angle) / 90.0)) % 4 * 90
+
+
+def from_display_matrix(matrix):
+    """EXIF orientation of a 3x3 display matrix (row major, 16.16 fixed point)."""
+    a, b, _, c, d = matrix[:5]
+    if a == 0 and d == 0 and b and c:
+        # quarter turn, a mirror if both terms have the same sign
+        if (b > 0) == (c > 0):
+            return 5 if b > 0 else 7
+        return 6 if c < 0 else 8
+    if a < 0 and d < 0:
+        return 3
+    if a < 0:
+        return 2
+    if d < 0:
+        return 4
+    return NORMAL
+
+
+def from_rotation(clockwise, mirrored=False):
+    """EXIF orientation of a clockwise rotation (degrees, snapped to a
+       multiple of 90), optionally preceded by a left to right mirror.
+    """
+    return (_MIRRORED if mirrored else _ROTATIONS)[_clockwise(clockwise)]
+
+
+def from_stream(stream):
+    """EXIF orientation of an ffprobe video stream."""
+    rotation = None
+    for side_data in stream.get('side_data_list', []):
+        matrix = parse_display_matrix(side_data.get('displaymatrix', ''))
+        if matrix is not None:
+            return from_display_matrix(matrix)
+        if rotation is None and 'rotation' in side_data:
+            rotation = side_data['rotation']
+    try:
+        if rotation is not None:
+            # side data angles are counterclockwise
+            return from_rotation(-float(rotation))
+        if 'rotate' in stream.get('tags', {}):
+            return from_rotation(float(stream['tags']['rotate']))
+    except (TypeError, ValueError):
+        pass
+    return NORMAL
+
+
+def swaps_axes(orientation):
+    """True if the upright frame is the coded frame with width and height swapped."""
+    return orientation >= 5
+
+
+def apply(img, orientation):
+    """img turned upright, a lossless transpose (or img itself if normal)."""
+    from PIL import Image
+    method = TRANSPOSES.get(orientation)
+    return img if method is None else img.transpose(Image.Transpose[method])
+
+
+def exif_bytes(orientation):
+    """EXIF block that only holds the Orientation tag, for Image.save(exif=...)."""
+    from PIL import Image
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION_TAG] = orientation
+    return exif.tobytes()
@@ -0,0 +1,131 @@
+"""Names of the capture files, from a template and an index of the output folder.
+
+A template is a str.format string of the fields
+  {video}  name of the video without extension
+  {mtime}  modification time of the video, YYYYmmdd_HHMMSS
+  {frame}  frame number of the capture
+  {ms}     time of the capture in milliseconds
+  {seq}    counter that makes the name unique, 0 for the first capture
+e.g. '{video}_{frame:06d}' or '{video}{seq:02d}'.  Without {seq} a
+collision gets a _NN suffix (_01, _02...).
+
+The names of each output folder are listed once per session into an
+OutputIndex, and a counter per name pattern remembers where the next free
+name is: a capture costs no directory listing nor stat.  The chosen name is
+created with O_EXCL, which is also how files written meanwhile by another
+process are noticed.
+"""
+import datetime
+import functools
+import os
+import string
+import threading
+
+import frame_step
+import probe_cache
+
+QT_TEMPLATE = 'screenshot_{mtime}'
+TK_TEMPLATE = '{video}{seq:02d}'
+DEFAULT_TEMPLATE = os.environ.get('SCREENSHOTER_NAME_TEMPLATE')
+
+FIELDS = ('video', 'mtime', 'frame', 'ms', 'seq')
+
+
+@functools.lru_cache(maxsize=64)
+def check_template(template):
+    """Fields used by template, ValueError if one is unknown or it is
+       malformed: a name template names a file of the output folder, it has
+       no path separator and no conversion like {video!r}.
+    """
+    for sep in (os.sep, os.altsep):
+        if sep and sep in template:
+            raise ValueError('path separator %r in name template %r' % (sep, template))
+    try:
+        parsed = [(field, conversion) for _, field, _, conversion in string.Formatter().parse(template)
+                  if field is not None]
+    except ValueError as e:
+        raise ValueError('invalid name template %r: %s' % (template, e))
+    for name, conversion in parsed:
+        if name not in FIELDS:
+            raise ValueError('unknown field {%s} in name template %r' % (name, template))
+        if conversion is not None:
+            raise ValueError('conversion {%s!%s} in name template %r' % (name, conversion, template))
+    return tuple(name for name, _ in parsed)
+
+
+def capture_fields(video_path, video_mtime, time_ms=None, frame=None):
+    """Template fields of a capture of video_path at time_ms (or frame)."""
+    fps = None
+    if frame is None or time_ms is None:
+        fps = probe_cache.get_metadata(video_path)['fps'] or frame_step.DEFAULT_FPS
+    if time_ms is None:
+        time_ms = frame_step.frame_time_ms(frame or 0, fps)
+    if frame is None:
+        frame = frame_step.frame_at(time_ms, fps)
+    return {
+        'video': os.path.basename(video_path).split('.')[0],
+        'mtime': datetime.datetime.fromtimestamp(video_mtime).strftime('%Y%m%d_%H%M%S'),
+        'frame': int(frame),
+        'ms': int(time_ms),
+    }
+
+
+class OutputIndex(object):
+    """Names of the files of an output folder, and of the ones it reserved."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._next = {}  # (template, extension, field values) -> next seq to try
+        with os.scandir(directory) as entries:
+            self._names = set(entry.name for entry in entries)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def allocate(self, template, fields, extension):
+        """Reserve a unique file name for template and fields, return its path.
+
+           The file is created empty, the capture workers fill it later.
+        """
+        used = check_template(template)
+        # names of one pattern only differ by seq, continue after the last one
+        key = (template, extension) + tuple(fields[name] for name in used if name != 'seq')
+        with self._lock:
+            seq = self._next.get(key, 0)
+            while True:
+                if 'seq' in used:
+                    name = template.format(seq=seq, **fields)
+                else:
+                    name = template.format(**fields) + (f'_{seq:02d}' if seq else '')
+                name += extension
+                seq += 1
+                if name in self._names:
+                    continue
+                self._names.add(name)
+                path = os.path.join(self.directory, name)
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                except FileExistsError:
+                    continue  # written by someone else since the listing
+                self._next[key] = seq
+                return path
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def index_for(directory):
+    """OutputIndex of directory, listed on first use in this process."""
+    key = os.path.realpath(directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = OutputIndex(directory)
+    return index
+
+
+def allocate(directory, template, fields, extension='.png'):
+    """Reserve and return a unique path in directory, see OutputIndex.allocate."""
+    return index_for(directory).allocate(template, fields, extension)
@@ -0,0 +1,71 @@
+"""Progress of a media player from its libvlc events, without polling.
+
+The callbacks run on VLC threads.  They only record the latest values and
+call notify() once until the front-end takes them with take(), so a burst
+of TimeChanged events costs one update of the GUI.  notify() must not block
+nor call back into libvlc: Qt emits a queued signal.
+"""
+import threading
+
+import vlc
+
+STATE_EVENTS = {
+    vlc.EventType.MediaPlayerPlaying: 'playing',
+    vlc.EventType.MediaPlayerPaused: 'paused',
+    vlc.EventType.MediaPlayerStopped: 'stopped',
+    vlc.EventType.MediaPlayerEndReached: 'ended',
+}
+
+
+class PlayerProgress(object):
+
+    def __init__(self, player, notify=None):
+        self.notify = notify
+        self.time_ms = None
+        self.length_ms = None
+        self.state = None
+        self._pending = False
+        self._lock = threading.Lock()
+        events = player.event_manager()
+        events.event_attach(vlc.EventType.MediaPlayerTimeChanged, self._on_time)
+        events.event_attach(vlc.EventType.MediaPlayerLengthChanged, self._on_length)
+        for event_type in STATE_EVENTS:
+            events.event_attach(event_type, self._on_state)
+
+    @property
+    def playing(self):
+        return self.state == 'playing'
+
+    def set_state(self, state):
+        """Record a state change requested from the GUI thread, before its
+           event arrives (e.g. right after play()).
+        """
+        with self._lock:
+            self.state = state
+
+    def _changed(self):
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        if self.notify:
+            self.notify()
+
+    def _on_time(self, event):
+        self.time_ms = event.u.new_time
+        self._changed()
+
+    def _on_length(self, event):
+        self.length_ms = event.u.new_length
+        self._changed()
+
+    def _on_state(self, event):
+        with self._lock:
+            self.state = STATE_EVENTS[event.type]
+        self._changed()
+
+    def take(self):
+        """Return (time_ms, length_ms, state) and re-arm notify()."""
+        with self._lock:
+            self._pending = False
+            return self.time_ms, self.length_ms, self.state
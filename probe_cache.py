@@ -0,0 +1,247 @@
+"""On-disk cache of the ffprobe metadata used when capturing screenshots.
+
+Probing a file spawns ffprobe and parses the whole container, which is the
+slowest step of a capture on large HEVC files.  The results are stored in a
+JSON file keyed by the real path of the video and are considered valid as
+long as the size and modification time of the file did not change.
+
+New entries are written in batches, SAVE_DELAY seconds after the first one
+(and at exit), under a lock file shared by the processes that merge their
+entries into the same file, e.g. the batch_extract workers.
+"""
+import atexit
+import contextlib
+import json
+import os
+import threading
+from os.path import expanduser
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock between processes
+    fcntl = None
+
+import orientation
+
+CACHE_VERSION = 2
+CACHE_PATH = os.path.join(os.environ.get('XDG_CACHE_HOME', expanduser('~/.cache')),
+                          'video-screenshoter', 'probe_cache.json')
+SAVE_DELAY = float(os.environ.get('SCREENSHOTER_PROBE_CACHE_SAVE_DELAY', 2.0))
+
+
+def _parse_rate(rate):
+    """Convert an ffprobe rational like '30000/1001' to a float."""
+    try:
+        num, _, den = str(rate).partition('/')
+        num, den = float(num), float(den or 1)
+        return num / den if num > 0 and den > 0 else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _video_stream(ff_probe):
+    streams = ff_probe.get('streams', []) if ff_probe else []
+    for stream in streams:
+        if stream.get('codec_type') == 'video':
+            return stream
+    return streams[0] if streams else {}
+
+
+def metadata_from_probe(ff_probe):
+    """Extract the fields we care about from a raw ffprobe result."""
+    stream = _video_stream(ff_probe)
+    duration = stream.get('duration') or ff_probe.get('format', {}).get('duration') or 0
+    return {
+        'orientation': orientation.from_stream(stream),
+        'codec': stream.get('codec_name'),
+        'fps': _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate')),
+        'duration': float(duration),
+        'width': int(stream.get('width', 0)),
+        'height': int(stream.get('height', 0)),
+        'pix_fmt': stream.get('pix_fmt'),
+        'color_primaries': stream.get('color_primaries'),
+        'color_transfer': stream.get('color_transfer'),
+        'color_space': stream.get('color_space'),
+        'color_range': stream.get('color_range'),
+    }
+
+
+class ProbeCache(object):
+    """Persistent path + size + mtime keyed store of video metadata."""
+
+    def __init__(self, path=CACHE_PATH, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._entries = None
+        self._dirty = {}
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            if data.get('version') != CACHE_VERSION:
+                data = {}
+            self._entries = data.get('entries', {})
+        return self._entries
+
+    @staticmethod
+    def _key(video_path):
+        return os.path.realpath(video_path)
+
+    @staticmethod
+    def _stamp(video_path):
+        st = os.stat(video_path)
+        return st.st_size, st.st_mtime_ns
+
+    def _valid_entry(self, video_path):
+        key = self._key(video_path)
+        size, mtime_ns = self._stamp(video_path)
+        entry = self._load().get(key)
+        if entry and entry.get('size') == size and entry.get('mtime_ns') == mtime_ns:
+            return key, entry
+        return key, {'size': size, 'mtime_ns': mtime_ns}
+
+    def get(self, video_path):
+        """Return the metadata of video_path, probing it only on a cache miss."""
+        with self._lock:
+            key, entry = self._valid_entry(video_path)
+            if 'meta' in entry:
+                return entry['meta']
+        # Probe outside of the lock, other threads may keep using the cache.
+        import ffmpeg
+        meta = metadata_from_probe(ffmpeg.probe(video_path))
+        with self._lock:
+            key, entry = self._valid_entry(video_path)
+            entry['meta'] = meta
+            self._store(key, entry)
+        return meta
+
+    def peek(self, video_path):
+        """Return the cached metadata of video_path, None instead of probing it."""
+        with self._lock:
+            return self._valid_entry(video_path)[1].get('meta')
+
+    def get_extra(self, video_path, name):
+        """Return an extra per-file value stored with set_extra, or None."""
+        with self._lock:
+            return self._valid_entry(video_path)[1].get(name)
+
+    def set_extra(self, video_path, name, value):
+        """Store an extra JSON serializable value next to the metadata."""
+        with self._lock:
+            key, entry = self._valid_entry(video_path)
+            entry[name] = value
+            self._store(key, entry)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._dirty[key] = entry
+        if self.save_delay <= 0:
+            self.save()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive lock of the cache file between processes."""
+        with open(self.path + '.lock', 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield  # released when f is closed
+
+    def save(self):
+        """Merge our new entries into the file on disk and replace it atomically."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with self._file_lock():
+                    try:
+                        with open(self.path, 'r') as f:
+                            data = json.load(f)
+                        if data.get('version') != CACHE_VERSION:
+                            data = {}
+                    except (OSError, ValueError):
+                        data = {}
+                    entries = data.get('entries', {})
+                    entries.update(self._dirty)
+                    self._entries.update(entries)
+                    tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+                    with open(tmp_path, 'w') as f:
+                        json.dump({'version': CACHE_VERSION, 'entries': entries}, f)
+                    os.replace(tmp_path, self.path)
+                self._dirty.clear()
+            except OSError:
+                # A read-only home should not break captures, keep it in memory.
+                pass
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProbeCache()
+        atexit.register(_default_cache.save)
+    return _default_cache
+
+
+def get_metadata(video_path):
+    """Metadata of video_path from the shared on-disk cache."""
+    return default_cache().get(video_path)
+
+
+def cached_metadata(video_path):
+    """Metadata of video_path if it is in the shared cache, else None (no probe)."""
+    try:
+        return default_cache().peek(video_path)
+    except OSError:
+        return None
+
+
+_probing = {}  # path -> on_ready callbacks waiting for its probe
+_probing_lock = threading.Lock()
+
+
+def request_metadata(video_path, on_ready=None):
+    """Probe video_path in background if it is not cached yet, so that the
+       GUI thread never waits for ffprobe.  on_ready(video_path, meta) is
+       called from the probing thread, or right away if the metadata is
+       cached.  meta is None if the file could not be probed.
+    """
+    meta = cached_metadata(video_path)
+    if meta is not None:
+        if on_ready:
+            on_ready(video_path, meta)
+        return
+    with _probing_lock:
+        waiting = _probing.get(video_path)
+        if waiting is not None:
+            if on_ready:
+                waiting.append(on_ready)
+            return
+        _probing[video_path] = [on_ready] if on_ready else []
+
+    def probe():
+        try:
+            meta = get_metadata(video_path)
+        except Exception:  # ffmpeg.Error, OSError: reported as None
+            meta = None
+        with _probing_lock:
+            callbacks = _probing.pop(video_path)
+        for callback in callbacks:
+            callback(video_path, meta)
+
+    threading.Thread(target=probe, name='probe', daemon=True).start()
@@ -0,0 +1,197 @@
+"""Timing spans of the capture path and the folder loader.
+
+Profiling is off unless enable() is called, which the front-ends do for
+--profile[=FILE].  When it is off span() returns a shared do-nothing context
+manager and record() returns at once, so the instrumented code only pays a
+function call and a test.
+
+When it is on, every span is written as it ends to FILE, one record per line:
+JSON lines, or CSV if FILE ends with .csv, with the fields
+  time     wall clock time of the end of the span (seconds since the epoch)
+  span     name of the span, e.g. capture.encode
+  ms       duration in milliseconds
+  thread   name of the thread that ran it
+  detail   extra fields of the span (JSON object)
+and the p50/p95/p99 of each span are printed when the program exits.
+
+The startup of the front-ends is marked with milestones (imports done,
+window shown, first paint, libvlc ready...), timed from the import of this
+module, which the front-ends import first.  --startup-time prints them as
+they are reached and quits once the player is ready, --profile records them
+as startup.* spans.
+"""
+import atexit
+import csv
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+COLUMNS = ('time', 'span', 'ms', 'thread', 'detail')
+
+START = time.perf_counter()
+
+_profiler = None
+_milestones = []  # [(name, seconds since START)]
+_startup_report = False
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **detail):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, profiler, name, detail):
+        self.profiler = profiler
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start, self.detail)
+        return False
+
+    def set(self, **detail):
+        """Add fields to the record of the span, e.g. what it found."""
+        self.detail.update(detail)
+
+
+class Profiler(object):
+    """Writes the spans to path and keeps their durations for the summary."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = {}  # span name -> [seconds]
+        self._file = open(path, 'w', newline='')
+        self._csv = None
+        if path.lower().endswith('.csv'):
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(COLUMNS)
+
+    def record(self, name, seconds, detail=None):
+        row = (round(time.time(), 6), name, round(seconds * 1000, 3),
+               threading.current_thread().name, detail or {})
+        with self._lock:
+            if self._file is None:
+                return  # closed, late span of a daemon thread
+            self._samples.setdefault(name, []).append(seconds)
+            if self._csv is not None:
+                self._csv.writerow(row[:4] + (json.dumps(row[4]) if row[4] else '',))
+            else:
+                self._file.write(json.dumps(dict(zip(COLUMNS, row))) + '\n')
+
+    def summary(self):
+        """{span: (count, p50 ms, p95 ms, p99 ms)}"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+        return {name: (len(values), statistics.median(values) * 1000, _percentile(values, 95) * 1000,
+                       _percentile(values, 99) * 1000)
+                for name, values in samples.items()}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def enable(path):
+    """Record the spans to path from now on, and print their summary at exit."""
+    global _profiler
+    if _profiler is not None:
+        return
+    _profiler = Profiler(path)
+    for name, seconds in _milestones:  # reached before the arguments were parsed
+        _profiler.record('startup.' + name, seconds)
+    atexit.register(_report)
+
+
+def enabled():
+    return _profiler is not None
+
+
+def span(name, **detail):
+    """Context manager timing its block as the span name."""
+    if _profiler is None:
+        return _NULL_SPAN
+    return _Span(_profiler, name, detail)
+
+
+def record(name, seconds, **detail):
+    """Record a span measured by the caller."""
+    if _profiler is not None:
+        _profiler.record(name, seconds, detail)
+
+
+def _report(out=sys.stderr):
+    profiler = _profiler
+    profiler.close()
+    summary = profiler.summary()
+    if not summary:
+        return
+    print('profile written to %s' % (profiler.path,), file=out)
+    print('%-22s %7s %10s %10s %10s' % ('span', 'count', 'p50 ms', 'p95 ms', 'p99 ms'), file=out)
+    for name in sorted(summary):
+        count, p50, p95, p99 = summary[name]
+        print('%-22s %7d %10.2f %10.2f %10.2f' % (name, count, p50, p95, p99), file=out)
+
+
+def _print_milestone(name, seconds):
+    print('%-12s %8.1f ms' % (name, seconds * 1000), file=sys.stderr)
+
+
+def milestone(name):
+    """Mark the startup milestone name as reached now."""
+    seconds = time.perf_counter() - START
+    _milestones.append((name, seconds))
+    record('startup.' + name, seconds)
+    if _startup_report:
+        _print_milestone(name, seconds)
+
+
+def startup_report():
+    """True with --startup-time: the front-end quits once it is ready."""
+    return _startup_report
+
+
+def default_path():
+    return 'profile_%s.jsonl' % (time.strftime('%Y%m%d_%H%M%S'),)
+
+
+def enable_from_argv(argv):
+    """Remove --profile[=FILE] and --startup-time from the list argv.
+       The first enables profiling, to FILE or to
+       profile_<YYYYmmdd_HHMMSS>.jsonl, the second the startup report.
+    """
+    global _startup_report
+    for arg in list(argv):
+        if arg == '--profile' or arg.startswith('--profile='):
+            argv.remove(arg)
+            enable(os.path.expanduser(arg.partition('=')[2]) or default_path())
+        elif arg == '--startup-time' and not _startup_report:
+            argv.remove(arg)
+            _startup_report = True
+            for name, seconds in _milestones:
+                _print_milestone(name, seconds)
@@ -0,0 +1,48 @@
+import unittest
+
+import frame_step
+
+
+class FrameTimeRoundTripTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for fps in (24000 / 1001.0, 30000 / 1001.0, 60.0, 25.0):
+            for frame in range(100000):
+                self.assertEqual(frame_step.frame_at(frame_step.frame_time_ms(frame, fps), fps), frame,
+                                 'frame %d at %.3f fps' % (frame, fps))
+
+    def test_mid_frame_time(self):
+        # frame 0 of a 25 fps video is shown from 0 to 40 ms
+        self.assertEqual(frame_step.frame_at(30, 25.0), 0)
+        self.assertEqual(frame_step.frame_at(38, 25.0), 0)
+        self.assertEqual(frame_step.frame_at(40, 25.0), 1)
+        for fps in (24000 / 1001.0, 30000 / 1001.0, 60.0):
+            for frame in range(1000):
+                middle = (frame + 0.5) * 1000.0 / fps
+                self.assertEqual(frame_step.frame_at(middle, fps), frame)
+
+    def test_seek_does_not_reach_the_next_frame(self):
+        for fps in (24000 / 1001.0, 30000 / 1001.0, 60.0):
+            for frame in range(1000):
+                self.assertLessEqual(frame_step.frame_time_ms(frame, fps), frame * 1000.0 / fps + 1e-6)
+
+
+class FrameStepperFpsTest(unittest.TestCase):
+
+    def test_new_video_forgets_the_frame_rate(self):
+        stepper = frame_step.FrameStepper()
+        stepper.new_video(60.0)
+        stepper.new_video()
+        self.assertEqual(stepper.fps, frame_step.DEFAULT_FPS)
+
+    def test_set_fps_keeps_the_time_of_the_frame(self):
+        stepper = frame_step.FrameStepper()
+        stepper.new_video()
+        stepper.frame = 50  # 2 s at DEFAULT_FPS
+        stepper.set_fps(30000 / 1001.0)
+        self.assertEqual(stepper.frame, 59)  # frame 60 starts at 2002 ms
+        self.assertAlmostEqual(stepper.time_ms(), 2000, delta=1000 / 29.97)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Poster thumbnails of the videos in the list.
+
+Thumbnails are generated by a small pool of background threads, only for
+the rows the front-end says are visible, and stored as JPEG files in a size
+bounded least-recently-used disk cache keyed by path + size + mtime.
+"""
+import collections
+import hashlib
+import os
+import threading
+from os.path import expanduser
+
+import frame_reader
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', expanduser('~/.cache')),
+                         'video-screenshoter', 'thumbnails')
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+THUMBNAIL_WIDTH = 160
+
+
+class ThumbnailCache(object):
+    """Directory of thumbnails, oldest used files are evicted past max_bytes."""
+
+    def __init__(self, path=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = None  # name -> size, least recently used first
+        self._total = 0
+
+    @staticmethod
+    def key(video_path, mtime):
+        return hashlib.sha1(('%s\0%r' % (os.path.realpath(video_path), mtime)).encode(
+            errors='surrogateescape')).hexdigest() + '.jpg'
+
+    def _index(self):
+        if self._files is None:
+            entries = []
+            try:
+                with os.scandir(self.path) as it:
+                    for entry in it:
+                        if entry.name.endswith('.jpg'):
+                            st = entry.stat()
+                            entries.append((st.st_mtime, entry.name, st.st_size))
+            except OSError:
+                pass
+            entries.sort()
+            self._files = collections.OrderedDict((name, size) for _, name, size in entries)
+            self._total = sum(self._files.values())
+        return self._files
+
+    def get(self, video_path, mtime):
+        """Path of the cached thumbnail, or None."""
+        name = self.key(video_path, mtime)
+        with self._lock:
+            files = self._index()
+            if name not in files:
+                return None
+            files.move_to_end(name)
+        path = os.path.join(self.path, name)
+        try:
+            os.utime(path)  # remember the use across sessions
+        except OSError:
+            with self._lock:
+                self._total -= files.pop(name, 0)
+            return None
+        return path
+
+    def put(self, video_path, mtime, data):
+        """Store the JPEG data and return its path."""
+        name = self.key(video_path, mtime)
+        path = os.path.join(self.path, name)
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (path, threading.get_ident())
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            files = self._index()
+            self._total += len(data) - files.pop(name, 0)
+            files[name] = len(data)
+            while self._total > self.max_bytes and len(files) > 1:
+                old, size = files.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(os.path.join(self.path, old))
+                except OSError:
+                    pass
+        return path
+
+
+class ThumbnailLoader(object):
+    """Generate thumbnails in background for the rows that are visible.
+
+       on_ready(video_path, mtime, thumbnail_path) is called from a worker
+       thread, front-ends must marshal it onto their event loop.
+    """
+
+    def __init__(self, on_ready, cache=None, workers=2, width=THUMBNAIL_WIDTH):
+        self.on_ready = on_ready
+        self.cache = cache or ThumbnailCache()
+        self.width = width
+        self._wanted = collections.OrderedDict()  # (path, mtime) -> None
+        self._running = set()
+        self._failed = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        for i in range(workers):
+            threading.Thread(target=self._work, name='thumbnails-%d' % i, daemon=True).start()
+
+    @property
+    def busy(self):
+        with self._cond:
+            return bool(self._wanted or self._running)
+
+    def cached(self, video_path, mtime):
+        """Path of the thumbnail if it is already on disk, else None."""
+        return self.cache.get(video_path, mtime)
+
+    def set_visible(self, videos):
+        """Replace the pending requests by the (path, mtime) of the visible
+           rows without a thumbnail, in display order.
+        """
+        with self._cond:
+            self._wanted = collections.OrderedDict(
+                (video, None) for video in videos
+                if video not in self._running and video not in self._failed)
+            self._cond.notify_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._wanted and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                video, _ = self._wanted.popitem(last=False)
+                self._running.add(video)
+            path, mtime = video
+            try:
+                thumbnail = self.cache.get(path, mtime)
+                if thumbnail is None:
+                    thumbnail = self.cache.put(path, mtime, frame_reader.read_thumbnail(path, self.width))
+                self.on_ready(path, mtime, thumbnail)
+            except Exception:
+                with self._cond:
+                    self._failed.add(video)
+            finally:
+                with self._cond:
+                    self._running.discard(video)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
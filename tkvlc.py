@@ -1,10 +1,23 @@
+import profiling  # first, the startup milestones are timed from its import
 import vlc
 import sys
 
 
-import ffmpeg
-from PIL import Image
-from PIL import ImageCms
+import activity
+import burst_capture
+import dedup
+import encoders
+import folder_watcher
+import media_preload
+import output_names
+import player_events
+import frame_step
+import keyframes
+import probe_cache
+import thumbnails
+import video_catalog
+import video_store
+import vlc_profiles
 
 import tkinter as Tk
 from tkinter import ttk
@@ -19,6 +32,8 @@ import queue
 import threading
 from datetime import datetime
 
+profiling.milestone('imports')
+
 _isMacOS   = sys.platform.startswith('darwin')
 _isWindows = sys.platform.startswith('win')
 _isLinux   = sys.platform.startswith('linux')
@@ -139,14 +154,124 @@ class _Tk_Menu(Tk.Menu):
 
 class Video(object):
 
-    def __init__(self, path):
+    def __init__(self, path, mtime=None, name=None):
         self.path = path
-        self.name = os.path.basename(path)
-        self.modification_date = datetime.utcfromtimestamp(os.path.getmtime(path))
+        self.name = name or os.path.basename(path)
+        if mtime is None:
+            mtime = os.path.getmtime(path)
+        self.mtime = mtime
+        self.modification_date = datetime.utcfromtimestamp(mtime)
 
     def __lt__(self, other):
         return self.modification_date < other.modification_date
 
+
+class WindowedList(Tk.Frame):
+    """Listbox holding only the rows of a video_store.VideoStore in view.
+
+       Every Listbox line costs a Tcl call and its memory, so the listbox
+       only gets the rows in view and the scrollbar spans the whole store.
+       label(index) is the text of a row, selected the index in the store
+       of the selected one.  on_select(index) is called when the user
+       selects a row (click or keys), on_scroll() when the rows in view
+       change.
+    """
+    WHEEL_ROWS = 3
+
+    def __init__(self, parent, store, label, on_select, on_scroll=None, rows=28, **options):
+        Tk.Frame.__init__(self, parent)
+        self.store = store
+        self.label = label
+        self.on_select = on_select
+        self.on_scroll = on_scroll
+        self.rows = rows
+        self.top = 0  # index in the store of the first row in view
+        self.selected = None
+        self.listbox = Tk.Listbox(self, height=rows, exportselection=False, **options)
+        self.listbox.grid(row=0, column=0, sticky="ew")
+        self.scrollbar = Tk.Scrollbar(self, orient=Tk.VERTICAL, command=self._OnScrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.grid_columnconfigure(0, weight=1)
+        self.listbox.bind('<<ListboxSelect>>', self._OnClick)
+        for key in ('<Up>', '<Down>', '<Prior>', '<Next>', '<Home>', '<End>'):
+            self.listbox.bind(key, self._OnKey)
+        for event in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.listbox.bind(event, self._OnWheel)
+
+    def reset(self):
+        self.top = 0
+        self.selected = None
+        self.refresh()
+
+    def visible(self):
+        """Indexes in the store of the rows in view."""
+        return range(self.top, min(len(self.store), self.top + self.rows))
+
+    def refresh(self):
+        """Show the rows from top, after a change of the store or a scroll."""
+        self.top = max(0, min(self.top, len(self.store) - self.rows))
+        rows = self.visible()
+        self.listbox.delete(0, 'end')
+        if rows:
+            self.listbox.insert(0, *[self.label(i) for i in rows])
+        if self.selected in rows:
+            self.listbox.selection_set(self.selected - self.top)
+            self.listbox.activate(self.selected - self.top)
+        count = len(self.store)
+        if count:
+            self.scrollbar.set(self.top / count, rows.stop / count)
+        else:
+            self.scrollbar.set(0, 1)
+        if self.on_scroll:
+            self.on_scroll()
+
+    def scroll_to(self, top):
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    def select(self, index, see=True):
+        """Select the row index, None for none, without calling on_select.
+           With see the list is scrolled to show it.
+        """
+        self.selected = index
+        if see and index is not None:
+            if index < self.top:
+                self.top = index
+            elif index >= self.top + self.rows:
+                self.top = index - self.rows + 1
+        self.refresh()
+
+    def _UserSelect(self, index):
+        index = max(0, min(index, len(self.store) - 1))
+        if index != self.selected:
+            self.select(index)
+            self.on_select(index)
+
+    def _OnClick(self, evt):
+        selection = self.listbox.curselection()
+        if selection:
+            self._UserSelect(self.top + selection[0])
+
+    def _OnKey(self, evt):
+        if len(self.store):
+            current = self.top if self.selected is None else self.selected
+            self._UserSelect({'Up': current - 1, 'Down': current + 1,
+                              'Prior': current - self.rows, 'Next': current + self.rows,
+                              'Home': 0, 'End': len(self.store) - 1}[evt.keysym])
+        return 'break'  # not the Listbox bindings, they only see the rows in view
+
+    def _OnWheel(self, evt):
+        up = evt.num == 4 or getattr(evt, 'delta', 0) > 0
+        self.scroll_to(self.top + (-self.WHEEL_ROWS if up else self.WHEEL_ROWS))
+        return 'break'
+
+    def _OnScrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.store)))
+        elif args[0] == 'scroll':
+            self.scroll_to(self.top + int(args[1]) * (self.rows if args[2] == 'pages' else 1))
+
 class Player(Tk.Frame):
     """The main window has to deal with events.
     """
@@ -157,7 +282,10 @@ class Player(Tk.Frame):
     COLOR_FRAMES2 = '#999'
     COLOR_FRAMES3 = '#ccc'
 
-    def __init__(self, parent, title=None, video=''):
+    VIDEO_EXTENSIONS = ['.mp4', '.mpeg', '.avi', '.mov', '.flv']
+    TICK_MS = 1000 // 60  # time slider refresh while playing
+
+    def __init__(self, parent, title=None, video='', vlc_profile=None):
         Tk.Frame.__init__(self, parent)
 
         self.parent = parent  # == root
@@ -228,6 +356,21 @@ class Player(Tk.Frame):
         self.label_folder_out.grid(row=0, column=0)
         self.btn_browse_folder_out = Tk.Button(self.frame_header2, text="Output folder", command=self.action_browse_out, highlightbackground=self.COLOR_FRAMES1)
         self.btn_browse_folder_out.grid(row=0, column=1, padx=(5, 50))
+        labels = [label for label, _ in encoders.PRESETS]
+        self.formatVar = Tk.StringVar(value=next((label for label, spec in encoders.PRESETS
+                                                  if spec == encoders.DEFAULT_SPEC), labels[0]))
+        self.menu_format = Tk.OptionMenu(self.frame_header2, self.formatVar, *labels)
+        self.menu_format.config(bg=self.COLOR_FRAMES1)
+        self.menu_format.grid(row=1, column=0, sticky="w")
+        self.exifOrientationVar = Tk.BooleanVar(value=encoders.DEFAULT_EXIF_ORIENTATION)
+        self.check_exif_orientation = Tk.Checkbutton(self.frame_header2, text="Orientation as EXIF tag",
+                                                     variable=self.exifOrientationVar, bg=self.COLOR_FRAMES1)
+        self.check_exif_orientation.grid(row=1, column=1, sticky="w")
+        self.skipDuplicatesVar = Tk.BooleanVar(value=dedup.DEFAULT_MODE == 'skip')
+        self.check_skip_duplicates = Tk.Checkbutton(self.frame_header2, text="Skip near duplicates",
+                                                    variable=self.skipDuplicatesVar, bg=self.COLOR_FRAMES1,
+                                                    command=self._UpdateDuplicatesMode)
+        self.check_skip_duplicates.grid(row=2, column=1, sticky="w")
 
         self.frame_header3 = Tk.Frame(self.frame_header, pady=15, bg=self.COLOR_FRAMES1)
         self.frame_header3.grid(row=2, column=0)
@@ -238,6 +381,22 @@ class Player(Tk.Frame):
         self.label_folder.grid(row=0, column=0)
         self.btn_browse_folder = Tk.Button(self.frame_header3, text="Choose folder", command=self.action_browse, highlightbackground=self.COLOR_FRAMES1)
         self.btn_browse_folder.grid(row=0, column=1, padx=(5, 50))
+        self.recursiveVar = Tk.BooleanVar()
+        self.check_recursive = Tk.Checkbutton(self.frame_header3, text="Include subfolders", variable=self.recursiveVar, bg=self.COLOR_FRAMES1)
+        self.check_recursive.grid(row=1, column=0, sticky="w")
+        self.watchVar = Tk.BooleanVar()
+        self.check_watch = Tk.Checkbutton(self.frame_header3, text="Watch folder for changes", variable=self.watchVar,
+                                          command=self._UpdateFolderWatch, bg=self.COLOR_FRAMES1)
+        self.check_watch.grid(row=2, column=0, sticky="w")
+        # filter and order of the list, e.g. "hevc >60s uncaptured newest", see video_catalog
+        self.filterVar = Tk.StringVar()
+        self.entry_filter = Tk.Entry(self.frame_header3, width=40, textvariable=self.filterVar,
+                                     highlightbackground=self.COLOR_FRAMES1)
+        self.entry_filter.grid(row=3, column=0, sticky="w")
+        self.entry_filter.bind('<Return>', self._OnFilter)
+        self.btn_filter = Tk.Button(self.frame_header3, text="Filter", command=self._OnFilter,
+                                    highlightbackground=self.COLOR_FRAMES1)
+        self.btn_filter.grid(row=3, column=1, padx=(5, 50))
 
 
         # frames frame_bottom
@@ -252,6 +411,14 @@ class Player(Tk.Frame):
         self.str_modification_date = Tk.StringVar()
         self.label_title = Tk.Label(self.frame_bottom_info, anchor="w", textvariable=self.str_modification_date, bg=self.COLOR_FRAMES1)
         self.label_title.grid(row=1, sticky="ew")
+        self.frame_bottom_info.grid_columnconfigure(0, weight=1)
+        self.label_thumbnail = Tk.Label(self.frame_bottom_info, bg=self.COLOR_FRAMES1)
+        self.label_thumbnail.grid(row=0, column=1, rowspan=3, sticky="e")
+        self.str_frame = Tk.StringVar()
+        self.label_frame = Tk.Label(self.frame_bottom_info, anchor="w", textvariable=self.str_frame, bg=self.COLOR_FRAMES1)
+        self.label_frame.grid(row=2, sticky="ew")
+        self.stepper = frame_step.FrameStepper()
+        self.thumbnail_image = None  # keep a reference, Tk does not
 
 
         self.frame_bottom1 = Tk.Frame(self.frame_bottom, bg=self.COLOR_FRAMES1, padx=15, pady=5)
@@ -279,11 +446,26 @@ class Player(Tk.Frame):
         timers = ttk.Frame(self.frame_bottom2)
         self.timeVar = Tk.DoubleVar()
         self.timeSliderLast = 0
+        self.timeSliderLength = 0
         self.timeSlider = Tk.Scale(timers, variable=self.timeVar, command=self.OnTime,
                                    from_=0, to=1000, orient=Tk.HORIZONTAL, length=100,
                                    resolution=0.02, showvalue=0, bg=self.COLOR_FRAMES1)
         self.timeSlider.pack(side=Tk.BOTTOM, fill=Tk.X, expand=1)
+        # snap to keyframes while dragging, exact position on release
+        self.timeSliderDragging = False
+        self.timeSlider.bind("<ButtonPress-1>", lambda _: setattr(self, "timeSliderDragging", True))
+        self.timeSlider.bind("<ButtonRelease-1>", self._OnTimeReleased)
         self.timeSliderUpdate = time.time()
+        # activity curve (blue) and scene cuts (red) of the video, under the slider
+        self.timeline = Tk.Canvas(timers, height=12, bg=self.COLOR_FRAMES1, highlightthickness=0)
+        self.timeline.pack(side=Tk.BOTTOM, fill=Tk.X, expand=1)
+        self.timeline.bind("<Configure>", lambda _: self._DrawTimeline())
+        self.analysis = None
+        self.activity_queue = queue.Queue()
+        self._activity_poll_active = False
+        # (path, probe_cache metadata) of the played video, from the probing thread
+        self.probe_queue = queue.Queue()
+        self._probe_poll_active = False
         timers.grid(row=0, sticky="ew")
         timers.pack(side=Tk.TOP, fill=Tk.X)
 
@@ -293,32 +475,92 @@ class Player(Tk.Frame):
         self.btn_capture = Tk.Button(self.frame_bottom3, text="Capture (C)", command=self.capture,
                                      highlightbackground='#bbf', height=4, width=60)
         self.btn_capture.grid(row=0, column=0)
+        self.btn_burst = Tk.Button(self.frame_bottom3, text="Burst (B)", command=self.OnBurst,
+                                   highlightbackground='#bbf', height=4, width=14)
+        self.btn_burst.grid(row=0, column=1, padx=(5, 0))
+        self.burstStrideVar = Tk.IntVar(value=1)
+        self.spin_burst_stride = Tk.Spinbox(self.frame_bottom3, from_=1, to=1000, width=5, textvariable=self.burstStrideVar)
+        self.spin_burst_stride.grid(row=0, column=2, padx=(5, 0))
+        self.str_burst_range = Tk.StringVar()
+        self.label_burst_range = Tk.Label(self.frame_bottom3, anchor="w", textvariable=self.str_burst_range, bg=self.COLOR_FRAMES1)
+        self.label_burst_range.grid(row=1, column=1, columnspan=2, sticky="ew")
+        self.skipIdleVar = Tk.BooleanVar(value=False)
+        self.check_skip_idle = Tk.Checkbutton(self.frame_bottom3, text="Skip idle", variable=self.skipIdleVar,
+                                              bg=self.COLOR_FRAMES1)
+        self.check_skip_idle.grid(row=0, column=3, padx=(5, 0))
+        self.burst_in_ms = None
+        self.burst_out_ms = None
+        self.burst_in_frame = None  # frame numbers of the marks made while stepping
+        self.burst_out_frame = None
+        self.burst = None
+        self.str_capture_status = Tk.StringVar()
+        self.label_capture_status = Tk.Label(self.frame_bottom3, anchor="w", textvariable=self.str_capture_status, bg=self.COLOR_FRAMES1)
+        self.label_capture_status.grid(row=1, column=0, sticky="ew")
+
+        self._capture_poll_active = False
+
+        # Thumbnails of the visible videos, generated in background. A Listbox
+        # can not show images, the selected one is shown next to its name.
+        self.thumbnail_queue = queue.Queue()
+        self.thumbnail_loader = thumbnails.ThumbnailLoader(lambda *ready: self.thumbnail_queue.put(ready))
+        self._thumbnail_request = None
+        self._thumbnail_poll_active = False
 
         # widgets frame_list
         self.frame_list.grid_rowconfigure(1, weight=2)
         self.frame_list.grid_columnconfigure(0, weight=1)
         self.label_list = Tk.Label(self.frame_list, text="Videos", bg=self.COLOR_FRAMES2)
         self.label_list.grid(row=0, sticky="ew")
-        self.lb_ids = []
-        self.lb = Tk.Listbox(self.frame_list, font=("Courier", 12), height=28)
-        self.lb.bind('<<ListboxSelect>>', self.onselect)
+        self.video_store = video_store.VideoStore()
+        self.scanner = None
+        self.watcher = None
+        self._reload_request = None
+        # the list comes from the catalog, filtered and sorted by catalog_query
+        self.catalog = video_catalog.default_catalog()
+        self.catalog_query = video_catalog.Query()
+        self.catalog_stale = False  # files changed while a filtered list was loading
+        # only the rows in view are in the Listbox, see WindowedList
+        self.video_list = WindowedList(self.frame_list, self.video_store,
+                                       lambda i: self._DisplayName(self.video_store.path(i)),
+                                       self.onselect, self._OnListScroll, rows=28, font=("Courier", 12))
+        self.lb = self.video_list.listbox
         self.lb.unbind('<space>')
         self.lb.bind('<space>', self._Pause_Play)
         self.lb.bind('a', self._Pause_Play)
         self.lb.bind('c', self.capture)
+        self.lb.bind('i', self._MarkBurstRange)
+        self.lb.bind('o', self._MarkBurstRange)
+        self.lb.bind('b', self.OnBurst)
+        self.lb.bind('n', self._JumpToMark)  # next/previous (N) scene cut
+        self.lb.bind('N', self._JumpToMark)
+        self.lb.bind('m', self._JumpToMark)  # next/previous (M) activity peak
+        self.lb.bind('M', self._JumpToMark)
         self.lb.bind("<Left>", self.move_time_slider)
         self.lb.bind("<Right>", self.move_time_slider)
-        self.lb.grid(row=1, sticky="ew")
-
-        # VLC player
-        args = []
+        self.video_list.grid(row=1, sticky="ew")
+
+        # VLC player, libvlc loads its plugins in background while the
+        # window shows up, the player is created by _PollVlc.  The options
+        # come from the libvlc profile, see vlc_profiles
+        self.vlc_profile = vlc_profile or vlc_profiles.get_profile()
+        self.media_path = None
+        self.media_silent = False  # media opened without its audio
+        self._vlc_args = []
         if _isLinux:
-            args.append('--no-xlib')
-        self.Instance = vlc.Instance(args)
-        self.player = self.Instance.media_player_new()
+            self._vlc_args.append('--no-xlib')
+        self.Instance = None
+        self.player = None
+        self.progress = None
+        self.preloader = None
+        self._tick_active = False
+        self._LoadVlc()
+        # Captured frames are grabbed to memory and post-processed in
+        # background, the capture engine is loaded on first capture
+        self._capture_engine = None
 
         self.parent.bind("<Configure>", self.OnConfigure)  # catch window resize, etc.
         self.parent.update()
+        profiling.milestone('first-paint')
 
         # After parent.update() otherwise panel is ignored.
         self.buttons_panel.overrideredirect(True)
@@ -344,111 +586,503 @@ class Player(Tk.Frame):
         else:
             self.is_buttons_panel_anchor_active = False
 
-        self.OnTick()  # set the timer up
+    def _LoadVlc(self):
+        """Load libvlc with the options of vlc_profile in background.
+        """
+        vlc_queue = queue.Queue()
+        profile = self.vlc_profile
+        threading.Thread(target=lambda: vlc_queue.put(vlc_profiles.new_instance(profile, self._vlc_args)),
+                         name='vlc-startup', daemon=True).start()
+        self.parent.after(10, self._PollVlc, vlc_queue)
+
+    def _PollVlc(self, vlc_queue):
+        """Create the player once libvlc is loaded.
+        """
+        try:
+            self.Instance = vlc_queue.get_nowait()
+        except queue.Empty:
+            self.parent.after(10, self._PollVlc, vlc_queue)
+            return
+        if self.Instance is None:
+            # libvlc rejected the options of the profile, try without them
+            error = "libvlc failed to start with the profile %r" % (self.vlc_profile.name,)
+            print(error, file=sys.stderr)
+            showerror(self.parent.title(), error)
+            if self.vlc_profile.options:
+                self.vlc_profile = vlc_profiles.fallback_profile()
+                self._LoadVlc()
+            return
+        profiling.milestone('libvlc')
+        self.player = self.Instance.media_player_new()
+        # libvlc events feed the time slider, OnTick only runs while playing
+        self.progress = player_events.PlayerProgress(self.player)
+        # Parsed media of the neighbours of the selected video
+        self.preloader = media_preload.MediaPreloader(self.Instance)
+        profiling.milestone('player')
+
+        video = self._SelectedVideo()  # chosen while libvlc was loading
+        if video is not None:
+            self._Play(video.path)
+        if profiling.startup_report():
+            self.parent.after_idle(self.OnClose)
+
+    @property
+    def capture_engine(self):
+        if self._capture_engine is None:
+            import capture_pipeline
+            self._capture_engine = capture_pipeline.CaptureEngine(
+                self.Instance, output_names.DEFAULT_TEMPLATE or output_names.TK_TEMPLATE,
+                catalog=self.catalog)
+            self._UpdateDuplicatesMode()
+        return self._capture_engine
 
     def move_time_slider(self, evt):
-        if evt.keysym == 'Right':
-            self.timeVar.set(self.timeVar.get() + 0.05)
-            self.timeSlider.set(self.timeSlider.get() + 0.05)
-        else:
-            self.timeVar.set(self.timeVar.get() - 0.05)
-            self.timeSlider.set(self.timeSlider.get() - 0.05)
-        self.OnTime()
+        """Step one frame forward (Right) or backward (Left).
+        """
+        video = self._SelectedVideo()
+        if video is None or not self.player or not self.player.get_media():
+            return
+        frame = self.stepper.step(self.player, 1 if evt.keysym == 'Right' else -1)
+        self._Pause_Play(False)
+        self.str_frame.set("Frame %d" % frame)
+
+        # move the slider without seeking again, see OnTime
+        t = self.stepper.time_ms() * 1e-3
+        self.timeSliderLast = int(t)
+        self.timeSliderUpdate = time.time()
+        self.timeVar.set(t)
+        self.timeSlider.set(t)
 
 
     def capture(self, evt=None):
+        if not self.player:
+            return  # libvlc still loading
         out_dir_path = self.folder_path_out.get()
         if (not out_dir_path):
             Tk.messagebox.showinfo("Error", "First you need to set the output directory")
-        count = 0
-        video = self.results[self.lb.curselection()[0]]
-        folder_path = self.folder_path_out.get()
-        v_name = video.name.split('.')[0]
-        path_out = os.path.join(folder_path, v_name + f'{count:02d}' + '.png')
-        while os.path.isfile(path_out):
-            count += 1
-            path_out = os.path.join(folder_path, v_name + f'{count:02d}' + '.png')
-        self.player.video_take_snapshot(0, path_out, 0, 0)
-
-        # Check if need to rotate
-        ff_probe = ffmpeg.probe(video.path)
-        rotation = 0
-        if ff_probe and 'streams' in ff_probe and 'side_data_list' in ff_probe['streams'][0]:
-            if 'rotation' in ff_probe['streams'][0]['side_data_list'][0]:
-                rotation = ff_probe['streams'][0]['side_data_list'][0]['rotation']
-            elif 'rotation' in ff_probe['streams'][0]['side_data_list'][1]:
-                rotation = ff_probe['streams'][0]['side_data_list'][1]['rotation']
-
-        img = Image.open(path_out)
-        rotated_image = img.rotate(int(rotation), expand=True)
-        if ff_probe and 'streams' in ff_probe \
-                and ff_probe['streams'][0].get('codec_name', None) == 'hevc':
-            profile = ImageCms.getOpenProfile(os.path.join(
-                                os.path.dirname(os.path.realpath(__file__)),
-                                "DisplayP3Compat-v4.icc"))
-            rotated_image.save(path_out, icc_profile=profile.tobytes())
+            return
+        video = self._SelectedVideo()
+        if video is None:
+            return
+        # Only the grab is done here, rotation, color profile and
+        # modification date are done in background
+        with profiling.span('capture.key'):
+            self.capture_engine.capture(self.player, video.path, out_dir_path, self._Encoder(),
+                                        self.stepper.time_ms(), self.stepper.frame,
+                                        datetime_to_seconds(video.modification_date))
+        self._PollCaptures()
+
+    def _UpdateDuplicatesMode(self):
+        """Skip the near-duplicate captures, or only report them.
+        """
+        if self._capture_engine is None:
+            return  # applied when it is created
+        if self.skipDuplicatesVar.get():
+            self._capture_engine.duplicates = 'skip'
         else:
-            rotated_image.save(path_out)
+            self._capture_engine.duplicates = 'off' if dedup.DEFAULT_MODE == 'off' else 'flag'
+
+    def _Encoder(self):
+        """Encoder of the output format chosen in the menu.
+        """
+        return encoders.Encoder(dict(encoders.PRESETS)[self.formatVar.get()],
+                                self.exifOrientationVar.get())
 
-        # Update modification date (same as original video)
-        t_seconds = datetime_to_seconds(video.modification_date)
-        os.utime(path_out, (t_seconds, t_seconds))
+    def _MarkBurstRange(self, evt):
+        """Mark the start (I) or the end (O) of the burst range.
+        """
+        if not self.player:
+            return
+        t_ms = self.stepper.time_ms()
+        if t_ms is None:
+            t_ms = max(0, self.player.get_time())
+        if evt.keysym.lower() == 'i':
+            self.burst_in_ms, self.burst_in_frame = t_ms, self.stepper.frame
+        else:
+            self.burst_out_ms, self.burst_out_frame = t_ms, self.stepper.frame
+        marks = ["%s %.3fs" % (label, t / 1000.0) for label, t in (("In", self.burst_in_ms), ("Out", self.burst_out_ms))
+                 if t is not None]
+        self.str_burst_range.set("  ".join(marks))
 
-    def onselect(self, evt):
-        w = evt.widget
-        index = int(w.curselection()[0])
-        video = self.results[self.lb_ids[index]]
+    def OnBurst(self, evt=None):
+        """Capture every Nth frame of the marked range, or cancel the running burst.
+        """
+        if self.burst is not None:
+            self.burst.cancel()
+            return
+        out_dir_path = self.folder_path_out.get()
+        if not out_dir_path:
+            Tk.messagebox.showinfo("Error", "First you need to set the output directory")
+            return
+        video = self._SelectedVideo()
+        if video is None or self.burst_in_ms is None or self.burst_out_ms is None:
+            Tk.messagebox.showinfo("Burst", "Mark the range with I and O first")
+            return
+        self.burst = burst_capture.BurstCapture(self.capture_engine, video.path, self.burst_in_ms,
+                                                self.burst_out_ms, self.burstStrideVar.get(), out_dir_path,
+                                                datetime_to_seconds(video.modification_date),
+                                                encoder=self._Encoder(), in_frame=self.burst_in_frame,
+                                                out_frame=self.burst_out_frame)
+        self.btn_burst.config(text="Cancel burst (B)")
+        self.burst.start()
+        self._PollCaptures()
+
+    def _PollCaptures(self):
+        """Update the pending captures indicator while the workers are busy.
+        """
+        notice = ""
+        while not self.capture_engine.errors.empty():
+            error = self.capture_engine.errors.get()
+            if isinstance(error, dedup.DuplicateCapture):
+                notice = str(error)
+            else:
+                showerror(self.parent.title(), "Capture failed: %s" % (error,))
+        pending = self.capture_engine.pending
+        status = "Pending captures: %d" % pending if pending else notice
+        burst = self.burst
+        if burst is not None:
+            status = "Burst: %d/%d frames  %s" % (burst.done, burst.total, status)
+            if burst.finished:
+                self.burst = None
+                self.btn_burst.config(text="Burst (B)")
+                if burst.error is not None:
+                    showerror(self.parent.title(), "Burst failed: %s" % (burst.error,))
+        self.str_capture_status.set(status)
+        if (pending or self.burst is not None) and not self._capture_poll_active:
+            self._capture_poll_active = True
+            self.parent.after(100, self._PollCapturesTick)
+
+    def _PollCapturesTick(self):
+        self._capture_poll_active = False
+        self._PollCaptures()
+
+    def onselect(self, index):
+        video = self._VideoAt(index)
         self.str_filename.set(video.name)
         self.str_modification_date.set(video.modification_date.strftime("%d/%m/%Y, %H:%M:%S"))
+        self._ShowThumbnail(video, None)
+        self._RequestVisibleThumbnails()
         self._Play(video.path)
+        keyframes.request_index(video.path)
+        self.analysis = None
+        self._DrawTimeline()
+        activity.request_analysis(video.path, lambda *ready: self.activity_queue.put(ready))
+        if not self._activity_poll_active:
+            self._activity_poll_active = True
+            self.lb.after(200, self._PollActivity)
+        # Get the next and previous videos ready
+        if self.preloader is not None:
+            self.preloader.preload([self.video_store.path(i) for i in (index + 1, index - 1)
+                                    if 0 <= i < len(self.video_store)])
+
+    def _VideoAt(self, index):
+        path, mtime = self.video_store[index]
+        return Video(path, mtime, self._DisplayName(path))
+
+    def _SelectedVideo(self):
+        index = self.video_list.selected
+        return self._VideoAt(index) if index is not None and index < len(self.video_store) else None
+
+    def _PollProbe(self):
+        """Step the current video at its real frame rate once it is probed.
+        """
+        waiting = True
+        while not self.probe_queue.empty():
+            path, meta = self.probe_queue.get()
+            if path == self.media_path:
+                if meta:
+                    self.stepper.set_fps(meta['fps'])
+                waiting = False
+        if waiting:
+            self.parent.after(50, self._PollProbe)
+        else:
+            self._probe_poll_active = False
 
-    # def update(self, outqueue):
-    #     try:
-    #         msg = outqueue.get_nowait()
-    #         if isinstance(msg, list):
+    def _PollActivity(self):
+        """Take the analysis of the selected video once the analyzer is done.
+        """
+        video = self._SelectedVideo()
+        while not self.activity_queue.empty():
+            path, analysis = self.activity_queue.get()
+            if video is not None and path == video.path:
+                self.analysis = analysis
+                self._DrawTimeline()
+                video = None  # done
+        if video is not None:
+            self.lb.after(200, self._PollActivity)
+        else:
+            self._activity_poll_active = False
 
+    def _DrawTimeline(self):
+        """Draw the activity and the cuts of the selected video along the slider.
+        """
+        self.timeline.delete('all')
+        analysis = self.analysis
+        if analysis is None:
+            return
+        # the slider trough starts and ends half a slider away from the edges
+        margin = int(self.timeSlider.cget('sliderlength')) // 2 + 2
+        width = self.timeline.winfo_width() - 2 * margin
+        height = int(self.timeline.cget('height'))
+        if width <= 0:
+            return
+        length_ms = max(self.timeSliderLength, len(analysis.activity) * 1000, 1)
+        columns = [0] * width
+        for second, value in enumerate(analysis.activity):
+            x = min(width - 1, second * 1000 * width // length_ms)
+            columns[x] = max(columns[x], value)
+        for x, value in enumerate(columns):
+            if value:
+                self.timeline.create_line(margin + x, height, margin + x, height - min(height, value * height // 32),
+                                          fill='#50a0ff')
+        for cut_ms in analysis.cuts:
+            x = margin + cut_ms * width // length_ms
+            self.timeline.create_line(x, 0, x, height, fill='#e62828')
+
+    def _JumpToMark(self, evt):
+        """Seek to the next scene cut (n), activity peak (m), or the previous
+           one with Shift.
+        """
+        analysis = self.analysis
+        if analysis is None or not self.player or self.player.get_state() not in (vlc.State.Playing, vlc.State.Paused):
+            return
+        t_ms = self.stepper.time_ms()
+        if t_ms is None:
+            t_ms = max(0, self.player.get_time())
+        forward = evt.keysym.islower()
+        if evt.keysym.lower() == 'n':
+            target = analysis.next_cut(t_ms) if forward else analysis.previous_cut(t_ms)
+        else:
+            target = analysis.next_peak(t_ms) if forward else analysis.previous_peak(t_ms)
+        if target is not None:
+            self.player.set_time(target)
+            self.stepper.reset()
+            self.str_frame.set("")
+            self.timeSliderLast = int(target * 1e-3)
+            self.timeSlider.set(target * 1e-3)
+
+    def _OnListScroll(self, *unused):
+        """The list view changed, look for the visible rows once it settles.
+        """
+        if self._thumbnail_request is not None:
+            self.lb.after_cancel(self._thumbnail_request)
+        self._thumbnail_request = self.lb.after(50, self._RequestVisibleThumbnails)
+
+    def _RequestVisibleThumbnails(self):
+        self._thumbnail_request = None
+        if not self.video_store:
+            self.thumbnail_loader.set_visible([])
+            return
+        rows = [] if self.video_list.selected is None else [self.video_list.selected]
+        rows += self.video_list.visible()
+        wanted = []
+        for i in rows:
+            if i < len(self.video_store):
+                path, mtime = self.video_store[i]
+                if (path, mtime) not in wanted and not self.thumbnail_loader.cached(path, mtime):
+                    wanted.append((path, mtime))
+        self.thumbnail_loader.set_visible(wanted)
+        if wanted and not self._thumbnail_poll_active:
+            self._thumbnail_poll_active = True
+            self.lb.after(100, self._PollThumbnails)
+
+    def _PollThumbnails(self):
+        """Show the thumbnail of the selected video once it is generated.
+        """
+        while not self.thumbnail_queue.empty():
+            path, mtime, thumbnail_path = self.thumbnail_queue.get_nowait()
+            video = self._SelectedVideo()
+            if video is not None and video.path == path:
+                self._ShowThumbnail(video, thumbnail_path)
+        if self.thumbnail_loader.busy:
+            self.lb.after(100, self._PollThumbnails)
+        else:
+            self._thumbnail_poll_active = False
+
+    def _ShowThumbnail(self, video, thumbnail_path):
+        if thumbnail_path is None:
+            thumbnail_path = self.thumbnail_loader.cached(video.path, video.mtime)
+        if thumbnail_path:
+            from PIL import Image, ImageTk
+            self.thumbnail_image = ImageTk.PhotoImage(Image.open(thumbnail_path))
+            self.label_thumbnail.config(image=self.thumbnail_image)
+        else:
+            self.label_thumbnail.config(image='')
 
-    #     except queue.Empty:
-    #         self.buttons_panel.after(100, self.update, outqueue)
+    def _DisplayName(self, path):
+        folder_path = self.folder_path.get()
+        return os.path.relpath(path, folder_path) if folder_path else path
+
+    def _UpdateScan(self, scanner, outqueue):
+        """Move the videos listed by the catalog scanner thread into the list.
+        """
+        if scanner is not self.scanner:
+            return  # a different folder was chosen meanwhile
+        done = False
+        incremental = self.catalog_query.incremental
+        try:
+            while True:
+                item = outqueue.get_nowait()
+                if item is None:
+                    done = True
+                    break
+                if item[0] == 'changes':
+                    # only the catalog knows where they go in a filtered list
+                    if incremental:
+                        self._ApplyChanges(*item[1:])
+                    else:
+                        self.catalog_stale = True
+                    continue
+                chunk = item[1]
+                selected = self._SelectedVideo()
+                with profiling.span('scan.insert', files=len(chunk)):
+                    # skip the videos already added by the folder watcher,
+                    # keep the list sorted, oldest first by default
+                    chunk = [(path, mtime) for path, mtime in chunk if path not in self.video_store]
+                    self.video_store.merge([(path, mtime, self.catalog_query.sort_key(mtime) if incremental
+                                             else len(self.video_store) + i)
+                                            for i, (path, mtime) in enumerate(chunk)])
+                if selected is not None:
+                    self.video_list.select(self.video_store.index(selected.path), see=False)
+                elif self.media_path in self.video_store:
+                    # the video being played stays selected when the list is reloaded
+                    self.video_list.select(self.video_store.index(self.media_path))
+                else:
+                    self.video_list.refresh()
+        except queue.Empty:
+            pass
+
+        if not done:
+            self.buttons_panel.after(100, self._UpdateScan, scanner, outqueue)
+            return
+        if self.catalog_stale:
+            # files changed, the catalog is up to date now, query it again
+            self._LoadFolder(self.folder_path.get() or None, refresh=False)
+            return
+        # the scanner keeps probing the new files for the catalog
+        if self.catalog_query.needs_probe:
+            self.buttons_panel.after(500, self._WaitProbed, scanner, outqueue)
+        status = "Videos (%d)" % len(self.video_store)
+        if scanner.error is not None:
+            status += " - catalog unavailable: %s" % (scanner.error,)
+        self.label_list.config(text=status)
+        if self.video_store:
+            if self.video_list.selected is None:
+                self.video_list.select(0)
+                self.onselect(0)
+        else:
+            Tk.messagebox.showinfo("Video capturer", "No videos found!")
 
+    def _WaitProbed(self, scanner, outqueue):
+        """Query a filtered list again once the catalog scanner probed the
+           new files, they have a codec and a duration now.
+        """
+        if scanner is not self.scanner:
+            return
+        try:
+            item = outqueue.get_nowait()
+        except queue.Empty:
+            self.buttons_panel.after(500, self._WaitProbed, scanner, outqueue)
+            return
+        if item[0] == 'probed' and item[1]:
+            self._LoadFolder(self.folder_path.get() or None, refresh=False)
+
+    def _UpdateFolderWatch(self):
+        """Start or stop watching the current folder, following the checkbox.
+        """
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        folder_path = self.folder_path.get()
+        if self.watchVar.get() and folder_path:
+            outqueue = queue.Queue()
+            self.watcher = folder_watcher.FolderWatcher(folder_path,
+                                                        lambda _, updated, removed: outqueue.put((updated, removed)),
+                                                        extensions=self.VIDEO_EXTENSIONS,
+                                                        recursive=self.recursiveVar.get())
+            self.watcher.start()
+            self.buttons_panel.after(250, self._ApplyFolderChanges, self.watcher, outqueue)
+
+    def _ApplyFolderChanges(self, watcher, outqueue):
+        """Take the changes found by the folder watcher.
+        """
+        if watcher is not self.watcher:
+            return
+        while not outqueue.empty():
+            updated, removed = outqueue.get_nowait()
+            if self.catalog_query.incremental:
+                self._ApplyChanges(updated, removed)
+            else:
+                # a filtered list is queried again once the folder settles
+                if self._reload_request is not None:
+                    self.lb.after_cancel(self._reload_request)
+                self._reload_request = self.lb.after(2000, self._ReloadFolder)
+        self.buttons_panel.after(250, self._ApplyFolderChanges, watcher, outqueue)
+
+    def _ApplyChanges(self, updated, removed):
+        """Insert, remove and re-sort only the videos that changed.
+        """
+        selected = self._SelectedVideo()
+        removed, inserted = self.video_store.changes(updated, removed, self.catalog_query.sort_key)
+        for path in removed:
+            self.video_store.remove(path)
+        self.video_store.merge(inserted)
+        if removed or inserted:
+            # Keep the video being played selected, without replaying it
+            self.video_list.select(self.video_store.index(selected.path)
+                                   if selected is not None and selected.path in self.video_store else None,
+                                   see=False)
+
+    def _ReloadFolder(self):
+        self._reload_request = None
+        self._LoadFolder(self.folder_path.get() or None)
+
+    def _OnFilter(self, evt=None):
+        """List the videos matching the filter, from the whole catalog if no
+           folder is chosen.
+        """
+        try:
+            self.catalog_query = video_catalog.parse_query(self.filterVar.get())
+        except ValueError as e:
+            Tk.messagebox.showinfo("Video capturer", str(e))
+            return
+        self._LoadFolder(self.folder_path.get() or None, refresh=False)
+
+    def _LoadFolder(self, folder_path, refresh=True):
+        """List folder_path (None: the whole catalog) from the catalog, then
+           with refresh bring the catalog up to date with the disk.
+        """
+        # Stop scanning the previous folder, if still running
+        if self.scanner is not None:
+            self.scanner.cancel()
+        self.video_store.clear()
+        self.video_list.reset()
+        self.catalog_stale = False
+        self.label_list.config(text="Videos")
+
+        if refresh:
+            # Watch before scanning so that no new file is missed
+            self._UpdateFolderWatch()
+
+        # Listed in background, the list is filled as results come in
+        outqueue = queue.Queue()
+        self.scanner = video_catalog.CatalogScanner(
+            self.catalog, folder_path,
+            lambda _, chunk: outqueue.put(('chunk', chunk)),
+            lambda _, updated, removed: outqueue.put(('changes', updated, removed)),
+            lambda _: outqueue.put(None),
+            query=self.catalog_query, extensions=self.VIDEO_EXTENSIONS,
+            recursive=self.recursiveVar.get(), refresh=refresh,
+            on_probed=lambda _, probed: outqueue.put(('probed', probed)))
+        self.scanner.start()
+        self.buttons_panel.after(100, self._UpdateScan, self.scanner, outqueue)
 
     def action_browse(self):
         folder_path = Tk.filedialog.askdirectory()
+        if not folder_path:
+            return
         self.folder_path.set(folder_path)
-        self.btn_browse_folder.config(state='disabled')
-        self.btn_capture.config(state='disabled')
-        self.lb.delete(0,'end')
-
-        def is_video(filename):
-            f = filename.lower()
-            return f.split('.')[-1] in ['mp4', 'mpeg', 'avi', 'mov', 'flv']
-
-        results = []
-        for path in os.listdir(folder_path):
-            if is_video(path):
-                results.append(Video(os.path.join(folder_path, path)))
-        self.results = sorted(results)
-
-        for i, r in enumerate(self.results):
-            self.lb_ids.append(i)
-            self.lb.insert(Tk.END, r.name)
-        self.btn_browse_folder.config(state='normal')
-        self.btn_capture.config(state='normal')
-
-        if self.results:
-            self.lb.select_set(0)
-            self.lb.event_generate('<<ListboxSelect>>')
-            # self.lb.focus_set(0)
-            # self.lb.selection_set( first = 0 )
-        else:
-            Tk.messagebox.showinfo("Video capturer", "No videos found!")
-
-        # self.outqueue = queue.Queue()
-        # thr = threading.Thread(target=self.process_folder,
-        #                        args=(self.folder_path.get(),
-        #                              self.outqueue))
-        # thr.start()
-        # self.buttons_panel.after(250, self.update, self.outqueue)
+        self._LoadFolder(folder_path)
 
     def action_browse_out(self):
         filename = Tk.filedialog.askdirectory()
@@ -457,6 +1091,16 @@ class Player(Tk.Frame):
     def OnClose(self, *unused):
         """Closes the window and quit.
         """
+        if self.scanner is not None:
+            self.scanner.cancel()
+        if self.burst is not None:
+            self.burst.cancel()
+            self.burst.join()
+        if self._capture_engine is not None:
+            self._capture_engine.close(wait=True)  # finish the pending captures
+        self.thumbnail_loader.close()
+        if self.preloader is not None:
+            self.preloader.clear()
         self.parent.quit()  # stops mainloop
         self.parent.destroy()  # this is necessary on Windows to avoid
         # ... Fatal Python Error: PyEval_RestoreThread: NULL tstate
@@ -497,6 +1141,8 @@ class Player(Tk.Frame):
     def OnMute(self, *unused):
         """Mute/Unmute audio.
         """
+        if not self.player:
+            return
         self.player.video_take_snapshot(0, "screentest3.png", 0, 0)
         # audio un/mute may be unreliable, see vlc.py docs.
         self.volMuted = m = not self.volMuted  # self.player.audio_get_mute()
@@ -522,12 +1168,15 @@ class Player(Tk.Frame):
         self._Play(video)
 
     def _Pause_Play(self, playing=None):
+        if not self.player:
+            return
         if playing not in [True, False]:
             playing = self.player.is_playing()
             if playing:
                 self.player.pause()
             else:
                 self.player.play()
+                self.progress.set_state('playing')
         # re-label menu item and button, adjust callbacks
         p = 'Pause (A)' if playing else 'Play (A)'
         c = self.OnPlay if playing is None else self.OnPause
@@ -535,11 +1184,25 @@ class Player(Tk.Frame):
         # self.fileMenu.bind_shortcut('p', c)  # XXX handled
         self.playButton.config(text=p, command=c)
         self._stopped = False
+        self._StartTick()
 
     def _Play(self, video):
         # helper for OnOpen and OnPlay
-        if isfile(video):  # Creation
-            m = self.Instance.media_new(str(video))  # Path, unicode
+        if self.player and isfile(video):  # Creation
+            self.stepper.new_video()
+            # Real frame rate for the stepper, and metadata for the captures,
+            # without waiting for ffprobe on this thread
+            probe_cache.request_metadata(video, lambda *ready: self.probe_queue.put(ready))
+            if not self._probe_poll_active:
+                self._probe_poll_active = True
+                self.parent.after(50, self._PollProbe)
+            m = self.preloader.get(video)  # Path, unicode
+            # Silent mode: no audio decoding while muted
+            options = self.vlc_profile.media_options(self._Muted())
+            for option in options:
+                m.add_option(option)
+            self.media_path = video
+            self.media_silent = bool(options)
             self.player.set_media(m)
             self.parent.title("tkVLCplayer - %s" % (basename(video),))
 
@@ -565,14 +1228,21 @@ class Player(Tk.Frame):
     def OnPause(self, *unused):
         """Toggle between Pause and Play.
         """
-        if self.player.get_media():
+        if self.player and self.player.get_media():
+            if not self.player.is_playing():
+                self.progress.set_state('playing')
             self._Pause_Play(not self.player.is_playing())
             self.player.pause()  # toggles
 
     def OnPlay(self, *unused):
+        if not self.player:
+            return
+        self.stepper.reset()
+        self.str_frame.set("")
         if self.player.play():  # == -1
             self.showError("Unable to play the video.")
         else:
+            self.progress.set_state('playing')
             self._Pause_Play(True)
             # set volume slider to audio level
             vol = self.player.audio_get_volume()
@@ -621,23 +1291,38 @@ class Player(Tk.Frame):
         # [h264 @ 0x7f84fb061200] decode_slice_header error
         # [h264 @ 0x7f84fb061200] no frame!
 
+    def _StartTick(self):
+        """Make sure OnTick runs, at least once.
+        """
+        if not self._tick_active:
+            self._tick_active = True
+            self.parent.after(self.TICK_MS, self.OnTick)
+
     def OnTick(self):
-        """Timer tick, update the time slider to the video time.
+        """Timer tick, update the time slider from the last libvlc events.
         """
-        if self.player:
-            # since the self.player.get_length may change while
-            # playing, re-set the timeSlider to the correct range
-            t = self.player.get_length() * 1e-3  # to seconds
-            if t > 0:
-                self.timeSlider.config(to=t)
-
-                t = self.player.get_time() * 1e-3  # to seconds
-                # don't change slider while user is messing with it
-                if t > 0 and time.time() > (self.timeSliderUpdate + 2):
-                    self.timeSlider.set(t)
-                    self.timeSliderLast = int(self.timeVar.get())
-        # start the 1 second timer again
-        self.parent.after(500, self.OnTick)
+        self._tick_active = False
+        t_ms, length_ms, state = self.progress.take()
+        # the length may change while playing, re-set the
+        # timeSlider range only when libvlc reports a new one
+        if length_ms and length_ms > 0 and length_ms != self.timeSliderLength:
+            self.timeSliderLength = length_ms
+            self.timeSlider.config(to=length_ms * 1e-3)
+            self._DrawTimeline()
+        if t_ms and state == 'playing' and self.skipIdleVar.get() and self.analysis is not None:
+            resume_ms = self.analysis.idle_end(t_ms)
+            if resume_ms is not None:
+                self.player.set_time(resume_ms)
+        if t_ms and t_ms > 0 and self.timeSliderLength:
+            t = t_ms * 1e-3  # to seconds
+            # don't change slider while user is messing with it
+            if time.time() > (self.timeSliderUpdate + 2) and not self.timeSliderDragging:
+                self.timeSliderLast = int(t)
+                self.timeSlider.set(t)
+                self.timeSliderLast = int(self.timeVar.get())
+        # keep ticking only while playing, an idle player costs nothing
+        if self.progress.playing:
+            self._StartTick()
 
     def OnTime(self, *unused):
         if self.player:
@@ -661,8 +1346,31 @@ class Player(Tk.Frame):
                 # routine wait for at least 2 seconds before it starts
                 # updating the slider again (so the timer doesn't start
                 # fighting with the user).
-                self.player.set_time(int(t * 1e3))  # milliseconds
+                t_ms = int(t * 1e3)  # milliseconds
+                index = self._KeyframeIndex()
+                if self.timeSliderDragging and index:
+                    # fast seek: nothing to decode on a keyframe
+                    t_ms = index.nearest(t_ms)
+                self.player.set_time(t_ms)
                 self.timeSliderUpdate = time.time()
+                self._StartTick()
+                self.stepper.reset()
+                self.str_frame.set("")
+
+    def _KeyframeIndex(self):
+        video = self._SelectedVideo()
+        if video is not None:
+            return keyframes.cached_index(video.path)
+        return None
+
+    def _OnTimeReleased(self, *unused):
+        """Time slider released, seek to the exact position.
+        """
+        self.timeSliderDragging = False
+        if self.player and self.player.get_media():
+            self.player.set_time(int(self.timeVar.get() * 1e3))
+            self.timeSliderUpdate = time.time()
+            self._StartTick()
 
     def OnVolume(self, *unused):
         """Volume slider changed, adjust the audio volume.
@@ -675,6 +1383,28 @@ class Player(Tk.Frame):
             # e.g. if the player is stopped or doesn't have media
             if self.player.audio_set_volume(vol):  # and self.player.get_media():
                 self.showError("Failed to set the volume: %s." % (v_M,))
+        self._UpdateSilent()
+
+    def _Muted(self):
+        return self.volMuted or self.volVar.get() == 0
+
+    def _UpdateSilent(self):
+        """Open the video again at the same time, with or without its audio
+           track, when it becomes audible or muted (silent mode).
+        """
+        options = self.vlc_profile.media_options(self._Muted())
+        if not self.player or not self.media_path or bool(options) == self.media_silent:
+            return
+        self.media_silent = bool(options)
+        state = self.player.get_state()
+        if state in (vlc.State.Playing, vlc.State.Paused):
+            options += (':start-time=%.3f' % (max(0, self.player.get_time()) * 1e-3),)
+            if state == vlc.State.Paused:
+                options += (':start-paused',)
+        self.player.set_media(self.Instance.media_new(str(self.media_path), *options))
+        if state in (vlc.State.Playing, vlc.State.Paused):
+            self.player.play()
+            self.player.audio_set_volume(min(self.volVar.get(), 100))
 
     def showError(self, message):
         """Display a simple error dialog.
@@ -686,6 +1416,7 @@ class Player(Tk.Frame):
 if __name__ == "__main__":
 
     _video = 'video.mp4'
+    _vlc_profile = vlc_profiles.DEFAULT_PROFILE
 
     while len(sys.argv) > 1:
         arg = sys.argv.pop(1)
@@ -709,8 +1440,15 @@ if __name__ == "__main__":
                 pass
             sys.exit(0)
 
+        elif arg == '--profile' or arg.startswith('--profile=') or arg == '--startup-time':
+            profiling.enable_from_argv([arg])
+
+        elif arg.startswith('--vlc-profile='):
+            _vlc_profile = arg.partition('=')[2]
+
         elif arg.startswith('-'):
-            print('usage: %s  [-v | --version]  [<video_file_name>]' % (sys.argv[0],))
+            print('usage: %s  [-v | --version]  [--profile[=<file>]]  [--startup-time]  [--vlc-profile=<name>]'
+                  '  [<video_file_name>]' % (sys.argv[0],))
             sys.exit(1)
 
         elif arg:  # video file
@@ -719,8 +1457,14 @@ if __name__ == "__main__":
                 print('%s error: no such file: %r' % (sys.argv[0], arg))
                 sys.exit(1)
 
+    try:
+        _vlc_profile = vlc_profiles.get_profile(_vlc_profile)
+    except ValueError as e:
+        print('%s error: %s' % (sys.argv[0], e))
+        sys.exit(1)
+
     # Create a Tk.App() to handle the windowing event loop
     root = Tk.Tk()
-    player = Player(root, video=_video)
+    player = Player(root, video=_video, vlc_profile=_vlc_profile)
     root.protocol("WM_DELETE_WINDOW", player.OnClose)  # XXX unnecessary (on macOS)
     root.mainloop()
\ No newline at end of file
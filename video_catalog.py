@@ -0,0 +1,434 @@
+"""Persistent SQLite catalog of the videos of the scanned folders.
+
+Every video found by a scan is stored with its size, modification time,
+duration, codec, resolution and the number of captures made of it, in
+XDG_CACHE_HOME/video-screenshoter/catalog.sqlite (SCREENSHOTER_CATALOG).
+Opening a folder lists it from the catalog at once, then CatalogScanner
+compares it with the disk in background: only the files whose size or
+modification time changed are written, and those are probed for their
+duration, codec and resolution one by one once the scan is over.
+
+The catalog is queried with indexed filters and sort orders, across folders
+or within one, written as a few words (see parse_query), e.g.
+
+  hevc >60s uncaptured newest
+
+Videos not probed yet have no codec nor duration: they only match the
+queries that do not filter on them, the front-ends run those again once the
+scanner is done probing.
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from os.path import expanduser
+
+import folder_scanner
+import probe_cache
+import profiling
+
+SCHEMA_VERSION = 1
+CATALOG_PATH = os.environ.get('SCREENSHOTER_CATALOG') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME', expanduser('~/.cache')), 'video-screenshoter', 'catalog.sqlite')
+
+SCHEMA = '''
+CREATE TABLE videos (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    codec TEXT,
+    width INTEGER,
+    height INTEGER,
+    probed INTEGER NOT NULL DEFAULT 0,
+    capture_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX videos_folder_mtime ON videos (folder, mtime);
+CREATE INDEX videos_mtime ON videos (mtime);
+CREATE INDEX videos_codec_mtime ON videos (codec, mtime);
+CREATE INDEX videos_duration ON videos (duration);
+CREATE INDEX videos_captures_mtime ON videos (capture_count, mtime);
+CREATE INDEX videos_unprobed ON videos (folder) WHERE NOT probed
+'''
+
+# query word: (column, descending)
+ORDERS = {
+    'oldest': ('mtime', False),
+    'newest': ('mtime', True),
+    'shortest': ('duration', False),
+    'longest': ('duration', True),
+    'smallest': ('size', False),
+    'largest': ('size', True),
+    'name': ('path', False),
+    'most-captured': ('capture_count', True),
+}
+# query word: ffprobe codec name, any other one is given as codec:NAME
+CODECS = {'h264': 'h264', 'avc': 'h264', 'hevc': 'hevc', 'h265': 'hevc', 'vp9': 'vp9', 'av1': 'av1',
+          'mpeg4': 'mpeg4', 'prores': 'prores', 'mjpeg': 'mjpeg'}
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'min': 60, 'h': 3600}
+_DURATION_TERM = re.compile(r'(?:duration)?([<>])(\d+(?:\.\d*)?)(s|m|min|h)?$')
+
+
+class Query(object):
+    """Filters and order of the videos listed from the catalog.
+
+       codec is an ffprobe codec name, the durations are in seconds and
+       captured is True or False to keep only the videos captured at least
+       once or never, order is one of ORDERS.
+    """
+
+    def __init__(self, codec=None, min_duration=None, max_duration=None, captured=None, order='oldest'):
+        if order not in ORDERS:
+            raise ValueError('unknown order %r, choose one of: %s' % (order, ', '.join(ORDERS)))
+        self.codec = codec
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.captured = captured
+        self.order = order
+
+    def __repr__(self):
+        return 'Query(%r)' % (self.__dict__,)
+
+    @property
+    def incremental(self):
+        """True if new files can be placed without the catalog: no filter
+           and sorted by modification time.  Other queries are run again.
+        """
+        return (self.codec is None and self.min_duration is None and self.max_duration is None
+                and self.captured is None and ORDERS[self.order][0] == 'mtime')
+
+    @property
+    def needs_probe(self):
+        """True if the result depends on the probed metadata of the videos."""
+        return (self.codec is not None or self.min_duration is not None or self.max_duration is not None
+                or ORDERS[self.order][0] == 'duration')
+
+    def sort_key(self, mtime):
+        """Ascending key of a video of an incremental query."""
+        return -mtime if ORDERS[self.order][1] else mtime
+
+    def where(self):
+        """SQL conditions and their parameters."""
+        clauses, params = [], []
+        if self.codec is not None:
+            clauses.append('codec = ?')
+            params.append(self.codec)
+        if self.min_duration is not None:
+            clauses.append('duration > ?')
+            params.append(self.min_duration)
+        if self.max_duration is not None:
+            clauses.append('duration < ?')
+            params.append(self.max_duration)
+        if self.captured is not None:
+            clauses.append('capture_count > 0' if self.captured else 'capture_count = 0')
+        return clauses, params
+
+    def order_by(self):
+        column, descending = ORDERS[self.order]
+        return '%s %s, path' % (column, 'DESC' if descending else 'ASC')
+
+
+def parse_query(text):
+    """Query of the words of text, ValueError on an unknown one:
+       a codec (hevc, h264... or codec:NAME), >DURATION or <DURATION (60s,
+       5m, 1h), captured or uncaptured and one of ORDERS.
+    """
+    kwargs = {}
+    for word in text.lower().split():
+        match = _DURATION_TERM.match(word)
+        if word in ORDERS:
+            kwargs['order'] = word
+        elif word in CODECS:
+            kwargs['codec'] = CODECS[word]
+        elif word.startswith('codec:') and len(word) > 6:
+            kwargs['codec'] = CODECS.get(word[6:], word[6:])
+        elif word in ('captured', 'uncaptured'):
+            kwargs['captured'] = word == 'captured'
+        elif match:
+            seconds = float(match.group(2)) * DURATION_UNITS[match.group(3) or '']
+            kwargs['min_duration' if match.group(1) == '>' else 'max_duration'] = seconds
+        else:
+            raise ValueError('unknown filter %r, use a codec (hevc, codec:NAME), >60s, <5m, '
+                             'captured, uncaptured or one of: %s' % (word, ', '.join(ORDERS)))
+    return Query(**kwargs)
+
+
+def _folder_where(folder, recursive):
+    """SQL condition and parameters of the videos of folder, all if None."""
+    if folder is None:
+        return [], []
+    if not recursive:
+        return ['folder = ?'], [folder]
+    # path range of the tree, uses the primary key index
+    prefix = folder.rstrip(os.sep) + os.sep
+    return ['path >= ? AND path < ?'], [prefix, prefix[:-1] + chr(ord(os.sep) + 1)]
+
+
+class Catalog(object):
+    """The catalog database at path, one connection per thread."""
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _connect(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+        except (OSError, sqlite3.Error):
+            # A read-only home should not break the player, keep it in memory
+            conn = sqlite3.connect('file:video-catalog?mode=memory&cache=shared', uri=True,
+                                   timeout=10, isolation_level=None)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        with _Transaction(conn):
+            if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS videos')
+                for statement in SCHEMA.split(';'):
+                    conn.execute(statement)
+                conn.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+        return conn
+
+    def iter_query(self, folder=None, recursive=False, query=None, chunk_size=256):
+        """Yield lists of (path, mtime) of the videos of folder, of the
+           whole catalog if None, matching query, in its order.
+        """
+        query = query or Query()
+        clauses, params = _folder_where(folder, recursive)
+        more_clauses, more_params = query.where()
+        sql = 'SELECT path, mtime FROM videos'
+        if clauses or more_clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses + more_clauses)
+        cursor = self._connection().execute(sql + ' ORDER BY ' + query.order_by(), params + more_params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def query(self, folder=None, recursive=False, query=None):
+        """List of (path, mtime), see iter_query."""
+        return [row for chunk in self.iter_query(folder, recursive, query) for row in chunk]
+
+    def stamps(self, folder, recursive=False):
+        """{path: (size, mtime_ns)} of the videos of folder."""
+        clauses, params = _folder_where(folder, recursive)
+        return {path: (size, mtime_ns) for path, size, mtime_ns in self._connection().execute(
+            'SELECT path, size, mtime_ns FROM videos WHERE ' + ' AND '.join(clauses), params)}
+
+    def update(self, files):
+        """Add or update the (path, mtime, size, mtime_ns) of files, the
+           metadata of an updated file is probed again.
+        """
+        conn = self._connection()
+        with _Transaction(conn):
+            conn.executemany(
+                'INSERT INTO videos (path, folder, mtime, size, mtime_ns) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (path) DO UPDATE SET folder = excluded.folder, mtime = excluded.mtime, '
+                'size = excluded.size, mtime_ns = excluded.mtime_ns, '
+                'duration = NULL, codec = NULL, width = NULL, height = NULL, probed = 0',
+                ((path, os.path.dirname(path), mtime, size, mtime_ns) for path, mtime, size, mtime_ns in files))
+
+    def remove(self, paths):
+        conn = self._connection()
+        with _Transaction(conn):
+            conn.executemany('DELETE FROM videos WHERE path = ?', ((path,) for path in paths))
+
+    def unprobed(self, folder=None, recursive=False, limit=64):
+        """Paths of videos of folder whose metadata was not probed yet."""
+        clauses, params = _folder_where(folder, recursive)
+        return [path for path, in self._connection().execute(
+            'SELECT path FROM videos WHERE %s LIMIT ?' % ' AND '.join(['NOT probed'] + clauses),
+            params + [limit])]
+
+    def set_metadata(self, path, meta):
+        """Store the probe_cache metadata of path, None if it could not be probed."""
+        meta = meta or {}
+        self._connection().execute(
+            'UPDATE videos SET duration = ?, codec = ?, width = ?, height = ?, probed = 1 WHERE path = ?',
+            (meta.get('duration'), meta.get('codec'), meta.get('width'), meta.get('height'), path))
+
+    def add_capture(self, path):
+        """Count a capture of path, if it is in the catalog."""
+        try:
+            self._connection().execute(
+                'UPDATE videos SET capture_count = capture_count + 1 WHERE path = ?', (path,))
+        except sqlite3.Error as e:
+            # the capture itself is saved, do not report it as failed
+            print('video catalog: %s' % (e,), file=sys.stderr)
+
+
+class _Transaction(object):
+    """BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on error."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, *exc):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+_default_catalog = None
+
+
+def default_catalog():
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = Catalog()
+    return _default_catalog
+
+
+class CatalogScanner(threading.Thread):
+    """List folder_path from catalog, then bring the catalog up to date.
+
+       Like folder_scanner.FolderScanner, on_chunk(scanner, chunk) gets the
+       (path, mtime) of the videos of the catalog matching query, in its
+       order.  Then, with refresh, the folder is scanned and
+       on_changes(scanner, updated, removed) gets the files that are new or
+       changed, as (path, mtime), and the removed paths, whether they match
+       query or not (see folder_watcher.FolderWatcher), and on_done(scanner)
+       is called.  The new files are probed afterwards, until cancelled,
+       then on_probed(scanner, count) gets the number of files probed, the
+       query may match more videos if it needs_probe.  With folder_path
+       None the whole catalog is listed.
+
+       The callbacks are called from the scanner thread, front-ends must
+       marshal them onto their event loop and ignore calls from a scanner
+       that is not the current one.  If the catalog can not be used the
+       folder is scanned without it, error tells why.
+    """
+
+    def __init__(self, catalog, folder_path, on_chunk, on_changes, on_done=None, query=None,
+                 extensions=folder_scanner.VIDEO_EXTENSIONS, recursive=False, refresh=True,
+                 chunk_size=256, on_probed=None):
+        super().__init__(name='catalog-scanner', daemon=True)
+        self.catalog = catalog
+        self.folder_path = os.path.normpath(folder_path) if folder_path else None
+        self.on_chunk = on_chunk
+        self.on_changes = on_changes
+        self.on_done = on_done
+        self.on_probed = on_probed
+        self.query = query or Query()
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.recursive = recursive
+        self.refresh = refresh and self.folder_path is not None
+        self.chunk_size = chunk_size
+        self.error = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            self._load()
+            if self.refresh:
+                self._refresh()
+        except sqlite3.Error as e:
+            # The catalog is only a cache, list the folder without it
+            self.error = e
+            if self.folder_path is not None:
+                for chunk in folder_scanner.scan(self.folder_path, self.extensions, self.recursive,
+                                                 self._cancel, self.chunk_size):
+                    self.on_chunk(self, chunk)
+        if self.cancelled:
+            return
+        if self.on_done:
+            self.on_done(self)
+        probed = 0
+        if self.error is None:
+            try:
+                probed = self._probe()
+            except sqlite3.Error as e:
+                self.error = e
+        if self.on_probed and not self.cancelled:
+            self.on_probed(self, probed)
+
+    def _load(self):
+        start = time.perf_counter()
+        count = 0
+        for chunk in self.catalog.iter_query(self.folder_path, self.recursive, self.query, self.chunk_size):
+            if self.cancelled:
+                return
+            chunk = [row for row in chunk if row[0].lower().endswith(self.extensions)]
+            count += len(chunk)
+            self.on_chunk(self, chunk)
+        profiling.record('catalog.load', time.perf_counter() - start, files=count)
+
+    def _is_scanned(self, path):
+        """True if the scan of the folder would find path, a catalog path."""
+        if not path.lower().endswith(self.extensions):
+            return False
+        # the scan skips the hidden folders
+        return os.sep + '.' not in os.path.dirname(path)[len(self.folder_path):]
+
+    def _refresh(self):
+        start = time.perf_counter()
+        known = self.catalog.stamps(self.folder_path, self.recursive)
+        count = changed_count = 0
+        for chunk in folder_scanner.scan(self.folder_path, self.extensions, self.recursive,
+                                         self._cancel, self.chunk_size, details=True):
+            count += len(chunk)
+            changed = [row for row in chunk if known.pop(row[0], None) != (row[2], row[3])]
+            if changed:
+                changed_count += len(changed)
+                self.catalog.update(changed)
+                self.on_changes(self, [(path, mtime) for path, mtime, _, _ in changed], [])
+        if self.cancelled:
+            return
+        removed = [path for path in known if self._is_scanned(path)]
+        if removed:
+            self.catalog.remove(removed)
+            self.on_changes(self, [], removed)
+        profiling.record('catalog.refresh', time.perf_counter() - start, files=count,
+                         changed=changed_count, removed=len(removed))
+
+    def _probe(self):
+        """Probe the new and changed files, one at a time, through probe_cache.
+           Returns the number of files probed.
+        """
+        probed = 0
+        try:
+            import ffmpeg
+        except ImportError:
+            return probed
+        while not self.cancelled:
+            paths = self.catalog.unprobed(self.folder_path, self.recursive)
+            if not paths:
+                return probed
+            for path in paths:
+                if self.cancelled:
+                    return probed
+                with profiling.span('catalog.probe'):
+                    try:
+                        meta = probe_cache.get_metadata(path)
+                    except (ValueError, ffmpeg.Error):
+                        meta = None  # not a readable video, do not try again
+                    except OSError:
+                        if os.path.exists(path):
+                            return probed  # no ffprobe
+                        meta = None  # removed since the scan
+                self.catalog.set_metadata(path, meta)
+                probed += 1
+        return probed
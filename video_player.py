@@ -1,59 +1,616 @@
 import sys
 import os
+import profiling  # first, the startup milestones are timed from its import
 import vlc
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QPushButton, QFileDialog, QVBoxLayout, QListWidget, QLabel, QSplitter, QHBoxLayout, QSlider, QLineEdit
+    QApplication, QWidget, QPushButton, QFileDialog, QVBoxLayout, QListView, QLabel, QSplitter, QHBoxLayout, QSlider, QLineEdit,
+    QCheckBox, QSpinBox, QComboBox, QStyle, QStyleOptionSlider, QFrame, QGridLayout
 )
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QIcon, QKeyEvent
-import datetime
+from PyQt5.QtCore import Qt, QTimer, QPoint, QSize, pyqtSignal, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import QIcon, QKeyEvent, QPainter, QColor
+import threading
 import time
 
-import ffmpeg
-from PIL import Image
-from PIL import ImageCms
+import activity
+import burst_capture
+import dedup
+import encoders
+import folder_watcher
+import frame_step
+import grid_sync
+import keyframes
+import media_preload
+import player_events
+import probe_cache
+import thumbnails
+import video_catalog
+import video_store
+import vlc_profiles
 
+profiling.milestone('imports')
 
-class CustomListWidget(QListWidget):
-    def __init__(self, parent=None):
+
+class VideoListModel(QAbstractListModel):
+    """Rows of a video_store.VideoStore, built as the view needs them.
+
+       The view is given FETCH_ROWS more rows (fetchMore) each time it
+       scrolls to the end of the ones it has, and the text and thumbnail of
+       a row are only looked up when it is painted.
+    """
+    FETCH_ROWS = 512
+    MAX_ICONS = 2000  # thumbnails kept, the oldest ones are loaded again when needed
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.folder = ""
+        self.loaded = 0  # rows given to the view
+        self.icons = {}  # path -> QIcon
+
+    def reset(self, folder=""):
+        """Empty the list, the paths will be shown relative to folder."""
+        self.beginResetModel()
+        self.store.clear()
+        self.folder = folder
+        self.loaded = 0
+        self.icons = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.loaded < len(self.store)
+
+    def fetchMore(self, parent):
+        if not parent.isValid():
+            self.fetch_to(self.loaded + self.FETCH_ROWS - 1)
+
+    def fetch_to(self, row):
+        """Give the rows up to row to the view."""
+        last = min(row, len(self.store) - 1)
+        if last >= self.loaded:
+            self.beginInsertRows(QModelIndex(), self.loaded, last)
+            self.loaded = last + 1
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        path = self.store.path(index.row())
+        if role == Qt.DisplayRole:
+            return os.path.relpath(path, self.folder) if self.folder else path
+        if role == Qt.DecorationRole:
+            return self.icons.get(path)
+        return None
+
+    def insert(self, path, mtime, key):
+        """Insert a video into the store, and its row if it lands among the
+           rows of the view.  Returns its row.
+        """
+        row = self.store.position(key)
+        if row < self.loaded:
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.store.insert(path, mtime, key)
+            self.loaded += 1
+            self.endInsertRows()
+        else:
+            self.store.insert(path, mtime, key)
+        return row
+
+    def merge(self, videos):
+        """Insert videos (path, mtime, key) that are not in the store.  The
+           ones landing after the rows of the view are merged into the store
+           in one pass and fetched by the view as it scrolls (fetchMore),
+           only the ones among its rows are inserted one by one.
+        """
+        visible, tail = [], []
+        for video in videos:
+            (visible if self.store.position(video[2]) < self.loaded else tail).append(video)
+        self.store.merge(tail)  # all after the loaded rows, nothing to tell the view
+        for video in visible:
+            self.insert(*video)
+        if self.loaded < self.FETCH_ROWS:
+            self.fetch_to(self.FETCH_ROWS - 1)  # the first page, in one insertion
+
+    def remove(self, path):
+        """Remove path, return its row or -1 if it was not in the list."""
+        row = self.store.index(path)
+        if 0 <= row < self.loaded:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.store.remove(path)
+            self.loaded -= 1
+            self.endRemoveRows()
+        elif row >= 0:
+            self.store.remove(path)
+        self.icons.pop(path, None)
+        return row
+
+    def apply_changes(self, updated, removed, sort_key):
+        """Apply the changes of a folder_watcher.FolderWatcher, True if the
+           list changed.
+        """
+        removed, inserted = self.store.changes(updated, removed, sort_key)
+        for path in removed:
+            self.remove(path)
+        self.merge(inserted)
+        return bool(removed or inserted)
+
+    def has_icon(self, path):
+        return path in self.icons
+
+    def set_icon(self, row, icon):
+        self.icons[self.store.path(row)] = icon
+        while len(self.icons) > self.MAX_ICONS:
+            del self.icons[next(iter(self.icons))]
+        if row < self.loaded:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class VideoListView(QListView):
+    """View of a VideoListModel, with the row API of QListWidget.  The keys
+       go to the player too.
+    """
+    currentRowChanged = pyqtSignal(int)
+
+    def __init__(self, model, parent=None):
         super().__init__(parent)
         self.parent_widget = parent
+        self.setUniformItemSizes(True)  # rows are laid out without asking for each size
+        self.setEditTriggers(QListView.NoEditTriggers)
+        self.setModel(model)
+        self.selectionModel().currentRowChanged.connect(
+            lambda current, previous: self.currentRowChanged.emit(current.row()))
 
     def keyPressEvent(self, event: QKeyEvent):
         if self.parent_widget:
             self.parent_widget.keyPressEvent(event)
         super().keyPressEvent(event)
 
+    def currentRow(self):
+        return self.currentIndex().row()
+
+    def setCurrentRow(self, row):
+        self.model().fetch_to(row)
+        self.setCurrentIndex(self.model().index(row))
+
+
+class TimelineSlider(QSlider):
+    """Progress slider showing the activity curve and the scene cuts of the video."""
+
+    def __init__(self, parent=None):
+        super().__init__(Qt.Horizontal, parent)
+        self.analysis = None
+        self.length_ms = 0
+        self._columns = None  # activity per pixel of the groove, for its current width
+
+    def set_analysis(self, analysis, length_ms=0):
+        self.analysis = analysis
+        self.length_ms = length_ms
+        self._columns = None
+        self.update()
+
+    def _groove(self):
+        option = QStyleOptionSlider()
+        self.initStyleOption(option)
+        return self.style().subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderGroove, self)
+
+    def _length_ms(self):
+        return max(self.length_ms, len(self.analysis.activity) * 1000, 1)
+
+    def resizeEvent(self, event):
+        self._columns = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.analysis is not None:
+            groove = self._groove()
+            width = max(1, groove.width())
+            if self._columns is None or len(self._columns) != width:
+                # strongest activity of the seconds under each pixel
+                self._columns = [0] * width
+                seconds_per_pixel = self._length_ms() / 1000.0 / width
+                for second, value in enumerate(self.analysis.activity):
+                    x = min(width - 1, int(second / seconds_per_pixel))
+                    self._columns[x] = max(self._columns[x], value)
+            painter = QPainter(self)
+            bottom, height = self.rect().bottom(), self.rect().height()
+            painter.setPen(QColor(80, 160, 255, 160))
+            for x, value in enumerate(self._columns):
+                if value:
+                    painter.drawLine(groove.left() + x, bottom,
+                                     groove.left() + x, bottom - min(height, value * height // 32))
+            painter.setPen(QColor(230, 40, 40))
+            for cut_ms in self.analysis.cuts:
+                x = groove.left() + int(cut_ms * width / self._length_ms())
+                painter.drawLine(x, self.rect().top(), x, bottom)
+            painter.end()
+
+
+def set_video_output(player, widget):
+    """Render the video of player into the native window of widget."""
+    if sys.platform == "win32":
+        player.set_hwnd(int(widget.winId()))
+    elif sys.platform == "darwin":
+        player.set_nsobject(int(widget.winId()))
+    else:
+        player.set_xwindow(int(widget.winId()))
+
+
+class GridTile(QFrame):
+    """One video of the grid, framed in blue when it has the focus."""
+
+    def __init__(self, index, on_click, parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.on_click = on_click
+        self.surface = QWidget(self)
+        self.surface.setStyleSheet("background-color: black;")
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(2, 2, 2, 2)
+        layout.addWidget(self.surface)
+        self.set_focused(False)
+
+    def set_focused(self, focused):
+        self.setStyleSheet("GridTile { background-color: %s; }" % ("#3a8ee6" if focused else "black"))
+
+    def mousePressEvent(self, event):
+        self.on_click(self.index)
+        super().mousePressEvent(event)
+
+
+class VideoGrid(QWidget):
+    """size x size videos played side by side, e.g. the recordings of
+       several cameras over the same time window.
+
+       The tiles share the vlc.Instance of the player.  The focused tile
+       decodes at full quality with sound and is the sync master (see
+       grid_sync), the others play without sound, skip the loop filter and
+       the non-reference frames and use a single decoding thread, which keeps
+       a 3x3 grid smooth on 8 CPU cores.  The focused tile follows the
+       silent mode of profile (see vlc_profiles) too.
+    """
+    FOCUSED_OPTIONS = ()
+    BACKGROUND_OPTIONS = (':no-audio', ':avcodec-skiploopfilter=4', ':avcodec-skip-frame=1',
+                          ':avcodec-threads=1')
+    SYNC_INTERVAL_MS = 500
+
+    # Emitted from the probe thread
+    timing_ready = pyqtSignal(object, object, str)
+    # Time and length (ms) of the focused video, on every sync
+    position_changed = pyqtSignal(int, int)
+
+    def __init__(self, instance, size, profile, parent=None):
+        super().__init__(parent)
+        self.instance = instance
+        self.profile = profile
+        layout = QGridLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
+        self.tiles = []
+        self.players = []
+        for i in range(size * size):
+            tile = GridTile(i, self.set_focus, self)
+            layout.addWidget(tile, i // size, i % size)
+            player = instance.media_player_new()
+            # let the clicks reach the tiles
+            player.video_set_mouse_input(False)
+            player.video_set_key_input(False)
+            self.tiles.append(tile)
+            self.players.append(player)
+        self.videos = []  # [(path, mtime)] of the tiles
+        self.durations = None  # ms, once probed
+        self.starts = None  # wall clock time of the first frame of each video
+        self.focus = 0
+        self.playing = False
+        self.volume = 0
+        self.tiles[0].set_focused(True)
+        self.timing_ready.connect(self._start)
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setInterval(self.SYNC_INTERVAL_MS)
+        self.sync_timer.timeout.connect(self.sync)
+
+    def load(self, videos, sync_mode=grid_sync.DEFAULT_SYNC):
+        """Play the first videos [(path, mtime)], one per tile."""
+        self.stop()
+        videos = list(videos[:len(self.tiles)])
+        self.videos = videos
+        self.starts = None
+        self.set_focus(0)
+        # The durations may need a probe of each file, done in background
+        threading.Thread(target=lambda: self.timing_ready.emit(videos, grid_sync.durations_ms(videos), sync_mode),
+                         name='grid-probe', daemon=True).start()
+
+    def _start(self, videos, durations, sync_mode):
+        if videos is not self.videos:
+            return  # other videos loaded meanwhile
+        self.durations = durations
+        self.starts = grid_sync.start_times(videos, durations, sync_mode)
+        # The focused video from its start, the others at the same instant
+        for i in range(len(videos)):
+            target = grid_sync.tile_time(self.starts, self.focus, 0, i)
+            self._open(i, max(0, target), paused=not self._in_range(i, target))
+        self.playing = True
+        self.sync_timer.start()
+
+    def _open(self, i, time_ms, paused=False):
+        """(Re)open the video of tile i at time_ms, with the decoding options of its focus."""
+        if i == self.focus:
+            options = self.FOCUSED_OPTIONS + self.profile.media_options(self.volume == 0)
+        else:
+            options = self.BACKGROUND_OPTIONS
+        options += (':start-time=%.3f' % (time_ms / 1000.0),)
+        if paused:
+            options += (':start-paused',)
+        player = self.players[i]
+        player.set_media(self.instance.media_new(self.videos[i][0], *options))
+        set_video_output(player, self.tiles[i].surface)
+        player.play()
+        if i == self.focus:
+            player.audio_set_volume(self.volume)
+
+    def _in_range(self, i, time_ms):
+        return time_ms >= 0 and (not self.durations[i] or time_ms < self.durations[i])
+
+    def set_focus(self, index):
+        """Give the focus, the full quality decoding and the sound to tile index."""
+        if index == self.focus or index >= max(1, len(self.videos)):
+            return
+        previous, self.focus = self.focus, index
+        self.tiles[previous].set_focused(False)
+        self.tiles[index].set_focused(True)
+        if self.starts is not None:
+            for i in (previous, index):
+                self._open(i, max(0, self.players[i].get_time()), paused=not self.playing)
+
+    def focused_video(self):
+        """(player, path, mtime) of the focused tile, None if it is empty."""
+        if self.focus >= len(self.videos):
+            return None
+        return (self.players[self.focus],) + self.videos[self.focus]
+
+    def set_volume(self, volume):
+        muted_changed = (volume == 0) != (self.volume == 0)
+        self.volume = volume
+        if self.focus >= len(self.videos):
+            return
+        if muted_changed and self.profile.silent_when_muted and self.starts is not None:
+            # the audio track is only decoded while audible
+            self._open(self.focus, max(0, self.players[self.focus].get_time()), paused=not self.playing)
+        else:
+            self.players[self.focus].audio_set_volume(volume)
+
+    def sync(self):
+        master = self.players[self.focus]
+        master_ms = master.get_time()
+        if self.starts is None or master_ms < 0:
+            return
+        self._align(master_ms)
+        self.position_changed.emit(master_ms, max(0, master.get_length()))
+
+    def _align(self, master_ms):
+        """Move the other tiles to the instant of the focused one at master_ms."""
+        for i, player in enumerate(self.players[:len(self.videos)]):
+            if i == self.focus:
+                continue
+            target = grid_sync.tile_time(self.starts, self.focus, master_ms, i)
+            if not self._in_range(i, target):
+                player.set_pause(1)  # not recording at that time
+            elif player.get_state() in (vlc.State.Ended, vlc.State.Stopped, vlc.State.Error):
+                self._open(i, target, paused=not self.playing)
+            else:
+                if grid_sync.needs_seek(player.get_time(), target):
+                    player.set_time(target)
+                if self.playing and not player.is_playing():
+                    player.set_pause(0)
+
+    def play(self):
+        if self.starts is None:
+            return
+        self.playing = True
+        self.players[self.focus].set_pause(0)
+        self.sync()
+        self.sync_timer.start()
+
+    def pause(self):
+        self.playing = False
+        self.sync_timer.stop()
+        for player in self.players[:len(self.videos)]:
+            player.set_pause(1)
+
+    def toggle_pause(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+
+    def seek(self, fraction):
+        """Seek the focused video to fraction of its length, and the others along."""
+        if self.starts is None:
+            return
+        master = self.players[self.focus]
+        master_ms = int(fraction * max(0, master.get_length()))
+        master.set_time(master_ms)
+        self._align(master_ms)
+
+    def stop(self):
+        self.sync_timer.stop()
+        self.playing = False
+        for player in self.players:
+            player.stop()
+
+    def close(self):
+        self.stop()
+        for player in self.players:
+            player.release()
+        self.players = []
+
 
 class VideoPlayer(QWidget):
-    def __init__(self):
+    # Emitted from the capture workers, delivered on the GUI thread
+    capture_pending_changed = pyqtSignal(int)
+    # Emitted from the folder scanner thread
+    scan_chunk_ready = pyqtSignal(object, object)
+    scan_finished = pyqtSignal(object)
+    scan_probed = pyqtSignal(object, int)
+    # Emitted from the folder watcher thread
+    folder_changed = pyqtSignal(object, object, object)
+    # Emitted from the thumbnail workers
+    thumbnail_ready = pyqtSignal(str, float, str)
+    # Emitted from the libvlc event threads
+    progress_changed = pyqtSignal()
+    # Emitted from the activity analyzer thread
+    activity_ready = pyqtSignal(str, object)
+    # Emitted from the probing thread (path, probe_cache metadata or None)
+    metadata_ready = pyqtSignal(str, object)
+    # Emitted from the burst capture thread
+    burst_progress = pyqtSignal(object)
+    # Emitted from the libvlc startup thread
+    vlc_ready = pyqtSignal(object)
+
+    def __init__(self, vlc_profile=None):
         super().__init__()
 
-        # Initialize VLC media player
-        self.instance = vlc.Instance()
-        self.player = self.instance.media_player_new()
+        # libvlc options of the deployment, see vlc_profiles
+        self.vlc_profile = vlc_profile or vlc_profiles.get_profile()
+        self.media_silent = False  # current media opened without its audio
+
+        # libvlc loads its plugins in background while the window shows up,
+        # the player and everything that needs it are set up in init_vlc
+        self.instance = None
+        self.player = None
+        self.preloader = None
+        self.progress = None
+        self.first_paint = False
+        self.vlc_ready.connect(self.init_vlc)
+        self.load_vlc()
+
+        # Frame number while stepping with the arrow keys
+        self.stepper = frame_step.FrameStepper()
 
-        # Default volume level
-        self.default_volume = 0  # Set volume to 50% initially
+        # Default volume level, muted: with the silent mode of the libvlc
+        # profile the audio is not even decoded until the volume is raised
+        self.default_volume = 0
 
         # To keep track of the folder and list of videos
-        self.video_files = []
+        self.video_store = video_store.VideoStore()
+        self.video_model = VideoListModel(self.video_store, self)
+        self.video_folder = ""
+        self.scanner = None
+        self.scanning = False
+        self.watcher = None
+
+        # The list comes from the catalog, filtered and sorted by catalog_query
+        self.catalog = video_catalog.default_catalog()
+        self.catalog_query = video_catalog.Query()
+        self.catalog_stale = False  # files changed while a filtered list was loading
         self.current_video_path = ""
+        self.burst_in_ms = None  # marked range of the burst capture
+        self.burst_out_ms = None
+        self.burst_in_frame = None  # frame numbers of the marks made while stepping
+        self.burst_out_frame = None
+        self.burst = None
+        self.grid = None  # VideoGrid of the grid review mode
         self.screenshot_output_folder = os.getcwd()  # Default screenshot folder
 
         # Set up the GUI
         self.init_ui()
 
-        # Timer for progress bar updates
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress)
+        # Captured frames are grabbed to memory and post-processed in background,
+        # the capture engine and its dependencies are loaded on first capture
+        self.capture_pending_changed.connect(self.update_capture_status)
+        self.burst_progress.connect(self.update_burst_status)
+        self._capture_engine = None
+
+        # Folder scans run in background
+        self.scan_chunk_ready.connect(self.add_scanned_videos)
+        self.scan_finished.connect(self.finish_scan)
+        self.scan_probed.connect(self.finish_probe)
+        self.folder_changed.connect(self.apply_folder_changes)
+        # A filtered list is queried again once the watched folder settles
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(2000)
+        self.reload_timer.timeout.connect(lambda: self.load_videos_from_folder(self.video_folder or None))
+
+        # Thumbnails of the visible rows, generated in background
+        self.thumbnail_ready.connect(self.set_thumbnail)
+        self.thumbnail_loader = thumbnails.ThumbnailLoader(self.thumbnail_ready.emit)
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(50)
+        self.thumbnail_timer.timeout.connect(self.request_visible_thumbnails)
+
+        # Progress bar driven by the libvlc events, at most once per display refresh
+        self.progress_changed.connect(self.schedule_progress)
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setSingleShot(True)
+        self.progress_timer.timeout.connect(self.update_progress)
+        self.last_progress_update = 0.0
+
+        # Scene cuts and activity, analyzed in background per file
+        self.activity_ready.connect(self.set_activity)
+        self.metadata_ready.connect(self.set_metadata)
+
+    def load_vlc(self):
+        """Load libvlc with the options of vlc_profile in background, init_vlc follows."""
+        profile = self.vlc_profile
+        threading.Thread(target=lambda: self.vlc_ready.emit(vlc_profiles.new_instance(profile)),
+                         name='vlc-startup', daemon=True).start()
+
+    def init_vlc(self, instance):
+        """libvlc is loaded, create the player and enable the controls."""
+        if instance is None:
+            # libvlc rejected the options of the profile, try without them
+            error = f"libvlc failed to start with the profile {self.vlc_profile.name!r}"
+            print(error, file=sys.stderr)
+            self.capture_status.setText(error)
+            if self.vlc_profile.options:
+                self.vlc_profile = vlc_profiles.fallback_profile()
+                self.load_vlc()
+            return
+        profiling.milestone('libvlc')
+        self.instance = instance
+        self.player = self.instance.media_player_new()
+
+        # Parsed media of the neighbours of the current video
+        self.preloader = media_preload.MediaPreloader(self.instance)
+
+        self.progress = player_events.PlayerProgress(self.player, self.progress_changed.emit)
+        self.change_volume(self.volume_slider.value())
+        self.right_panel.setEnabled(True)
+        profiling.milestone('player')
+
+        # Play the video (or the grid) chosen while libvlc was loading
+        self.set_grid_size()
+        self.startup_step()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint:
+            self.first_paint = True
+            profiling.milestone('first-paint')
+            self.startup_step()
+
+    def startup_step(self):
+        """With --startup-time, quit once the window is painted and the player ready."""
+        if profiling.startup_report() and self.first_paint and self.player is not None:
+            QTimer.singleShot(0, self.close)
+
+    @property
+    def capture_engine(self):
+        if self._capture_engine is None:
+            import capture_pipeline
+            self._capture_engine = capture_pipeline.CaptureEngine(
+                self.instance, on_change=self.capture_pending_changed.emit,
+                duplicates=self.duplicates_mode(), catalog=self.catalog)
+        return self._capture_engine
 
     def init_ui(self):
         self.setWindowTitle('Video Player')
 
-        # Maximize the window on startup
-        self.showMaximized()
-
         # Create a horizontal splitter
         splitter = QSplitter(Qt.Horizontal, self)
 
@@ -85,11 +642,65 @@ class VideoPlayer(QWidget):
         self.screenshot_folder_display.setReadOnly(True)
         left_layout.addWidget(self.screenshot_folder_display)
 
+        # Screenshot image format
+        self.format_combo = QComboBox(self)
+        for label, spec in encoders.PRESETS:
+            self.format_combo.addItem(label, spec)
+        self.format_combo.setCurrentIndex(max(0, self.format_combo.findData(encoders.DEFAULT_SPEC)))
+        left_layout.addWidget(self.format_combo)
+
+        # Tag rotated captures with their EXIF orientation instead of rotating them
+        self.exif_orientation_checkbox = QCheckBox('Orientation as EXIF tag', self)
+        self.exif_orientation_checkbox.setChecked(encoders.DEFAULT_EXIF_ORIENTATION)
+        left_layout.addWidget(self.exif_orientation_checkbox)
+
+        # Do not save the captures that look like one already in the folder
+        self.skip_duplicates_checkbox = QCheckBox('Skip near-duplicate captures', self)
+        self.skip_duplicates_checkbox.setChecked(dedup.DEFAULT_MODE == 'skip')
+        self.skip_duplicates_checkbox.toggled.connect(self.set_duplicates_mode)
+        left_layout.addWidget(self.skip_duplicates_checkbox)
+
+        # Scan subfolders too
+        self.recursive_checkbox = QCheckBox('Include subfolders', self)
+        left_layout.addWidget(self.recursive_checkbox)
+
+        # Keep the list up to date with the files added to the folder
+        self.watch_checkbox = QCheckBox('Watch folder for changes', self)
+        self.watch_checkbox.toggled.connect(self.update_folder_watch)
+        left_layout.addWidget(self.watch_checkbox)
+
+        # Grid review mode: the selected video and the next ones side by side, in sync
+        grid_layout = QHBoxLayout()
+        self.grid_combo = QComboBox(self)
+        for label, size in (("Single video", 1), ("Grid 2x2", 2), ("Grid 3x3", 3)):
+            self.grid_combo.addItem(label, size)
+        self.grid_combo.currentIndexChanged.connect(self.set_grid_size)
+        grid_layout.addWidget(self.grid_combo)
+        self.grid_sync_combo = QComboBox(self)
+        for mode in grid_sync.SYNC_MODES:
+            self.grid_sync_combo.addItem(f"Sync: {mode}", mode)
+        self.grid_sync_combo.setCurrentIndex(max(0, self.grid_sync_combo.findData(grid_sync.DEFAULT_SYNC)))
+        self.grid_sync_combo.currentIndexChanged.connect(self.load_grid)
+        grid_layout.addWidget(self.grid_sync_combo)
+        left_layout.addLayout(grid_layout)
+
+        # Filter and order of the list, see video_catalog.parse_query
+        self.filter_edit = QLineEdit(self)
+        self.filter_edit.setPlaceholderText("Filter, e.g. hevc >60s uncaptured newest")
+        self.filter_edit.returnPressed.connect(self.apply_filter)
+        left_layout.addWidget(self.filter_edit)
+
         # Video list
-        self.video_list = CustomListWidget(self)
+        self.video_list = VideoListView(self.video_model, self)
         self.video_list.currentRowChanged.connect(self.play_video_by_index)
+        self.video_list.setIconSize(QSize(96, 54))
+        self.video_list.verticalScrollBar().valueChanged.connect(self.schedule_thumbnails)
         left_layout.addWidget(self.video_list)
 
+        # Folder scan progress
+        self.scan_status = QLabel("", self)
+        left_layout.addWidget(self.scan_status)
+
         self.left_panel.setLayout(left_layout)
 
         # Right Panel
@@ -120,12 +731,36 @@ class VideoPlayer(QWidget):
         self.capture_button.clicked.connect(self.capture_screenshot)
         controls_layout.addWidget(self.capture_button)
 
-        # Progress bar
-        self.progress_bar = QSlider(Qt.Horizontal, self)
+        # Burst capture of the range marked with I and O
+        self.burst_button = QPushButton("Burst (B)", self)
+        self.burst_button.clicked.connect(self.toggle_burst)
+        controls_layout.addWidget(self.burst_button)
+        controls_layout.addWidget(QLabel("Stride"))
+        self.burst_stride = QSpinBox(self)
+        self.burst_stride.setRange(1, 1000)
+        controls_layout.addWidget(self.burst_stride)
+        self.burst_range_label = QLabel("", self)
+        controls_layout.addWidget(self.burst_range_label)
+
+        # Pending captures indicator
+        self.capture_status = QLabel("", self)
+        controls_layout.addWidget(self.capture_status)
+
+        # Progress bar, with the activity and cuts of the video once analyzed
+        self.progress_bar = TimelineSlider(self)
         self.progress_bar.setRange(0, 1000)
         self.progress_bar.sliderMoved.connect(self.seek_video)
+        self.progress_bar.sliderReleased.connect(self.seek_video_exact)
         controls_layout.addWidget(self.progress_bar)
 
+        # Jump over the stretches without activity while playing
+        self.skip_idle_checkbox = QCheckBox('Skip idle', self)
+        controls_layout.addWidget(self.skip_idle_checkbox)
+
+        # Frame number, shown while stepping
+        self.frame_label = QLabel("", self)
+        controls_layout.addWidget(self.frame_label)
+
         # Volume slider
         self.volume_slider = QSlider(Qt.Horizontal, self)
         self.volume_slider.setRange(0, 100)  # VLC volume range is 0 to 100
@@ -136,6 +771,7 @@ class VideoPlayer(QWidget):
 
         right_layout.addLayout(controls_layout)
         self.right_panel.setLayout(right_layout)
+        self.right_panel.setEnabled(self.player is not None)  # until libvlc is loaded
 
         # Add panels to the splitter
         splitter.addWidget(self.left_panel)
@@ -147,12 +783,64 @@ class VideoPlayer(QWidget):
         layout.addWidget(splitter)
         self.setLayout(layout)
 
-        # Set the initial volume
-        self.change_volume(self.default_volume)
-
     def change_volume(self, value):
         """Set the VLC player's volume to the slider's value."""
-        self.player.audio_set_volume(value)
+        if self.grid is not None:
+            self.grid.set_volume(value)
+        elif self.player is not None:
+            if self.current_video_path and self.media_silent != bool(self.vlc_profile.media_options(value == 0)):
+                self.reopen_media()
+            self.player.audio_set_volume(value)
+
+    def reopen_media(self):
+        """Open the current video again at the same time, with or without
+           its audio track to follow the volume (silent mode, see vlc_profiles).
+        """
+        options = self.vlc_profile.media_options(self.volume_slider.value() == 0)
+        self.media_silent = bool(options)
+        state = self.player.get_state()
+        if state in (vlc.State.Playing, vlc.State.Paused):
+            options += (':start-time=%.3f' % (max(0, self.player.get_time()) / 1000.0),)
+            if state == vlc.State.Paused:
+                options += (':start-paused',)
+        self.player.set_media(self.instance.media_new(self.current_video_path, *options))
+        set_video_output(self.player, self.video_widget)
+        if state in (vlc.State.Playing, vlc.State.Paused):
+            self.player.play()
+
+    def set_grid_size(self, *unused):
+        """Switch between the single player and the grid review mode."""
+        if self.player is None:
+            return  # applied by init_vlc
+        if self.grid is not None:
+            self.grid.close()
+            self.grid.deleteLater()
+            self.grid = None
+        size = self.grid_combo.currentData()
+        if size > 1:
+            self.stop_video()
+            self.current_video_path = ""
+            self.progress_bar.set_analysis(None)
+            self.video_widget.hide()
+            self.grid = VideoGrid(self.instance, size, self.vlc_profile, self)
+            self.grid.position_changed.connect(self.update_grid_progress)
+            self.grid.set_volume(self.volume_slider.value())
+            self.right_panel.layout().insertWidget(0, self.grid)
+            self.load_grid()
+        else:
+            self.video_widget.show()
+            self.play_video_by_index(self.video_list.currentRow())
+
+    def load_grid(self, *unused):
+        """Play the selected video and the next ones in the grid."""
+        if self.grid is not None:
+            row = max(0, self.video_list.currentRow())
+            self.grid.load(self.video_store.videos(row, row + len(self.grid.tiles)),
+                           self.grid_sync_combo.currentData())
+
+    def update_grid_progress(self, time_ms, length_ms):
+        if length_ms > 0 and not self.progress_bar.isSliderDown():
+            self.progress_bar.setValue(int(time_ms / length_ms * 1000))
 
     def open_video_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, 'Select Video Folder')
@@ -166,67 +854,277 @@ class VideoPlayer(QWidget):
             self.screenshot_output_folder = folder_path
             self.screenshot_folder_display.setText(folder_path)
 
-    def load_videos_from_folder(self, folder_path):
-        supported_formats = ['.mp4', '.avi', '.mov', '.mkv']
-        
-        # Get all video files and their modification times
-        self.video_files = [(os.path.join(folder_path, f), os.path.getmtime(os.path.join(folder_path, f))) 
-                            for f in os.listdir(folder_path) 
-                            if os.path.splitext(f)[1].lower() in supported_formats]
-        
-        # Sort video files by modification time (oldest to newest)
-        self.video_files.sort(key=lambda x: x[1])
-
-        # Clear the list and add sorted videos
-        self.video_list.clear()
-        for video, _ in self.video_files:
-            self.video_list.addItem(os.path.basename(video))
-        
-        if self.video_files:
+    def apply_filter(self):
+        """List the videos matching the filter, from the whole catalog if no
+           folder is selected.
+        """
+        try:
+            self.catalog_query = video_catalog.parse_query(self.filter_edit.text())
+        except ValueError as e:
+            self.scan_status.setText(str(e))
+            return
+        self.load_videos_from_folder(self.video_folder or None, refresh=False)
+
+    def load_videos_from_folder(self, folder_path, refresh=True):
+        """List folder_path (None: the whole catalog) from the catalog, then
+           with refresh bring the catalog up to date with the disk.
+        """
+        # Stop scanning the previous folder, if still running
+        if self.scanner is not None:
+            self.scanner.cancel()
+
+        # Clear the list, the scanner fills it in the background
+        self.video_folder = folder_path or ""
+        self.catalog_stale = False
+        self.video_model.reset(self.video_folder)
+        self.scan_status.setText("Scanning..." if refresh else "Loading...")
+
+        if refresh:
+            # Watch before scanning so that no new file is missed
+            self.update_folder_watch()
+
+        self.scanner = video_catalog.CatalogScanner(self.catalog, folder_path, self.scan_chunk_ready.emit,
+                                                    self.folder_changed.emit, self.scan_finished.emit,
+                                                    query=self.catalog_query,
+                                                    recursive=self.recursive_checkbox.isChecked(),
+                                                    refresh=refresh, on_probed=self.scan_probed.emit)
+        self.scanning = True
+        self.scanner.start()
+
+    def add_scanned_videos(self, scanner, chunk):
+        if scanner is not self.scanner:
+            return  # late chunk of a cancelled scan
+
+        # Keep the list sorted by modification time (oldest to newest by
+        # default), a filtered list in the order of the catalog. Signals are
+        # blocked so that inserting above the current row does not replay it.
+        incremental = self.catalog_query.incremental
+        self.video_list.blockSignals(True)
+        with profiling.span('scan.insert', files=len(chunk)):
+            # skip the videos already added by the folder watcher
+            chunk = [(path, mtime) for path, mtime in chunk if path not in self.video_store]
+            self.video_model.merge([(path, mtime, self.catalog_query.sort_key(mtime) if incremental
+                                     else len(self.video_store) + i) for i, (path, mtime) in enumerate(chunk)])
+        # The video being played stays selected when the list is reloaded
+        if self.video_list.currentRow() < 0 and self.current_video_path in self.video_store:
+            self.video_list.setCurrentRow(self.video_store.index(self.current_video_path))
+        self.video_list.blockSignals(False)
+        self.scan_status.setText(f"Scanning... {len(self.video_store)} videos")
+        self.schedule_thumbnails()
+
+    def finish_scan(self, scanner):
+        if scanner is not self.scanner:
+            return
+        if self.catalog_stale:
+            # Files changed, the catalog is up to date now, query it again
+            self.load_videos_from_folder(self.video_folder or None, refresh=False)
+            return
+        # The scanner keeps probing the new files for the catalog
+        self.scanning = False
+        status = f"{len(self.video_store)} videos"
+        if scanner.error is not None:
+            status += f" (catalog unavailable: {scanner.error})"
+        self.scan_status.setText(status)
+        if self.video_store and self.video_list.currentRow() < 0:
             self.video_list.setCurrentRow(0)
 
+    def finish_probe(self, scanner, probed):
+        if scanner is self.scanner and probed and self.catalog_query.needs_probe:
+            # The new files have a codec and a duration now, query them again
+            self.load_videos_from_folder(self.video_folder or None, refresh=False)
+
+    def update_folder_watch(self, *unused):
+        """Start or stop watching the current folder, following the checkbox."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self.watch_checkbox.isChecked() and self.video_folder:
+            self.watcher = folder_watcher.FolderWatcher(self.video_folder, self.folder_changed.emit,
+                                                        recursive=self.recursive_checkbox.isChecked())
+            self.watcher.start()
+
+    def apply_folder_changes(self, source, updated, removed):
+        """Changes found by the folder watcher or by the catalog scanner."""
+        if source is not self.watcher and source is not self.scanner:
+            return
+        if not self.catalog_query.incremental:
+            # Only the catalog knows where they go in a filtered list
+            if source is self.scanner:
+                self.catalog_stale = True
+            else:
+                self.reload_timer.start()
+            return
+        # Update only the affected rows, without restarting the current video
+        self.video_list.blockSignals(True)
+        changed = self.video_model.apply_changes(updated, removed, self.catalog_query.sort_key)
+        if changed and self.current_video_path in self.video_store:
+            self.video_list.setCurrentRow(self.video_store.index(self.current_video_path))
+        self.video_list.blockSignals(False)
+        if not changed:
+            return
+        if not self.scanning:
+            self.scan_status.setText(f"{len(self.video_store)} videos")
+        self.schedule_thumbnails()
+
+    def schedule_thumbnails(self, *unused):
+        """Look for the visible rows once scrolling or loading settles."""
+        self.thumbnail_timer.start()
+
+    def request_visible_thumbnails(self):
+        """Show the cached thumbnails of the visible rows, generate the others."""
+        first = self.video_list.indexAt(QPoint(0, 0)).row()
+        if first < 0:
+            self.thumbnail_loader.set_visible([])
+            return
+        last = self.video_list.indexAt(QPoint(0, self.video_list.viewport().height() - 1)).row()
+        if last < 0:
+            last = self.video_model.rowCount() - 1
+        wanted = []
+        for row in range(first, last + 1):
+            path, mtime = self.video_store[row]
+            if self.video_model.has_icon(path):
+                continue
+            cached = self.thumbnail_loader.cached(path, mtime)
+            if cached:
+                self.video_model.set_icon(row, QIcon(cached))
+            else:
+                wanted.append((path, mtime))
+        self.thumbnail_loader.set_visible(wanted)
+
+    def set_thumbnail(self, path, mtime, thumbnail_path):
+        row = self.video_store.index(path)
+        if row >= 0 and self.video_store.mtime(row) == mtime:  # still in the list
+            self.video_model.set_icon(row, QIcon(thumbnail_path))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if hasattr(self, 'thumbnail_timer'):
+            self.schedule_thumbnails()
+
     def play_video_by_index(self, index):
-        if 0 <= index < len(self.video_files):
-            self.current_video_path = self.video_files[index][0]  # Get the path from the sorted tuple
-            media = self.instance.media_new(self.current_video_path)
+        if self.player is None:
+            return  # played by init_vlc
+        if self.grid is not None:
+            self.load_grid()
+            return
+        if 0 <= index < len(self.video_store):
+            self.current_video_path = self.video_store.path(index)
+            self.stepper.new_video()
+            media = self.preloader.get(self.current_video_path)
+            options = self.vlc_profile.media_options(self.volume_slider.value() == 0)
+            for option in options:
+                media.add_option(option)
+            self.media_silent = bool(options)
+            # Real frame rate for the stepper, and metadata for the captures,
+            # without waiting for ffprobe on this thread
+            probe_cache.request_metadata(self.current_video_path, self.metadata_ready.emit)
+            keyframes.request_index(self.current_video_path)
+            self.progress_bar.set_analysis(None)
+            activity.request_analysis(self.current_video_path, self.activity_ready.emit)
             self.player.set_media(media)
-            if sys.platform == "win32":
-                self.player.set_hwnd(int(self.video_widget.winId()))
-            elif sys.platform == "darwin":
-                self.player.set_nsobject(int(self.video_widget.winId()))
-            else:
-                self.player.set_xwindow(int(self.video_widget.winId()))
+            set_video_output(self.player, self.video_widget)
             self.play_video()
 
+            # Get the next and previous videos ready for the arrow keys
+            self.preloader.preload([self.video_store.path(i) for i in (index + 1, index - 1)
+                                    if 0 <= i < len(self.video_store)])
+
     def play_video(self):
-        if self.player.get_state() != vlc.State.Playing:
+        if self.grid is not None:
+            self.grid.play()
+        elif self.player.get_state() != vlc.State.Playing:
+            self.stepper.reset()
+            self.frame_label.setText("")
             self.player.play()
             self.player.audio_set_volume(self.volume_slider.value())  # Ensure volume is maintained
-            self.timer.start(100)
 
     def pause_video(self):
-        if self.player.get_state() == vlc.State.Playing:
+        if self.grid is not None:
+            self.grid.pause()
+        elif self.player.get_state() == vlc.State.Playing:
             self.player.pause()
-            self.timer.stop()
 
     def stop_video(self):
+        if self.grid is not None:
+            self.grid.stop()
         self.player.stop()
-        self.timer.stop()
+        self.progress_timer.stop()
         self.progress_bar.setValue(0)
 
-    def seek_video(self, position):
-        if self.player.get_state() in (vlc.State.Playing, vlc.State.Paused):
+    def seek_video(self, position, exact=False):
+        if self.grid is not None:
+            self.grid.seek(position / 1000)
+        elif self.player.get_state() in (vlc.State.Playing, vlc.State.Paused):
             duration = self.player.get_length()
-            self.player.set_time(int(position * duration / 1000))
+            time_ms = int(position * duration / 1000)
+            index = keyframes.cached_index(self.current_video_path)
+            if not exact and index:
+                # Fast seek while dragging: nothing to decode on a keyframe
+                time_ms = index.nearest(time_ms)
+            self.player.set_time(time_ms)
+            self.stepper.reset()
+            self.frame_label.setText("")
+
+    def seek_video_exact(self):
+        """Slider released, go to the exact position."""
+        self.seek_video(self.progress_bar.value(), exact=True)
+
+    def schedule_progress(self):
+        """New libvlc progress events, update the bar on the next display refresh."""
+        if self.progress_timer.isActive():
+            return
+        refresh_rate = QApplication.primaryScreen().refreshRate() or 60
+        wait = self.last_progress_update + 1.0 / refresh_rate - time.monotonic()
+        self.progress_timer.start(max(0, int(wait * 1000)))
 
     def update_progress(self):
-        if self.player.get_state() == vlc.State.Playing:
-            duration = self.player.get_length()
-            current_time = self.player.get_time()
-            if duration > 0:
-                self.progress_bar.setValue(int(current_time / duration * 1000))
+        self.last_progress_update = time.monotonic()
+        current_time, duration, state = self.progress.take()
+        if state == 'stopped' or self.progress_bar.isSliderDown():
+            return
+        if state == 'ended':
+            self.progress_bar.setValue(1000)
+        elif duration and current_time is not None and duration > 0:
+            self.progress_bar.setValue(int(current_time / duration * 1000))
+            if self.progress_bar.length_ms != duration and self.progress_bar.analysis is not None:
+                self.progress_bar.set_analysis(self.progress_bar.analysis, duration)
+            if state == 'playing' and self.skip_idle_checkbox.isChecked() and self.progress_bar.analysis:
+                resume_ms = self.progress_bar.analysis.idle_end(current_time)
+                if resume_ms is not None:
+                    self.player.set_time(resume_ms)
+
+    def set_metadata(self, video_path, meta):
+        """The current video was probed: step it at its real frame rate."""
+        if video_path == self.current_video_path and meta:
+            self.stepper.set_fps(meta['fps'])
+
+    def set_activity(self, video_path, analysis):
+        if video_path == self.current_video_path:
+            self.progress_bar.set_analysis(analysis, max(0, self.player.get_length()))
+
+    def jump_to_mark(self, cuts, forward):
+        """Seek to the next or previous scene cut (cuts) or activity peak."""
+        analysis = self.progress_bar.analysis
+        if analysis is None or self.player.get_state() not in (vlc.State.Playing, vlc.State.Paused):
+            return
+        time_ms = self.stepper.time_ms()
+        if time_ms is None:
+            time_ms = max(0, self.player.get_time())
+        if cuts:
+            target = analysis.next_cut(time_ms) if forward else analysis.previous_cut(time_ms)
+        else:
+            target = analysis.next_peak(time_ms) if forward else analysis.previous_peak(time_ms)
+        if target is not None:
+            self.player.set_time(target)
+            self.stepper.reset()
+            self.frame_label.setText("")
 
     def keyPressEvent(self, event: QKeyEvent):
+        if self.player is None:
+            return  # libvlc still loading
+        if self.grid is not None:
+            self.grid_key_press(event)
+            return
         if event.key() == Qt.Key_S and (self.player.is_playing() or self.player.get_state() == vlc.State.Paused):
             self.capture_screenshot()
         elif event.key() == Qt.Key_Right:  # Skip forward
@@ -240,59 +1138,188 @@ class VideoPlayer(QWidget):
                 self.play_video()
         elif event.key() == Qt.Key_D:  # Stop video
             self.stop_video()
+        elif event.key() == Qt.Key_I:  # Burst range start
+            self.mark_burst_range(True)
+        elif event.key() == Qt.Key_O:  # Burst range end
+            self.mark_burst_range(False)
+        elif event.key() == Qt.Key_B:  # Start/cancel burst capture
+            self.toggle_burst()
+        elif event.key() == Qt.Key_N:  # Next scene cut, previous with Shift
+            self.jump_to_mark(True, not event.modifiers() & Qt.ShiftModifier)
+        elif event.key() == Qt.Key_M:  # Next activity peak, previous with Shift
+            self.jump_to_mark(False, not event.modifiers() & Qt.ShiftModifier)
+
+    def grid_key_press(self, event: QKeyEvent):
+        """Keys of the grid review mode: 1-9 focus a tile, S captures it."""
+        if event.key() == Qt.Key_S:
+            self.capture_screenshot()
+        elif event.key() == Qt.Key_Space:
+            self.grid.toggle_pause()
+        elif event.key() == Qt.Key_D:
+            self.stop_video()
+        elif Qt.Key_1 <= event.key() <= Qt.Key_9:
+            self.grid.set_focus(event.key() - Qt.Key_1)
 
     def step_video(self, step_frames):
-        fps = 25  # Default FPS
-        current_time = self.player.get_time()
-        step_time = int(1000 / fps) * step_frames
-        self.player.set_time(max(0, current_time + step_time))
-        self.update_progress()
+        if not self.current_video_path:
+            return
+        frame = self.stepper.step(self.player, step_frames)
+        self.frame_label.setText(f"Frame {frame}")
+        duration = self.player.get_length()
+        if duration > 0:
+            self.progress_bar.setValue(int(self.stepper.time_ms() / duration * 1000))
+
+    def duplicates_mode(self):
+        if self.skip_duplicates_checkbox.isChecked():
+            return 'skip'
+        return 'off' if dedup.DEFAULT_MODE == 'off' else 'flag'
+
+    def set_duplicates_mode(self, *unused):
+        if self._capture_engine is not None:
+            self._capture_engine.duplicates = self.duplicates_mode()
+
+    def current_encoder(self):
+        return encoders.Encoder(self.format_combo.currentData(),
+                                self.exif_orientation_checkbox.isChecked())
 
     def capture_screenshot(self):
-        if self.current_video_path:
-            # Get the timestamp of the current video file (last modified time)
-            video_modified_time = os.path.getmtime(self.current_video_path)
-            modified_timestamp = datetime.datetime.fromtimestamp(video_modified_time).strftime('%Y%m%d_%H%M%S')
-            
-            # Save screenshot with the same timestamp format
-            screenshot_filename = os.path.join(self.screenshot_output_folder, f"screenshot_{modified_timestamp}.png")
-            
-            # Capture the screenshot
-            self.player.video_take_snapshot(0, screenshot_filename, 0, 0)
-
-            # Check if need to rotate
-            ff_probe = ffmpeg.probe(self.current_video_path)
-            rotation = 0
-            if ff_probe and 'streams' in ff_probe and 'side_data_list' in ff_probe['streams'][0]:
-                if 'rotation' in ff_probe['streams'][0]['side_data_list'][0]:
-                    rotation = ff_probe['streams'][0]['side_data_list'][0]['rotation']
-                elif 'rotation' in ff_probe['streams'][0]['side_data_list'][1]:
-                    rotation = ff_probe['streams'][0]['side_data_list'][1]['rotation']
-
-            # Open the screenshot and rotate if necessary
-            img = Image.open(screenshot_filename)
-            rotated_image = img.rotate(int(rotation), expand=True)
-            
-            # Save the rotated image, and handle specific profiles if required
-            if ff_probe and 'streams' in ff_probe \
-                    and ff_probe['streams'][0].get('codec_name', None) == 'hevc':
-                profile = ImageCms.getOpenProfile(os.path.join(
-                                    os.path.dirname(os.path.realpath(__file__)),
-                                    "DisplayP3Compat-v4.icc"))
-                rotated_image.save(screenshot_filename, icc_profile=profile.tobytes())
-            else:
-                rotated_image.save(screenshot_filename)
+        if self.grid is not None:
+            # Full quality frame of the focused tile, grabbed by its own decoder
+            focused = self.grid.focused_video()
+            if focused is not None:
+                player, path, mtime = focused
+                with profiling.span('capture.key'):
+                    self.capture_engine.capture(player, path, self.screenshot_output_folder, self.current_encoder(),
+                                                max(0, player.get_time()), None, mtime)
+        elif self.current_video_path:
+            with profiling.span('capture.key'):
+                # Get the timestamp of the current video file (last modified time)
+                video_modified_time = os.path.getmtime(self.current_video_path)
+
+                # Grab the frame now, the rest is done by the capture workers
+                self.capture_engine.capture(self.player, self.current_video_path, self.screenshot_output_folder,
+                                            self.current_encoder(), self.stepper.time_ms(), self.stepper.frame,
+                                            video_modified_time)
+
+    def mark_burst_range(self, is_in):
+        if not self.current_video_path:
+            return
+        time_ms = self.stepper.time_ms()
+        if time_ms is None:
+            time_ms = max(0, self.player.get_time())
+        if is_in:
+            self.burst_in_ms, self.burst_in_frame = time_ms, self.stepper.frame
+        else:
+            self.burst_out_ms, self.burst_out_frame = time_ms, self.stepper.frame
+        marks = [f"{label} {t / 1000:.3f}s" for label, t in (("In", self.burst_in_ms), ("Out", self.burst_out_ms))
+                 if t is not None]
+        self.burst_range_label.setText("  ".join(marks))
+
+    def toggle_burst(self):
+        """Capture the marked range, or cancel the running burst."""
+        if self.burst is not None:
+            self.burst.cancel()
+            return
+        if not self.current_video_path or self.burst_in_ms is None or self.burst_out_ms is None:
+            self.capture_status.setText("Mark the burst range with I and O first")
+            return
+        video_modified_time = os.path.getmtime(self.current_video_path)
+        self.burst = burst_capture.BurstCapture(
+            self.capture_engine, self.current_video_path, self.burst_in_ms, self.burst_out_ms,
+            self.burst_stride.value(), self.screenshot_output_folder, video_modified_time,
+            self.burst_progress.emit, self.current_encoder(), self.burst_in_frame, self.burst_out_frame)
+        self.burst_button.setText("Cancel burst (B)")
+        self.burst.start()
+
+    def update_burst_status(self, burst):
+        if burst is not self.burst:
+            return
+        if burst.error is not None:
+            self.capture_status.setText(f"Burst failed: {burst.error}")
+        else:
+            self.capture_status.setText(f"Burst: {burst.done}/{burst.total} frames")
+        if burst.finished:
+            self.burst = None
+            self.burst_button.setText("Burst (B)")
 
-            # Set the modified time of the screenshot to match the video's modified time
-            os.utime(screenshot_filename, (video_modified_time, video_modified_time))
+    def update_capture_status(self, pending):
+        """Show the number of captures still being processed and any failure."""
+        errors = []
+        while not self.capture_engine.errors.empty():
+            errors.append(self.capture_engine.errors.get())
+        if errors and isinstance(errors[-1], dedup.DuplicateCapture):
+            self.capture_status.setText(str(errors[-1]))
+        elif errors:
+            self.capture_status.setText(f"Capture failed: {errors[-1]}")
+        elif pending:
+            self.capture_status.setText(f"Pending captures: {pending}")
+        else:
+            self.capture_status.setText("")
+
+    def closeEvent(self, event):
+        if self.scanner is not None:
+            self.scanner.cancel()
+        # Let the pending captures finish before quitting
+        if self.burst is not None:
+            self.burst.cancel()
+            self.burst.join()
+        if self._capture_engine is not None:
+            self._capture_engine.close(wait=True)
+        if self.grid is not None:
+            self.grid.close()
+        self.thumbnail_loader.close()
+        if self.preloader is not None:
+            self.preloader.clear()
+        super().closeEvent(event)
 
 
 def main():
+    # --profile[=FILE]: time the captures and the folder loading,
+    # --startup-time: print the startup milestones and quit, see profiling
+    profiling.enable_from_argv(sys.argv)
+    # --vlc-profile=NAME: libvlc options, see vlc_profiles
+    try:
+        vlc_profile = vlc_profiles.profile_from_argv(sys.argv)
+    except ValueError as e:
+        sys.exit(str(e))
     app = QApplication(sys.argv)
-    player = VideoPlayer()
-    player.show()
+    player = VideoPlayer(vlc_profile)
+    # Maximize the window once its widgets exist, a single layout pass
+    player.showMaximized()
+    profiling.milestone('window')
     sys.exit(app.exec_())
 
 
+def batch_main(argv=None):
+    """Headless entry point, see batch_extract."""
+    import batch_extract
+    sys.exit(batch_extract.main(argv))
+
+
+def bench_main(argv=None):
+    """Per-stage latency and rate of the capture path, see capture_bench."""
+    import capture_bench
+    sys.exit(capture_bench.main(argv))
+
+
+def bench_encoders_main(argv=None):
+    """Encode time and size of each output format, see encoders."""
+    sys.exit(encoders.main(argv))
+
+
+def bench_vlc_main(argv=None):
+    """Open latency and CPU use of each libvlc profile, see vlc_profiles."""
+    sys.exit(vlc_profiles.main(argv))
+
+
 if __name__ == '__main__':
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        bench_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--bench-encoders':
+        bench_encoders_main(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == '--bench-vlc':
+        bench_vlc_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,128 @@
+"""Compact sorted store of the videos listed by the front-ends.
+
+A folder of 100k videos listed as one (path, mtime) tuple and one widget
+item per file spends most of its load time and memory on those objects.
+VideoStore keeps the paths in a list and their modification times and sort
+keys in parallel arrays of doubles, sorted by key, and the front-ends only
+build the rows in view (VideoListModel in video_player, WindowedList in
+tkvlc).
+"""
+import array
+import bisect
+
+
+class VideoStore(object):
+    """Videos (path, mtime) kept sorted by an ascending key (a float)."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.paths = []
+        self.mtimes = array.array('d')
+        self.keys = array.array('d')
+        self._keys = {}  # path -> key
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, path):
+        return path in self._keys
+
+    def __getitem__(self, index):
+        return self.paths[index], self.mtimes[index]
+
+    def videos(self, start=0, stop=None):
+        """List of the (path, mtime) of the rows start to stop."""
+        stop = len(self.paths) if stop is None else min(stop, len(self.paths))
+        return [(self.paths[i], self.mtimes[i]) for i in range(start, stop)]
+
+    def path(self, index):
+        return self.paths[index]
+
+    def mtime(self, index):
+        return self.mtimes[index]
+
+    def key(self, path):
+        """Key of path, None if it is not in the store."""
+        return self._keys.get(path)
+
+    def position(self, key):
+        """Index a video of key would be inserted at."""
+        return bisect.bisect_right(self.keys, key)
+
+    def index(self, path):
+        """Index of path, -1 if it is not in the store."""
+        key = self._keys.get(path)
+        if key is None:
+            return -1
+        index = bisect.bisect_left(self.keys, key)
+        while index < len(self.paths) and self.keys[index] == key:
+            if self.paths[index] == path:
+                return index
+            index += 1
+        return -1
+
+    def insert(self, path, mtime, key):
+        """Insert a video that is not in the store, return its index."""
+        index = self.position(key)
+        self.paths.insert(index, path)
+        self.mtimes.insert(index, mtime)
+        self.keys.insert(index, key)
+        self._keys[path] = key
+        return index
+
+    def merge(self, videos):
+        """Insert videos (path, mtime, key) that are not in the store in one
+           pass over it, instead of one list insertion each.  Returns the
+           indexes of the inserted videos, ascending.
+        """
+        if not videos:
+            return []
+        paths, mtimes, keys = [], array.array('d'), array.array('d')
+        indexes = []
+        start = 0
+        for path, mtime, key in sorted(videos, key=lambda video: video[2]):
+            stop = bisect.bisect_right(self.keys, key, start)
+            paths.extend(self.paths[start:stop])
+            mtimes.extend(self.mtimes[start:stop])
+            keys.extend(self.keys[start:stop])
+            start = stop
+            indexes.append(len(paths))
+            paths.append(path)
+            mtimes.append(mtime)
+            keys.append(key)
+            self._keys[path] = key
+        paths.extend(self.paths[start:])
+        mtimes.extend(self.mtimes[start:])
+        keys.extend(self.keys[start:])
+        self.paths, self.mtimes, self.keys = paths, mtimes, keys
+        return indexes
+
+    def remove(self, path):
+        """Remove path, return its index or -1 if it was not in the store."""
+        index = self.index(path)
+        if index >= 0:
+            del self.paths[index], self.mtimes[index], self.keys[index]
+            del self._keys[path]
+        return index
+
+    def changes(self, updated, removed, sort_key):
+        """Paths to remove and (path, mtime, key) to insert, in that order,
+           to apply the changes of a folder_watcher.FolderWatcher: updated
+           (path, mtime) and removed paths, None if updated holds the whole
+           folder.  sort_key(mtime) is the key of the new videos.
+        """
+        if removed is None:
+            keep = set(path for path, _ in updated)
+            removed = [path for path in self.paths if path not in keep]
+        removed = [path for path in removed if path in self._keys]
+        inserted = []
+        for path, mtime in updated:
+            key = sort_key(mtime)
+            if self._keys.get(path) == key:
+                continue
+            if path in self._keys:
+                removed.append(path)
+            inserted.append((path, mtime, key))
+        return removed, inserted
@@ -0,0 +1,224 @@
+"""Named sets of libvlc options, for the storage and the machine of a deployment.
+
+A profile is a list of libvlc command line options (decoder threads, file and
+network caching, hardware decoding, audio output...) given to vlc.Instance(),
+and whether audio is decoded at all while the player is muted.  The built-in
+profiles are listed in PROFILES, more can be defined, or the built-in ones
+overridden, in an INI file (SCREENSHOTER_VLC_PROFILES, default
+~/.config/video-screenshoter/vlc_profiles.ini):
+
+  [NAS review]
+  file-caching = 5000
+  network-caching = 5000
+  avcodec-hw = none
+  silent-when-muted = yes
+
+Every key is a libvlc option without its leading '--', an empty value makes
+it a flag (e.g. 'no-video-title-show ='), except silent-when-muted and
+description.  The profile is chosen with --vlc-profile=NAME or
+SCREENSHOTER_VLC_PROFILE.
+
+In silent mode the media is opened with :no-audio while the volume is 0, so
+the audio track is neither decoded nor output, and reopened at the same
+time with its audio when the volume is raised.
+
+The CPU use and open latency of each profile are measured by main():
+
+  python video_player.py --bench-vlc [video...]
+"""
+import argparse
+import collections
+import configparser
+import os
+import statistics
+import sys
+import time
+from os.path import expanduser
+
+CONFIG_PATH = os.environ.get('SCREENSHOTER_VLC_PROFILES') or os.path.join(
+    os.environ.get('XDG_CONFIG_HOME', expanduser('~/.config')), 'video-screenshoter', 'vlc_profiles.ini')
+DEFAULT_PROFILE = os.environ.get('SCREENSHOTER_VLC_PROFILE', 'default')
+# Built-in profile without options, used when libvlc rejects the options of another
+FALLBACK_PROFILE = 'default'
+
+# name: (description, {libvlc option: value or None for a flag}, silent when muted)
+PROFILES = collections.OrderedDict([
+    ('default', ('libvlc defaults', {}, True)),
+    ('NAS review', ('large read caches for files on network storage, software decoding', {
+        'file-caching': '3000',
+        'network-caching': '3000',
+        'avcodec-hw': 'none',
+        'no-video-title-show': None,
+    }, True)),
+    ('local 4K', ('local disks and 4K video: hardware decoding, short caches', {
+        'file-caching': '300',
+        'avcodec-hw': 'any',
+        'avcodec-threads': '0',
+        'no-video-title-show': None,
+    }, True)),
+    ('low-CPU', ('slow machines: no loop filter, fast decoding shortcuts, two threads', {
+        'file-caching': '1000',
+        'avcodec-hw': 'any',
+        'avcodec-skiploopfilter': '4',
+        'avcodec-fast': None,
+        'avcodec-threads': '2',
+        'no-video-title-show': None,
+    }, True)),
+])
+
+_SETTINGS = ('description', 'silent-when-muted')
+
+
+class VlcProfile(object):
+    """libvlc options of a profile and its silent mode."""
+
+    def __init__(self, name, description='', options=None, silent_when_muted=True):
+        self.name = name
+        self.description = description
+        self.options = dict(options or {})
+        self.silent_when_muted = silent_when_muted
+
+    def __repr__(self):
+        return 'VlcProfile(%r)' % (self.name,)
+
+    def instance_args(self):
+        """Arguments of vlc.Instance()."""
+        return ['--' + key if value is None else '--%s=%s' % (key, value)
+                for key, value in self.options.items()]
+
+    def media_options(self, muted):
+        """Options of the media played at volume 0 (muted) or not."""
+        return (':no-audio',) if muted and self.silent_when_muted else ()
+
+
+def load_profiles(path=CONFIG_PATH):
+    """OrderedDict name -> VlcProfile of the built-in profiles and of the
+       config file, ValueError if the file is invalid.
+    """
+    profiles = collections.OrderedDict(
+        (name, VlcProfile(name, description, options, silent))
+        for name, (description, options, silent) in PROFILES.items())
+    config = configparser.ConfigParser(allow_no_value=True, interpolation=None)
+    config.optionxform = str  # option names are case sensitive
+    try:
+        config.read(path)
+    except configparser.Error as e:
+        raise ValueError('invalid libvlc profiles file %s: %s' % (path, e))
+    for name in config.sections():
+        section = config[name]
+        options = {key: value or None for key, value in section.items() if key not in _SETTINGS}
+        try:
+            silent = section.getboolean('silent-when-muted', True)
+        except ValueError as e:
+            raise ValueError('invalid libvlc profile %r in %s: %s' % (name, path, e))
+        profiles[name] = VlcProfile(name, section.get('description', ''), options, silent)
+    return profiles
+
+
+def get_profile(name=DEFAULT_PROFILE, path=CONFIG_PATH):
+    """VlcProfile name, ValueError if there is no such profile."""
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError('unknown libvlc profile %r, choose one of: %s' % (name, ', '.join(profiles)))
+    return profiles[name]
+
+
+def fallback_profile():
+    """The built-in FALLBACK_PROFILE, even if the config file redefines it."""
+    description, options, silent = PROFILES[FALLBACK_PROFILE]
+    return VlcProfile(FALLBACK_PROFILE, description, options, silent)
+
+
+def profile_from_argv(argv):
+    """Remove --vlc-profile=NAME from the list argv, return the VlcProfile
+       it names, else the default one.
+    """
+    name = DEFAULT_PROFILE
+    for arg in list(argv):
+        if arg.startswith('--vlc-profile='):
+            argv.remove(arg)
+            name = arg.partition('=')[2]
+    return get_profile(name)
+
+
+def new_instance(profile, extra_args=()):
+    """vlc.Instance with the options of profile."""
+    import vlc
+    return vlc.Instance(profile.instance_args() + list(extra_args))
+
+
+def _open_latency(player, timeout=10.0):
+    """Seconds until player shows its first frame (its time moves)."""
+    start = time.perf_counter()
+    player.play()
+    while player.get_time() <= 0:
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError('timed out opening the video')
+        time.sleep(0.002)
+    return time.perf_counter() - start
+
+
+def bench_profile(profile, video_path, seconds, repeat, display=False):
+    """(open latency p50 in ms, CPU use in % of one core) of playing
+       video_path muted with profile, the CPU measured over seconds.
+    """
+    import vlc
+    extra = [] if display else ['--vout=vdummy', '--aout=adummy']
+    instance = new_instance(profile, ['--quiet'] + extra)
+    if instance is None:
+        raise RuntimeError('libvlc rejected the options of profile %r' % (profile.name,))
+    player = instance.media_player_new()
+    latencies, cpu = [], []
+    try:
+        for _ in range(repeat):
+            player.set_media(instance.media_new(video_path, *profile.media_options(muted=True)))
+            player.audio_set_volume(0)
+            latencies.append(_open_latency(player))
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            time.sleep(seconds)
+            if player.get_state() in (vlc.State.Playing, vlc.State.Buffering):
+                cpu.append((time.process_time() - cpu_start) / (time.perf_counter() - wall_start) * 100)
+            player.stop()
+    finally:
+        player.release()
+        instance.release()
+    return statistics.median(latencies) * 1000, statistics.median(cpu) if cpu else float('nan')
+
+
+def main(argv=None):
+    """--bench-vlc: open latency and CPU use of each libvlc profile."""
+    parser = argparse.ArgumentParser(prog='video_player.py --bench-vlc',
+                                     description='Compare the libvlc profiles.')
+    parser.add_argument('videos', nargs='*', metavar='video',
+                        help='videos to play (default: the synthetic test videos of --bench, which have '
+                             'no audio track, use real footage to see the effect of the silent mode)')
+    parser.add_argument('--profile', action='append', dest='profiles', help='profile to test (repeatable)')
+    parser.add_argument('--seconds', type=float, default=3.0, help='playback time of the CPU measure')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--display', action='store_true',
+                        help='show the video, which enables the hardware decoding of the profiles')
+    args = parser.parse_args(argv)
+    try:
+        profiles = load_profiles()
+    except ValueError as e:
+        parser.error(str(e))
+    for name in args.profiles or []:
+        if name not in profiles:
+            parser.error('unknown profile %r, choose one of: %s' % (name, ', '.join(profiles)))
+
+    videos = args.videos
+    if not videos:
+        import capture_bench
+        videos = [capture_bench.make_video(name) for name in ('h264-1080p', 'hevc-2160p')]
+    print('%-16s %-20s %10s %8s' % ('profile', 'video', 'open ms', 'CPU %'))
+    failed = False
+    for name in args.profiles or profiles:
+        for video in videos:
+            try:
+                latency, cpu = bench_profile(profiles[name], video, args.seconds, args.repeat, args.display)
+            except RuntimeError as e:
+                print('%-16s %-20s %s' % (name, os.path.basename(video)[:20], e), file=sys.stderr)
+                failed = True
+                continue
+            print('%-16s %-20s %10.1f %8.1f' % (name, os.path.basename(video)[:20], latency, cpu))
+    return 1 if failed else 0